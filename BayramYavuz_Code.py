@@ -1,10 +1,27 @@
 import streamlit as st
-import sqlite3
 import pandas as pd
 import time
 import os
+import tempfile
 from datetime import datetime, timedelta
 
+from travel_core import (
+    ANALYTICS_PART_BITS, ARCHIVE_AFTER_DAYS, AUDIT_LARGE_TABLE_ROWS, DASHBOARD_TARGET_MS,
+    DB_READ_POOL_SIZE, DEFAULT_PAGE_SIZE, EXPORT_PREVIEW_ROWS, FLIGHT_INVENTORY_SQL, GRIDS,
+    HOTEL_INVENTORY_SQL, MAINTENANCE_JOBS, MAINTENANCE_LOCK_BUDGET_MS, PROFILE_BUCKETS_MS,
+    REPORT_QUERIES, WRITE_MAX_ATTEMPTS, AllocationError, add_customer, add_destination, add_package,
+    add_package_service, add_payment, add_service, analytics_status, archive_status,
+    audit_query_plans, compare_report_engines, create_group_booking, dashboard_metrics,
+    delete_booking, delete_customer, delete_destination, delete_package, delete_service,
+    export_booking_report, fetch_grid_page, free_rooms, free_rooms_for_destination, free_seats,
+    get_catalog, get_dashboard_stats, get_dataframe, get_lock_stats, get_maintenance_scheduler,
+    get_pool_stats, get_query_cache, get_query_profiler, get_row_count, get_snapshot_stats,
+    index_status, init_db, option_labels, parquet_available, profile_page, quote_package,
+    refresh_analytics, remove_package_content, report_frame, reprice_catalog, revenue_series,
+    search_options, set_package_pricing, start_maintenance, update_booking, update_customer,
+    update_destination, update_package,
+)
+
 #=============================================================================================
 #============               Bayram YAVUZ  ID : 122200058              ========================
 #=============================================================================================
@@ -18,7 +35,6 @@ st.set_page_config(
 
 #=============================================================================================
 
-DB_FILE = "travel_system_final.db"
 BG_IMAGE = "deneme-1.png"  
 
 #=============================================================================================
@@ -54,374 +70,121 @@ def add_bg():
     else:
         st.warning(f"Background image '{BG_IMAGE}' not found in app folder. Put it next to the .py file to see background.")
 
-def db_connect():
-    conn = sqlite3.connect(DB_FILE)
-    conn.execute("PRAGMA foreign_keys = ON;")
-    return conn
-
-#=============================================================================================
-
-def table_has_column(table, column):
-    with db_connect() as conn:
-        cur = conn.cursor()
-        cur.execute(f"PRAGMA table_info({table})")
-        cols = [r[1] for r in cur.fetchall()]
-        return column in cols
-
-#=============================================================================================
-
-def run_query(query, params=(), fetch=True):
-    with db_connect() as conn:
-        cur = conn.cursor()
-        cur.execute(query, params)
-        conn.commit()
-        if fetch:
-            return cur.fetchall()
-        return None
-
-#=============================================================================================
-
-def get_dataframe(query, params=()):
-    with db_connect() as conn:
-        return pd.read_sql(query, conn, params=params)
-
-#=============================================================================================
-
-def init_db():
-    """Create tables and insert sample data if empty. Also perform safe migrations."""
-    with db_connect() as conn:
-        cursor = conn.cursor()
-
-#=============================================================================================
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Customers (
-            cust_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            email TEXT UNIQUE NOT NULL
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Destinations (
-            dest_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            city TEXT NOT NULL,
-            country TEXT NOT NULL
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Services (
-            service_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            service_name TEXT NOT NULL,
-            base_price REAL NOT NULL
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Hotels (
-            hotel_id INTEGER PRIMARY KEY,
-            stars INTEGER,
-            FOREIGN KEY (hotel_id) REFERENCES Services(service_id) ON DELETE CASCADE
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Flights (
-            flight_id INTEGER PRIMARY KEY,
-            airline TEXT,
-            FOREIGN KEY (flight_id) REFERENCES Services(service_id) ON DELETE CASCADE
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Rooms (
-            room_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            hotel_id INTEGER,
-            room_no TEXT,
-            FOREIGN KEY (hotel_id) REFERENCES Hotels(hotel_id) ON DELETE CASCADE
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Seats (
-            seat_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            flight_id INTEGER,
-            seat_no TEXT,
-            FOREIGN KEY (flight_id) REFERENCES Flights(flight_id) ON DELETE CASCADE
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS TravelPackages (
-            pkg_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            dest_id INTEGER,
-            pkg_name TEXT,
-            price REAL,
-            FOREIGN KEY (dest_id) REFERENCES Destinations(dest_id)
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS PackageContents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pkg_id INTEGER,
-            service_id INTEGER,
-            FOREIGN KEY (pkg_id) REFERENCES TravelPackages(pkg_id) ON DELETE CASCADE,
-            FOREIGN KEY (service_id) REFERENCES Services(service_id) ON DELETE CASCADE
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Bookings (
-            booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            cust_id INTEGER,
-            pkg_id INTEGER,
-            booking_date DATE DEFAULT CURRENT_DATE,
-            is_paid INTEGER DEFAULT 0,
-            FOREIGN KEY (cust_id) REFERENCES Customers(cust_id) ON DELETE CASCADE,
-            FOREIGN KEY (pkg_id) REFERENCES TravelPackages(pkg_id)
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Payments (
-            payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER,
-            amount REAL,
-            payment_date DATE DEFAULT CURRENT_DATE,
-            FOREIGN KEY (booking_id) REFERENCES Bookings(booking_id) ON DELETE CASCADE
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Reservations (
-            res_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER,
-            service_id INTEGER,
-            room_id INTEGER,
-            check_in DATE,
-            check_out DATE,
-            FOREIGN KEY (booking_id) REFERENCES Bookings(booking_id) ON DELETE CASCADE,
-            FOREIGN KEY (service_id) REFERENCES Services(service_id),
-            FOREIGN KEY (room_id) REFERENCES Rooms(room_id)
-        )""")
-
-        cursor.execute("""CREATE TABLE IF NOT EXISTS Tickets (
-            ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
-            booking_id INTEGER,
-            seat_id INTEGER,
-            issue_date DATE DEFAULT CURRENT_DATE,
-            FOREIGN KEY (booking_id) REFERENCES Bookings(booking_id) ON DELETE CASCADE,
-            FOREIGN KEY (seat_id) REFERENCES Seats(seat_id)
-        )""")
-
-        if not table_has_column("Bookings", "is_paid"):
-            try:
-                cursor.execute("ALTER TABLE Bookings ADD COLUMN is_paid INTEGER DEFAULT 0")
-            except Exception:
-                pass
-
-        if not table_has_column("Reservations", "check_out"):
-            try:
-                cursor.execute("ALTER TABLE Reservations ADD COLUMN check_out DATE")
-            except Exception:
-                pass
-
-        conn.commit()
-
-        cursor.execute("SELECT COUNT(*) FROM Customers")
-        if cursor.fetchone()[0] == 0:
-
 #=============================================================================================
 
-            customers = [
-                ("Ali Yilmaz", "ali@mail.com"),
-                ("Ayse Demir", "ayse@mail.com"),
-                ("Mehmet Kara", "mehmet@mail.com"),
-                ("Zeynep Aydin", "zeynep@mail.com"),
-                ("Burak Aslan", "burak@mail.com")
-            ]
-            cursor.executemany("INSERT INTO Customers (name, email) VALUES (?, ?)", customers)
-
-#=============================================================================================
-
-            destinations = [
-                ("Paris", "France"),
-                ("Tokyo", "Japan"),
-                ("Rome", "Italy"),
-                ("New York", "USA"),
-                ("Dubai", "UAE"),
-                ("Istanbul", "Turkey"),
-                ("Barcelona", "Spain"),
-                ("Cairo", "Egypt"),
-                ("Nice", "France (Nice)") 
-            ]
-            cursor.executemany("INSERT INTO Destinations (city, country) VALUES (?, ?)", destinations)
-
-            services = [
-                ("TK101 Flight", 1500), ("LH404 Flight", 2000), ("BA505 Flight", 2500), ("AA100 Flight", 1800), ("JL777 Flight", 2200),
-                ("Hilton Paris", 3000), ("Rixos Antalya", 4500), ("Marriott Rome", 2800), ("Plaza NYC", 5000), ("Burj Al Arab", 8000)
-            ]
-            for i, (name, price) in enumerate(services):
-                cursor.execute("INSERT INTO Services (service_name, base_price) VALUES (?, ?)", (name, price))
-                service_id = cursor.lastrowid
-                if i < 5:
-                    cursor.execute("INSERT INTO Flights (flight_id, airline) VALUES (?, ?)", (service_id, name.split()[0]))
-                    for seat_no in ["1A", "1B", "2A", "2B"]:
-                        cursor.execute("INSERT INTO Seats (flight_id, seat_no) VALUES (?, ?)", (service_id, seat_no))
-                else: 
-                    cursor.execute("INSERT INTO Hotels (hotel_id, stars) VALUES (?, ?)", (service_id, 5))
-                    for room_no in ["101", "102", "201", "202"]:
-                        cursor.execute("INSERT INTO Rooms (hotel_id, room_no) VALUES (?, ?)", (service_id, room_no))
-
-#=============================================================================================
-
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Paris' LIMIT 1")
-            paris_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Tokyo' LIMIT 1")
-            tokyo_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Rome' LIMIT 1")
-            rome_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='New York' LIMIT 1")
-            ny_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Dubai' LIMIT 1")
-            dubai_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Istanbul' LIMIT 1")
-            ist_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Barcelona' LIMIT 1")
-            bar_id = cursor.fetchone()[0]
-            cursor.execute("SELECT dest_id FROM Destinations WHERE city='Cairo' LIMIT 1")
-            cai_id = cursor.fetchone()[0]
+# ===========================
+# FRONTEND 
+# ===========================
 
-#=============================================================================================
+def main():
+    add_bg() 
+    st.title("ᯓ ✈︎ Travel Booking & Reservation System")
+    st.markdown("### CMPE 351 Term Project | ID 122200058")
+    init_db()
+    start_maintenance()     # background jobs (checkpoints, statistics, repairs), once per process
 
-            packages = [
-                (paris_id, "Romantic Escape", 5000),
-                (tokyo_id, "Sakura Tour", 7000),
-                (rome_id, "Ancient Rome", 4000),
-                (ny_id, "NYC Lights", 6000),
-                (dubai_id, "Dubai Luxury", 9000),
-
-                (ist_id, "Türkiye Delight", 3500),
-                (bar_id, "Spain Fiesta", 3800),
-                (rome_id, "Italy Cultural Package", 5500),
-                (paris_id, "France Tour Deluxe", 6200),
-                (cai_id, "Egypt Nile Experience", 4800)
-            ]
-            cursor.executemany("INSERT INTO TravelPackages (dest_id, pkg_name, price) VALUES (?, ?, ?)", packages)
-
-            cursor.execute("SELECT service_id FROM Services LIMIT 10")
-            sids = [r[0] for r in cursor.fetchall()]
-            if len(sids) >= 10:
-                package_contents = [
-                    (1, sids[5]), (1, sids[0]),
-                    (2, sids[6]), (2, sids[1]),
-                    (3, sids[7]), (3, sids[2]),
-                    (4, sids[8]), (4, sids[3]),
-                    (5, sids[9]), (5, sids[4]),
-                    (6, sids[5]), (7, sids[6]),
-                    (8, sids[7]), (9, sids[5]),
-                    (10, sids[9])
-                ]
-                cursor.executemany("INSERT INTO PackageContents (pkg_id, service_id) VALUES (?, ?)", package_contents)
+    menu = st.sidebar.radio("Navigation", [" • Dashboard", " • Data Entry (CRUD)", " • Manage Bookings", " • Reports & SQL"])
 
-#=============================================================================================
-  
-            bookings = [
-                (1, 1, "2025-01-10", 0),
-                (2, 2, "2025-02-15", 0),
-                (3, 3, "2025-03-20", 0),
-                (4, 4, "2025-04-05", 0),
-                (1, 5, "2025-05-12", 0)
-            ]
-            cursor.executemany("INSERT INTO Bookings (cust_id, pkg_id, booking_date, is_paid) VALUES (?, ?, ?, ?)", bookings)
+    pages = {
+        " • Dashboard": show_dashboard,
+        " • Data Entry (CRUD)": show_data_entry,
+        " • Manage Bookings": show_bookings,
+        " • Reports & SQL": show_reports,
+    }
+    with profile_page(pages[menu].__name__):   # the query profiler attributes queries to the page
+        pages[menu]()
 
 #=============================================================================================
 
-            payments = [
-                (1, 5000), 
-                (2, 4000), 
-                (3, 4000), (4, 3000), (5, 9000)
-            ]
-            cursor.executemany("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", payments)
+def _grid_state(grid):
+    return st.session_state.setdefault(f"grid_{grid}", {"anchors": [None], "view": None})
 
-            cursor.execute("INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (1, ?, 1, '2025-01-10', '2025-01-15')", (sids[5],))
-            cursor.execute("INSERT INTO Tickets (booking_id, seat_id, issue_date) VALUES (1, 1, '2025-01-10')")
+def _grid_next(grid, anchor):
+    _grid_state(grid)["anchors"].append(anchor)
 
-            conn.commit()
+def _grid_prev(grid):
+    anchors = _grid_state(grid)["anchors"]
+    if len(anchors) > 1:
+        anchors.pop()
 
-    update_all_booking_payment_statuses()
+def paged_grid(grid, page_sizes=(25, 50, 100, 250)):
+    """Render a keyset-paginated grid and return the DataFrame of the visible page."""
+    spec = GRIDS[grid]
+    state = _grid_state(grid)
 
-#=============================================================================================
+    c1, c2, c3 = st.columns([2, 1, 1])
+    sort = c1.selectbox("Sort by", list(spec["sorts"]), key=f"{grid}_sort")
+    descending = c2.checkbox("Descending", value=spec.get("descending", False), key=f"{grid}_desc")
+    page_size = c3.selectbox("Rows per page", page_sizes, index=page_sizes.index(DEFAULT_PAGE_SIZE)
+                             if DEFAULT_PAGE_SIZE in page_sizes else 0, key=f"{grid}_size")
 
-def sum_payments_for_booking(booking_id):
-    res = run_query("SELECT COALESCE(SUM(amount),0) FROM Payments WHERE booking_id=?", (booking_id,))
-    return res[0][0] if res else 0
+    view = (sort, descending, page_size)
+    if state["view"] != view:
+        state["view"], state["anchors"] = view, [None]
 
-#=============================================================================================
-
-def get_package_price(pkg_id):
-    res = run_query("SELECT price FROM TravelPackages WHERE pkg_id=?", (pkg_id,))
-    return res[0][0] if res else 0
-
-#=============================================================================================
+    df, has_next, next_anchor = fetch_grid_page(grid, sort, descending, state["anchors"][-1], page_size)
+    st.dataframe(df, use_container_width=True)
 
-def update_booking_payment_status(booking_id):
-    """Set Bookings.is_paid depending on payments vs package price"""
-    total_paid = sum_payments_for_booking(booking_id)
-    res = run_query("SELECT pkg_id FROM Bookings WHERE booking_id=?", (booking_id,))
-    if not res:
-        return
-    pkg_id = res[0][0]
-    price = get_package_price(pkg_id)
-    status = 0
-    if total_paid <= 0:
-        status = 0
-    elif total_paid < price:
-        status = 1
-    else:
-        status = 2
-    run_query("UPDATE Bookings SET is_paid=? WHERE booking_id=?", (status, booking_id), fetch=False)
+    page_no = len(state["anchors"])
+    total = get_row_count(spec["count_table"])
+    first = (page_no - 1) * page_size + 1 if len(df) else 0
+    n1, n2, n3 = st.columns([1, 1, 4])
+    n1.button("◀ Prev", key=f"{grid}_prev", disabled=page_no == 1, on_click=_grid_prev, args=(grid,))
+    n2.button("Next ▶", key=f"{grid}_next", disabled=not has_next, on_click=_grid_next, args=(grid, next_anchor))
+    n3.caption(f"Page {page_no}  •  rows {first}–{first + len(df) - 1 if len(df) else 0} of {total:,}")
+    return df
 
 #=============================================================================================
 
-def update_all_booking_payment_statuses():
-    rows = run_query("SELECT booking_id FROM Bookings")
-    for r in rows:
-        update_booking_payment_status(r[0])
-
-# ===========================
-# FRONTEND 
-# ===========================
-
-def main():
-    add_bg() 
-    st.title("ᯓ ✈︎ Travel Booking & Reservation System")
-    st.markdown("### CMPE 351 Term Project | ID 122200058")
-    init_db()
-
-    menu = st.sidebar.radio("Navigation", [" • Dashboard", " • Data Entry (CRUD)", " • Manage Bookings", " • Reports & SQL"])
-
-    if menu == " • Dashboard":
-        show_dashboard()
-    elif menu == " • Data Entry (CRUD)":
-        show_data_entry()
-    elif menu == " • Manage Bookings":
-        show_bookings()
-    elif menu == " • Reports & SQL":
-        show_reports()
+def typeahead_select(label, source, key, limit=20):
+    """Search box + selectbox that only loads the best `limit` matches of the typed words
+    (full-text index; every word matches as a prefix)."""
+    text = st.text_input(f"Search {label}", key=f"{key}_search", placeholder="Type the first letters...")
+    labels = search_options(source, text, limit)
+    if not labels:
+        st.caption(f"No {label.lower()} matches '{text}'.")
+        return None
+    return st.selectbox(label, list(labels), format_func=labels.__getitem__, key=key)
 
 #=============================================================================================
 
 def show_dashboard():
     st.subheader("System Overview")
+    metrics = dashboard_metrics()
     col1, col2, col3, col4 = st.columns(4)
 
     with col1:
-        count = run_query("SELECT COUNT(*) FROM Customers")[0][0]
-        st.metric("Total Customers", count)
+        st.metric("Total Customers", metrics["customers"])
     with col2:
-        count = run_query("SELECT COUNT(*) FROM Bookings")[0][0]
-        st.metric("Total Bookings", count)
+        st.metric("Active Bookings", metrics["bookings"])
     with col3:
-        count = run_query("SELECT COUNT(*) FROM TravelPackages")[0][0]
-        st.metric("Packages Available", count)
+        st.metric("Packages Available", metrics["packages"])
     with col4:
-        revenue_row = run_query("SELECT COALESCE(SUM(amount),0) FROM Payments")[0][0]
-        st.metric("Total Revenue", f"${revenue_row:,.2f}")
+        st.metric("Revenue (active bookings)", f"${metrics['revenue']:,.2f}")
+    if metrics["archived_bookings"]:
+        st.caption(f"Not included here, in the chart or in the reports: {metrics['archived_bookings']:,} archived "
+                   f"bookings (${metrics['archived_revenue']:,.2f}). Reports → Include archived bookings shows them.")
+
+    latency = get_dashboard_stats().stats()
+    st.caption(f"Figures as of {datetime.fromtimestamp(metrics['as_of']):%H:%M:%S}"
+               f"{' (cached)' if metrics['cached'] else ''}  •  produced in {metrics['elapsed_ms']:.1f} ms  •  "
+               f"p95 {latency['p95_ms']:.1f} ms (target {DASHBOARD_TARGET_MS} ms)")
+
+    st.markdown("#### Revenue (active bookings)")
+    grain = st.radio("Revenue per", ["month", "day"], horizontal=True, key="revenue_grain")
+    since = "" if grain == "month" else (datetime.now().date() - timedelta(days=90)).isoformat()
+    series = revenue_series(grain, since)
+    if series.empty:
+        st.info("No payments yet.")
+    else:
+        st.bar_chart(series.set_index("period")["amount"])
 
     if os.path.exists(BG_IMAGE):
         st.image(BG_IMAGE, use_column_width=True, caption="Travel the World")
     else:
         st.image("C:\TravelBookingProject\deneme-1.png", use_column_width=True, caption="Travel the World")
 
-    df = get_dataframe("""
-        SELECT b.booking_id, b.booking_date, c.name as customer, tp.pkg_name as package,
-               b.is_paid
-        FROM Bookings b
-        JOIN Customers c ON b.cust_id = c.cust_id
-        JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
-        ORDER BY b.booking_date DESC
-        LIMIT 10
-    """)
+    df = pd.DataFrame(metrics["recent_rows"], columns=metrics["recent_columns"])
     if not df.empty:
         df['Payment Status'] = df['is_paid'].map({0: 'Unpaid', 1: 'Partial', 2: 'Paid'})
         st.dataframe(df.drop(columns=['is_paid']), use_container_width=True)
@@ -432,6 +195,7 @@ def show_dashboard():
 
 def show_data_entry():
     st.header("📂 Data Management")
+    catalog = get_catalog()
     tab1, tab2, tab3, tab4 = st.tabs(["Customers", "Destinations", "Services", "Packages"])
     with tab1:
         st.subheader("Manage Customers")
@@ -442,7 +206,7 @@ def show_data_entry():
             if st.form_submit_button(" Add Customer"):
                 if name and email:
                     try:
-                        run_query("INSERT INTO Customers (name, email) VALUES (?, ?)", (name, email), fetch=False)
+                        add_customer(name, email)
                         st.success(f"Customer {name} added!")
                         time.sleep(0.5)
                         st.rerun()
@@ -451,15 +215,14 @@ def show_data_entry():
                 else:
                     st.error("Please provide both name and email.")
 
-        cust_df = get_dataframe("SELECT * FROM Customers")
-        st.dataframe(cust_df, use_container_width=True)
+        cust_df = paged_grid("customers")
 
         if not cust_df.empty:
             c1, c2 = st.columns(2)
             with c1:
                 del_id = st.selectbox("Select Customer to Delete", cust_df['cust_id'], key="del_c")
                 if st.button(" Delete Customer"):
-                    run_query("DELETE FROM Customers WHERE cust_id=?", (del_id,), fetch=False)
+                    delete_customer(del_id)
                     st.warning("Customer deleted.")
                     st.rerun()
 
@@ -469,10 +232,7 @@ def show_data_entry():
                 new_email = st.text_input("New Email", key="new_email")
                 if st.button(" Update Customer"):
                     if new_name or new_email:
-                        if new_name:
-                            run_query("UPDATE Customers SET name=? WHERE cust_id=?", (new_name, upd_id), fetch=False)
-                        if new_email:
-                            run_query("UPDATE Customers SET email=? WHERE cust_id=?", (new_email, upd_id), fetch=False)
+                        update_customer(upd_id, name=new_name or None, email=new_email or None)
                         st.success("Customer updated.")
                         st.rerun()
                     else:
@@ -486,21 +246,19 @@ def show_data_entry():
             country = c2.text_input("Country")
             if st.form_submit_button(" Add Destination"):
                 if city and country:
-                    run_query("INSERT INTO Destinations (city, country) VALUES (?, ?)", (city, country), fetch=False)
+                    add_destination(city, country)
                     st.success("Destination added!")
                     st.rerun()
                 else:
                     st.error("Provide both city and country.")
 
-        st.dataframe(get_dataframe("SELECT * FROM Destinations"), use_container_width=True)
-
-        dests = get_dataframe("SELECT * FROM Destinations")
+        dests = paged_grid("destinations")
         if not dests.empty:
             c1, c2 = st.columns(2)
             with c1:
                 del_id = st.selectbox("Select Destination to Delete", dests['dest_id'], key="del_dest")
                 if st.button(" Delete Destination"):
-                    run_query("DELETE FROM Destinations WHERE dest_id=?", (del_id,), fetch=False)
+                    delete_destination(del_id)
                     st.warning("Destination deleted.")
                     st.rerun()
 
@@ -509,10 +267,7 @@ def show_data_entry():
                 new_city = st.text_input("New City", key="new_city")
                 new_country = st.text_input("New Country", key="new_country")
                 if st.button(" Update Destination"):
-                    if new_city:
-                        run_query("UPDATE Destinations SET city=? WHERE dest_id=?", (new_city, upd_id), fetch=False)
-                    if new_country:
-                        run_query("UPDATE Destinations SET country=? WHERE dest_id=?", (new_country, upd_id), fetch=False)
+                    update_destination(upd_id, city=new_city or None, country=new_country or None)
                     st.success("Destination updated.")
                     st.rerun()
 
@@ -535,47 +290,24 @@ def show_data_entry():
                 if not name:
                     st.error("Service name required.")
                 else:
-                    conn = db_connect()
-                    cur = conn.cursor()
-
-                    cur.execute("INSERT INTO Services (service_name, base_price) VALUES (?, ?)", (name, price))
-                    new_id = cur.lastrowid
-
-                    if type_choice == "Flight":
-                        cur.execute("INSERT INTO Flights (flight_id, airline) VALUES (?, ?)", (new_id, extra))
-                        for seat_no in ["1A","1B","2A","2B"]:
-                            cur.execute("INSERT INTO Seats (flight_id, seat_no) VALUES (?, ?)", (new_id, seat_no))
-                    else:
-                        cur.execute("INSERT INTO Hotels (hotel_id, stars) VALUES (?, ?)", (new_id, extra))
-                        for room_no in ["101","102","201","202"]:
-                            cur.execute("INSERT INTO Rooms (hotel_id, room_no) VALUES (?, ?)", (new_id, room_no))
-
-                    conn.commit()
-                    conn.close()
+                    new_id = add_service(type_choice, name, price, extra)
                     st.success(f"{type_choice} Added with ID {new_id}")
                     st.rerun()
 
         st.markdown("#### All Services")
-        services_df = get_dataframe("""
-            SELECT s.service_id, s.service_name, s.base_price,
-                   f.airline AS 'Airline (If Flight)',
-                   h.stars AS 'Stars (If Hotel)'
-            FROM Services s
-            LEFT JOIN Flights f ON s.service_id = f.flight_id
-            LEFT JOIN Hotels h ON s.service_id = h.hotel_id
-        """)
-        st.dataframe(services_df, use_container_width=True)
+        services_df = paged_grid("services")
         st.markdown("###  Delete Service")
 
         if not services_df.empty:
+            service_labels = option_labels(services_df, "service_id", "{service_name}")
             del_service = st.selectbox(
                 "Select Service to Delete",
-                services_df["service_id"],
-                format_func=lambda x: services_df[services_df["service_id"] == x]["service_name"].values[0]
+                list(service_labels),
+                format_func=service_labels.__getitem__
             )
 
             if st.button(" Delete Service"):
-                run_query("DELETE FROM Services WHERE service_id=?", (del_service,), fetch=False)
+                delete_service(del_service)
                 st.warning("Service deleted.")
                 st.rerun()
         else:
@@ -585,44 +317,35 @@ def show_data_entry():
         st.subheader("Manage Travel Packages")
 
         with st.form("add_pkg", clear_on_submit=True):
-            dests = get_dataframe("SELECT dest_id, city, country FROM Destinations")
-            if dests.empty:
+            dest_labels = catalog.labels("destinations")
+            if not dest_labels:
                 st.info("Add destinations first.")
             else:
-                dest_map = {row['dest_id']: f"{row['city']}, {row['country']}" for _, row in dests.iterrows()}
                 pkg_name = st.text_input("Package Name")
+                auto_price = st.checkbox("Price from contents (sum of service prices, markup, discount)")
                 pkg_price = st.number_input("Package Price", min_value=0.0, step=10.0)
-                dest_choice = st.selectbox("Destination", options=list(dest_map.keys()), 
-                                           format_func=lambda x: dest_map[x])
+                m1, m2 = st.columns(2)
+                markup = m1.number_input("Markup %", min_value=0.0, step=1.0)
+                discount = m2.number_input("Discount %", min_value=0.0, max_value=100.0, step=1.0)
+                dest_choice = st.selectbox("Destination", options=list(dest_labels), format_func=dest_labels.get)
 
                 if st.form_submit_button("Add Package"):
                     if pkg_name:
-                        run_query("INSERT INTO TravelPackages (dest_id, pkg_name, price) VALUES (?, ?, ?)",
-                                  (dest_choice, pkg_name, pkg_price), fetch=False)
+                        add_package(dest_choice, pkg_name, None if auto_price else pkg_price, markup, discount)
                         st.success("Package added.")
                         st.rerun()
                     else:
                         st.error("Package name required.")
 
         st.markdown("#### All Packages")
-        st.dataframe(
-            get_dataframe("""
-                SELECT tp.pkg_id, tp.pkg_name, tp.price,
-                       d.city || ', ' || d.country AS destination
-                FROM TravelPackages tp
-                JOIN Destinations d ON tp.dest_id = d.dest_id
-            """),
-            use_container_width=True,
-        )
-
-        pkgs = get_dataframe("SELECT pkg_id, pkg_name, price FROM TravelPackages")
+        pkgs = paged_grid("packages")
 
         if not pkgs.empty:
             c1, c2 = st.columns(2)
             with c1:
                 del_id = st.selectbox("Select Package to Delete", pkgs['pkg_id'], key="del_pkg")
                 if st.button("Delete Package"):
-                    run_query("DELETE FROM TravelPackages WHERE pkg_id=?", (del_id,), fetch=False)
+                    delete_package(del_id)
                     st.warning("Package deleted.")
                     st.rerun()
 
@@ -631,49 +354,59 @@ def show_data_entry():
                 new_name = st.text_input("New Package Name", key="new_pkg_name")
                 new_price = st.number_input("New Package Price", min_value=0.0, step=10.0, key="new_pkg_price")
                 if st.button("Update Package"):
-                    if new_name:
-                        run_query("UPDATE TravelPackages SET pkg_name=? WHERE pkg_id=?", (new_name, upd_id), fetch=False)
-                    if new_price:
-                        run_query("UPDATE TravelPackages SET price=? WHERE pkg_id=?", (new_price, upd_id), fetch=False)
+                    update_package(upd_id, name=new_name or None, price=new_price or None)
                     st.success("Package updated.")
                     st.rerun()
 
-        st.markdown("#### Manage Package Contents (Which services a package contains)")
+            st.markdown("#### Pricing")
+            quote = quote_package(upd_id, store=False)      # no write per render; "Reprice Whole Catalog" caches quotes
+            pkg = catalog.packages.get(upd_id)
+            if quote and pkg:
+                price, markup, discount, auto = pkg.price, pkg.markup_pct, pkg.discount_pct, pkg.auto_price
+                q1, q2, q3 = st.columns(3)
+                q1.metric("Current Price", "—" if price is None else f"${price:,.2f}")
+                q2.metric("Computed Quote", f"${quote['price']:,.2f}",
+                          delta=None if price is None else f"{quote['price'] - price:,.2f}")
+                q3.metric("Services Total", f"${quote['contents_total']:,.2f}")
+                st.caption(f"{quote['services']} service(s)  •  "
+                           f"{'quoted ' + str(quote['quoted_at']) + ' (cached)' if quote['cached'] else 'computed now'}  •  price is "
+                           f"{'computed from contents' if auto else 'set by hand'}")
+                r1, r2, r3 = st.columns(3)
+                new_auto = r1.checkbox("Price from contents", value=bool(auto), key=f"auto_{upd_id}")
+                new_markup = r2.number_input("Markup %", min_value=0.0, value=float(markup), step=1.0, key=f"markup_{upd_id}")
+                new_discount = r3.number_input("Discount %", min_value=0.0, max_value=100.0, value=float(discount),
+                                               step=1.0, key=f"discount_{upd_id}")
+                if st.button("Save Pricing Rules"):
+                    set_package_pricing(upd_id, auto_price=new_auto, markup_pct=new_markup, discount_pct=new_discount)
+                    st.success("Pricing updated.")
+                    st.rerun()
+            if st.button("Reprice Whole Catalog"):
+                result = reprice_catalog()
+                st.success(f"{result['quoted']} package(s) quoted, {result['repriced']} auto-priced package(s) repriced.")
 
-        pkgs = get_dataframe("SELECT pkg_id, pkg_name FROM TravelPackages")
-        services = get_dataframe("SELECT service_id, service_name FROM Services")
+        st.markdown("#### Manage Package Contents (Which services a package contains)")
 
-        if pkgs.empty or services.empty:
+        if get_row_count("TravelPackages") == 0 or get_row_count("Services") == 0:
             st.info("Add packages and services to manage contents.")
         else:
             pcol1, pcol2 = st.columns(2)
 
             with pcol1:
-                chosen_pkg = st.selectbox("Choose Package", pkgs['pkg_id'], 
-                                          format_func=lambda x: pkgs[pkgs['pkg_id']==x]['pkg_name'].values[0])
-                chosen_service = st.selectbox("Choose Service to Add", services['service_id'],
-                                              format_func=lambda x: services[services['service_id']==x]['service_name'].values[0])
-
-                if st.button(" Add Service to Package"):
-                    run_query("INSERT INTO PackageContents (pkg_id, service_id) VALUES (?, ?)",
-                              (chosen_pkg, chosen_service), fetch=False)
+                chosen_pkg = typeahead_select("Choose Package", "packages", key="pc_pkg")
+                chosen_service = typeahead_select("Choose Service to Add", "services", key="pc_service")
+
+                if st.button(" Add Service to Package", disabled=chosen_pkg is None or chosen_service is None):
+                    add_package_service(chosen_pkg, chosen_service)
                     st.success("Service added to package.")
                     st.rerun()
 
             with pcol2:
-                dfpc = get_dataframe("""
-                    SELECT pc.id, tp.pkg_name, s.service_name
-                    FROM PackageContents pc
-                    JOIN TravelPackages tp ON pc.pkg_id = tp.pkg_id
-                    JOIN Services s ON pc.service_id = s.service_id
-                    ORDER BY pc.id DESC
-                """)
-                st.dataframe(dfpc, use_container_width=True)
+                dfpc = paged_grid("package_contents")
 
                 if not dfpc.empty:
                     del_row = st.selectbox("Select PackageContent ID to delete", dfpc['id'])
                     if st.button("Remove selected content"):
-                        run_query("DELETE FROM PackageContents WHERE id=?", (del_row,), fetch=False)
+                        remove_package_content(del_row)
                         st.success("Removed.")
                         st.rerun()
 
@@ -684,59 +417,76 @@ def show_bookings():
     st.header("📅 Manage Bookings")
     st.subheader("Create New Booking")
 
-    customers = get_dataframe("SELECT cust_id, name FROM Customers")
-    packages = get_dataframe("SELECT pkg_id, pkg_name, price FROM TravelPackages")
-
-    if customers.empty or packages.empty:
+    if get_row_count("Customers") == 0 or get_row_count("TravelPackages") == 0:
         st.warning("Please add Customers and Packages first.")
     else:
+        s1, s2 = st.columns(2)
+        with s1:
+            cust_idx = typeahead_select("Customer", "customers", key="new_booking_cust")
+        with s2:
+            pkg_idx = typeahead_select("Package", "packages", key="new_booking_pkg")
         with st.form("new_booking"):
             c1, c2, c3 = st.columns(3)
-            cust_idx = c1.selectbox("Customer", customers['cust_id'], format_func=lambda x: customers[customers['cust_id']==x]['name'].values[0])
-            pkg_idx = c2.selectbox("Package", packages['pkg_id'], format_func=lambda x: f"{packages[packages['pkg_id']==x]['pkg_name'].values[0]} (${packages[packages['pkg_id']==x]['price'].values[0]})")
-            date = c3.date_input("Booking Date")
+            date = c1.date_input("Booking Date")
+            travellers = c2.number_input("Travellers", min_value=1, max_value=1000, value=1, step=1,
+                                         help="More than one books the package for a group in one go, rooms and seats side by side")
+            deposit = c3.number_input("Deposit per Traveller ($)", min_value=0.0)
+            reserve = st.checkbox("Reserve a room in each hotel and a seat on each flight of the package")
+            c4, c5 = st.columns(2)
+            check_in = c4.date_input("Check-in", value=datetime.now().date(), key="booking_check_in")
+            check_out = c5.date_input("Check-out", value=datetime.now().date() + timedelta(days=1), key="booking_check_out")
             if st.form_submit_button("Confirm Booking"):
-                run_query("INSERT INTO Bookings (cust_id, pkg_id, booking_date) VALUES (?, ?, ?)", (cust_idx, pkg_idx, date), fetch=False)
-                st.success("Booking Created Successfully!")
+                if cust_idx is None or pkg_idx is None:
+                    st.error("Pick a customer and a package first.")
+                    st.stop()
+                if reserve and check_out <= check_in:
+                    st.error("Check-out must be after check-in.")
+                    st.stop()
+                try:
+                    booked = create_group_booking([cust_idx] * travellers, pkg_idx, date,
+                                                  *((check_in, check_out) if reserve else ()), deposit=deposit)
+                except AllocationError as e:
+                    st.error(f"Booking not created: {e}")
+                    st.stop()
+                st.success(f"{len(booked['booking_ids'])} Booking(s) Created Successfully!")
+                if booked["rooms"] or booked["seats"]:
+                    st.info(f"Reserved {sum(map(len, booked['rooms'].values()))} room(s) and "
+                            f"{sum(map(len, booked['seats'].values()))} seat(s).")
                 time.sleep(1)
                 st.rerun()
 
     st.divider()
     st.subheader("Manage Existing Bookings (Update / Delete)")
-    bookings = get_dataframe("SELECT b.booking_id, b.booking_date, c.name, tp.pkg_name, b.is_paid FROM Bookings b JOIN Customers c ON b.cust_id = c.cust_id JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id")
+    bookings = paged_grid("bookings")
     if bookings.empty:
         st.info("No bookings yet.")
     else:
-        st.dataframe(bookings, use_container_width=True)
         b1, b2 = st.columns(2)
         with b1:
             sel_booking = st.selectbox("Choose Booking to Update", bookings['booking_id'], format_func=lambda x: f"ID {x}")
-            new_pkg = st.selectbox("New Package", packages['pkg_id'], format_func=lambda x: f"{packages[packages['pkg_id']==x]['pkg_name'].values[0]}")
+            new_pkg = typeahead_select("New Package", "packages", key="upd_booking_pkg")
             new_date = st.date_input("New Booking Date")
-            if st.button("Update Booking"):
-                run_query("UPDATE Bookings SET pkg_id=?, booking_date=? WHERE booking_id=?", (new_pkg, new_date, sel_booking), fetch=False)
-                update_booking_payment_status(sel_booking)
+            if st.button("Update Booking", disabled=new_pkg is None):
+                update_booking(sel_booking, new_pkg, new_date)
                 st.success("Booking updated.")
                 st.rerun()
         with b2:
             del_booking = st.selectbox("Choose Booking to Delete", bookings['booking_id'], format_func=lambda x: f"ID {x}", key="del_booking")
             if st.button(" Delete Booking"):
-                run_query("DELETE FROM Bookings WHERE booking_id=?", (del_booking,), fetch=False)
+                delete_booking(del_booking)
                 st.warning("Booking deleted (and related payments/tickets/reservations cascaded).")
                 st.rerun()
 
     st.divider()
     st.subheader("Process Payment")
-    booking_list = get_dataframe("SELECT b.booking_id, c.name, tp.pkg_name, tp.price FROM Bookings b JOIN Customers c ON b.cust_id=c.cust_id JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id")
-    if booking_list.empty:
+    if get_row_count("Bookings") == 0:
         st.info("No bookings to process payment.")
     else:
+        bsel = typeahead_select("Booking (by customer name)", "bookings", key="pay_booking")
         with st.form("new_payment"):
-            bsel = st.selectbox("Select Booking", booking_list['booking_id'], format_func=lambda x: f"ID {x}: {booking_list[booking_list['booking_id']==x]['name'].values[0]} - {booking_list[booking_list['booking_id']==x]['pkg_name'].values[0]}")
             amt = st.number_input("Amount ($)", min_value=0.0)
-            if st.form_submit_button("Add Payment"):
-                run_query("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", (bsel, amt), fetch=False)
-                update_booking_payment_status(bsel)
+            if st.form_submit_button("Add Payment", disabled=bsel is None):
+                add_payment(bsel, amt)
                 st.success("Payment Recorded!")
                 st.rerun()
 
@@ -747,64 +497,228 @@ def show_reports():
 
     st.markdown("### 1. Comprehensive Booking Report (Complex JOIN)")
     st.markdown("Displays who booked what, where they are going, and total payments.")
-    sql = """
-    SELECT
-        b.booking_id AS ID,
-        b.booking_date AS Date,
-        c.name AS Customer,
-        c.email AS Contact,
-        tp.pkg_name AS Package,
-        tp.price AS Package_Price,
-        d.city || ', ' || d.country AS Destination,
-        COALESCE(SUM(pay.amount), 0) AS Total_Paid,
-        CASE b.is_paid WHEN 0 THEN 'Unpaid' WHEN 1 THEN 'Partial' WHEN 2 THEN 'Paid' ELSE 'Unknown' END AS Payment_Status
-    FROM Bookings b
-    JOIN Customers c ON b.cust_id = c.cust_id
-    JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
-    JOIN Destinations d ON tp.dest_id = d.dest_id
-    LEFT JOIN Payments pay ON b.booking_id = pay.booking_id
-    GROUP BY b.booking_id
-    ORDER BY b.booking_date DESC
-    """
-    df = get_dataframe(sql)
+    catalog = get_catalog()
+    dest_labels = {None: "All destinations", **catalog.labels("destinations")}
+    f1, f2, f3 = st.columns(3)
+    dates = f1.date_input("Booking dates", value=(), key="report_dates")
+    dest_id = f2.selectbox("Destination", list(dest_labels), format_func=dest_labels.get, key="report_dest")
+    fmt = f3.radio("Export format", ["csv", "parquet"] if parquet_available() else ["csv"],
+                   horizontal=True, key="report_format")
+    history = st.checkbox("Include archived bookings", key="report_history",
+                          help="Bookings moved to the archive database by the archive maintenance job. "
+                               "Slower: the archived rows have to be read and sorted as well.")
+    engine = st.radio("Report engine", ["sql", "columnar"] if parquet_available() else ["sql"], horizontal=True,
+                      key="report_engine", help="columnar: pandas over a Parquet snapshot of the tables, refreshed by "
+                                                "the analytics maintenance job (see Columnar analytics below)")
+    filters = {"date_from": dates[0] if len(dates) > 0 else None,
+               "date_to": dates[1] if len(dates) > 1 else None, "dest_id": dest_id, "history": history}
+    if engine == "columnar":
+        if history:
+            st.caption("Archived bookings are only in the database: the reports below use SQL.")
+        elif not any(t["parts"] for t in analytics_status()["tables"].values()):
+            with st.spinner("Writing the analytics snapshot..."):
+                refresh_analytics()
+
+    # the page shows only the newest rows; the full report is streamed to a file on request
+    df = report_frame("booking report", engine, **filters, limit=EXPORT_PREVIEW_ROWS)
+    st.caption(f"Newest {EXPORT_PREVIEW_ROWS:,} matching bookings. Export for the full report.")
     st.dataframe(df, use_container_width=True)
+    if st.button("Prepare export"):
+        old_export = st.session_state.pop("report_export", None)
+        if old_export and os.path.exists(old_export["path"]):
+            os.remove(old_export["path"])
+        fd, path = tempfile.mkstemp(prefix="booking_report_", suffix=f".{fmt}")
+        os.close(fd)
+        with st.spinner("Exporting..."):
+            rows = export_booking_report(path, fmt, **filters)
+        st.session_state["report_export"] = {"path": path, "fmt": fmt, "rows": rows}
+    export = st.session_state.get("report_export")
+    if export and os.path.exists(export["path"]):
+        with open(export["path"], "rb") as f:
+            st.download_button(f"Download {export['rows']:,} rows ({export['fmt'].upper()}, "
+                               f"{os.path.getsize(export['path']) / 1024 / 1024:,.1f} MB)", f,
+                               file_name=f"booking_report.{export['fmt']}",
+                               mime="text/csv" if export["fmt"] == "csv" else "application/octet-stream")
 
     st.divider()
 
     st.markdown("### 2. Service Inventory Status")
+    hotels_df = get_dataframe(HOTEL_INVENTORY_SQL)
+    flights_df = get_dataframe(FLIGHT_INVENTORY_SQL)
     col1, col2 = st.columns(2)
     with col1:
         st.caption("Hotel Rooms")
-        st.dataframe(get_dataframe("""
-            SELECT h.hotel_id, s.service_name, COUNT(r.room_id) as Total_Rooms
-            FROM Hotels h
-            JOIN Services s ON h.hotel_id = s.service_id
-            LEFT JOIN Rooms r ON h.hotel_id = r.hotel_id
-            GROUP BY h.hotel_id
-        """), use_container_width=True)
+        st.dataframe(hotels_df, use_container_width=True)
     with col2:
         st.caption("Flight Seats")
-        st.dataframe(get_dataframe("""
-            SELECT f.flight_id, s.service_name, f.airline, COUNT(st.seat_id) as Total_Seats
-            FROM Flights f
-            JOIN Services s ON f.flight_id = s.service_id
-            LEFT JOIN Seats st ON f.flight_id = st.flight_id
-            GROUP BY f.flight_id
-        """), use_container_width=True)
+        st.dataframe(flights_df, use_container_width=True)
+    st.caption("Hotel Stays (active bookings)")
+    st.dataframe(report_frame("hotel stays", engine), use_container_width=True)
+
+    st.markdown("#### Availability")
+    d1, d2 = st.columns(2)
+    check_in = d1.date_input("Check-in", value=datetime.now().date(), key="avail_in")
+    check_out = d2.date_input("Check-out", value=datetime.now().date() + timedelta(days=1), key="avail_out")
+    if check_out <= check_in:
+        st.warning("Check-out must be after check-in.")
+    else:
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            hotel_labels = option_labels(hotels_df, "hotel_id", "{service_name}")
+            if hotel_labels:
+                hotel_id = st.selectbox("Hotel", list(hotel_labels), format_func=hotel_labels.get, key="avail_hotel")
+                rooms = free_rooms(hotel_id, check_in, check_out)
+                st.caption(f"{len(rooms)} free room(s)")
+                st.dataframe(pd.DataFrame(rooms, columns=["room_id", "room_no"]), use_container_width=True)
+        with col2:
+            dest_labels = catalog.labels("destinations")
+            if dest_labels:
+                dest_id = st.selectbox("Destination (all hotels)", list(dest_labels), format_func=dest_labels.get, key="avail_dest")
+                dest_rooms = free_rooms_for_destination(dest_id, check_in, check_out)
+                st.caption(f"{len(dest_rooms)} free room(s)")
+                st.dataframe(dest_rooms, use_container_width=True)
+        with col3:
+            flight_labels = option_labels(flights_df, "flight_id", "{service_name}")
+            if flight_labels:
+                flight_id = st.selectbox("Flight", list(flight_labels), format_func=flight_labels.get, key="avail_flight")
+                seats = free_seats(flight_id)
+                st.caption(f"{len(seats)} free seat(s)")
+                st.dataframe(pd.DataFrame(seats, columns=["seat_id", "seat_no"]), use_container_width=True)
 
     st.divider()
     st.markdown("### 3. Customer Spending Report")
-    st.markdown("Total paid per customer")
-    rpt = get_dataframe("""
-        SELECT c.cust_id, c.name, c.email, COALESCE(SUM(p.amount),0) AS total_paid
-        FROM Customers c
-        LEFT JOIN Bookings b ON c.cust_id = b.cust_id
-        LEFT JOIN Payments p ON b.booking_id = p.booking_id
-        GROUP BY c.cust_id
-        ORDER BY total_paid DESC
-    """)
+    st.markdown("Total paid per customer" + (", archived bookings included" if history else ", active bookings only"))
+    rpt = report_frame("customer spending", engine, history=history)
     st.dataframe(rpt, use_container_width=True)
 
+    st.markdown("### 4. Revenue by Destination and Package")
+    st.markdown("Active bookings only")
+    r1, r2 = st.columns(2)
+    r1.dataframe(report_frame("revenue by destination", engine), use_container_width=True)
+    r2.dataframe(report_frame("revenue by package", engine), use_container_width=True)
+
+    with st.expander("Database connection pool"):
+        stats = get_pool_stats()
+        p1, p2, p3, p4 = st.columns(4)
+        p1.metric("Connections Opened", stats["opens"])
+        p2.metric("Reuses", stats["reuses"])
+        p3.metric("Waits", stats["waits"])
+        p4.metric("Total Wait", f"{stats['wait_time_ms']:.1f} ms")
+        st.caption(f"In use: {stats['in_use']} / {stats['max_size']}  •  Idle: {stats['idle']}")
+        lock = get_lock_stats().stats()
+        l1, l2, l3, l4 = st.columns(4)
+        l1.metric("Write Transactions", lock["transactions"])
+        l2.metric("Busy Retries", lock["retries"])
+        l3.metric("p95 Lock Wait", f"{lock['p95_wait_ms']:.1f} ms")
+        l4.metric("Max Lock Wait", f"{lock['max_wait_ms']:.1f} ms")
+        st.caption(f"Average lock wait: {lock['avg_wait_ms']:.2f} ms  •  Gave up after "
+                   f"{WRITE_MAX_ATTEMPTS} attempts: {lock['gave_up']}")
+        snap = get_snapshot_stats().stats()
+        s1, s2, s3, s4 = st.columns(4)
+        s1.metric("Report Reads (read-only)", snap["reads"])
+        s2.metric("Stale Reads", snap["stale_reads"])
+        s3.metric("Max Staleness", f"{snap['max_stale_ms']:.1f} ms")
+        s4.metric("p95 Read Wait", f"{snap['p95_wait_ms']:.1f} ms")
+        st.caption(f"Reports, dashboard and exports read from {DB_READ_POOL_SIZE} read-only connections; a read is "
+                   f"stale when a booking committed while it ran (p95 staleness {snap['p95_stale_ms']:.1f} ms)")
+
+    with st.expander("Background maintenance"):
+        scheduler = get_maintenance_scheduler()
+        runs = get_dataframe("SELECT job, started_at, last_ms, runs, last_result FROM MaintenanceRuns", cached=False)
+        runs["started_at"] = pd.to_datetime(runs["started_at"], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+        local = scheduler.stats()
+        runs["longest lock (ms)"] = runs["job"].map(lambda job: local.get(job, {}).get("max_lock_ms"))
+        runs["every (s)"] = runs["job"].map(scheduler.intervals)
+        st.dataframe(runs, use_container_width=True)
+        st.caption(f"Scheduler thread {'running' if scheduler.running() else 'stopped'}  •  jobs keep each write "
+                   f"transaction under ~{MAINTENANCE_LOCK_BUDGET_MS} ms  •  longest lock is for runs in this process")
+        archived = archive_status()
+        st.caption(f"Archive: {archived['bookings']:,} bookings, {archived['payments']:,} payments "
+                   f"(${archived['revenue']:,.2f}) in {os.path.basename(archived['file'])} "
+                   f"({archived['file_bytes'] / 1024 / 1024:,.1f} MB)  •  last cutoff {archived['cutoff'] or '-'}  •  "
+                   f"the archive job moves paid bookings older than {ARCHIVE_AFTER_DAYS} days")
+        job = st.selectbox("Job", list(MAINTENANCE_JOBS), key="maintenance_job")
+        if st.button("Run Now", key="maintenance_run"):
+            st.success(f"{job}: {scheduler.run_job(job, force=True)}")
+
+    with st.expander("Columnar analytics"):
+        if parquet_available():
+            analytics = analytics_status()
+            tables = pd.DataFrame.from_dict(analytics["tables"], orient="index")
+            tables["MB"] = tables.pop("bytes") / 1024 / 1024
+            tables["written_at"] = pd.to_datetime(tables["written_at"], unit="s").dt.strftime("%Y-%m-%d %H:%M:%S")
+            st.dataframe(tables, use_container_width=True)
+            st.caption(f"Parquet parts of {2 ** ANALYTICS_PART_BITS:,} rows in {os.path.basename(analytics['dir'])}  •  "
+                       f"{analytics['pending_parts']} part(s) changed since the last refresh  •  the analytics job "
+                       f"rewrites only those")
+            a1, a2 = st.columns(2)
+            if a1.button("Refresh snapshot", key="analytics_refresh"):
+                with st.spinner("Refreshing..."):
+                    st.success(f"analytics: {refresh_analytics()}")
+            if a2.button("Compare engines", key="analytics_compare"):
+                with st.spinner("Running every report on both engines..."):
+                    st.session_state["engine_comparison"] = compare_report_engines(**{**filters, "limit": EXPORT_PREVIEW_ROWS})
+            comparison = st.session_state.get("engine_comparison")
+            if comparison:
+                st.dataframe(pd.DataFrame(comparison), use_container_width=True)
+                st.caption("Same filters as the booking report above, archive excluded; sql_ms without the result cache.")
+        else:
+            st.caption("Install pyarrow to build the snapshot and use the columnar engine.")
+
+    with st.expander("Query result cache"):
+        stats = get_query_cache().stats()
+        q1, q2, q3, q4 = st.columns(4)
+        q1.metric("Hits", stats["hits"])
+        q2.metric("Misses", stats["misses"])
+        q3.metric("Invalidations", stats["invalidations"])
+        q4.metric("External Flushes", stats["external_flushes"])
+        st.caption(f"{stats['entries']} entries  •  {stats['bytes'] / 1024:,.0f} KB of "
+                   f"{stats['max_bytes'] / 1024 / 1024:,.0f} MB  •  Evictions: {stats['evictions']}  •  "
+                   f"Stale results dropped: {stats['stale_puts']}")
+        st.caption(f"Catalog: {len(catalog.destinations)} destinations, {len(catalog.packages)} packages, "
+                   f"{len(catalog.services)} services in {catalog.size_bytes() / 1024:,.0f} KB")
+        if st.button("Clear cache"):
+            get_query_cache().clear()
+            st.rerun()
+
+    with st.expander("Query profiler & slow queries"):
+        profiler = get_query_profiler()
+        profiler.slow_ms = st.number_input("Log queries slower than (ms)", min_value=1,
+                                           value=int(profiler.slow_ms), step=50)
+        order = st.selectbox("Top offenders by", ["total_ms", "avg_ms", "p95_ms", "max_ms", "calls"])
+        top = profiler.top(20, order)
+        if top:
+            df = pd.DataFrame(top)
+            buckets = [f"≤{b}" for b in PROFILE_BUCKETS_MS] + [f">{PROFILE_BUCKETS_MS[-1]}"]
+            df["histogram (ms)"] = df["histogram"].map(lambda h: "  ".join(f"{b}:{n}" for b, n in zip(buckets, h) if n))
+            st.dataframe(df.drop(columns=["histogram"]), use_container_width=True)
+        else:
+            st.info("No queries profiled yet.")
+
+        slow = profiler.slow_queries()
+        st.markdown(f"**Slow query log** ({len(slow)} most recent)")
+        for entry in slow[:10]:
+            st.caption(f"{datetime.fromtimestamp(entry['at']):%H:%M:%S}  •  {entry['ms']:.1f} ms  •  "
+                       f"{entry['rows']} rows  •  {entry['page']}  •  params {entry['params']}")
+            st.code(f"{entry['sql']}\n\n-- plan:\n{entry['plan']}", language="sql")
+        if st.button("Reset profile"):
+            profiler.reset()
+            st.rerun()
+
+    with st.expander("Indexes & query plan audit"):
+        st.dataframe(pd.DataFrame(index_status(), columns=["index", "table", "columns", "present"]),
+                     use_container_width=True)
+        large_rows = st.number_input("Flag full scans on tables with at least this many rows",
+                                     min_value=0, value=AUDIT_LARGE_TABLE_ROWS, step=1000)
+        if st.button("Run EXPLAIN QUERY PLAN audit"):
+            audit = pd.DataFrame(audit_query_plans(large_rows))
+            flagged = audit[audit["flagged"]]
+            if flagged.empty:
+                st.success(f"No unexpected full scans across {len(REPORT_QUERIES)} registered queries.")
+            else:
+                st.error(f"{flagged['query'].nunique()} queries scan large tables without an index.")
+            st.dataframe(audit, use_container_width=True)
+
 
 #=============================================================================================
 
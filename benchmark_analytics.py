@@ -0,0 +1,105 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import benchmark_suite
+import travel_core as core
+
+#=============================================================================================
+#   Columnar analytics benchmark
+#
+#   usage:  python benchmark_analytics.py DB [--payments N] [--repeat N] [--budget SECONDS]
+#   e.g.    python benchmark_analytics.py suite_1000000.db
+#
+#   Copies DB to a throw-away directory, writes the whole Parquet snapshot, then adds N payments
+#   to recent bookings and times the incremental refresh that follows. Runs every report of
+#   travel_core.ANALYTICS_REPORTS on both engines (travel_core.compare_report_engines: SQL
+#   without the result cache, columnar with the snapshot in memory) and checks they agree, and
+#   times add_payment with and without the change-tracking triggers.
+#=============================================================================================
+
+DEFAULT_PAYMENTS = 1000
+DEFAULT_REPEAT = 10
+DEFAULT_BUDGET_SECONDS = 5.0
+
+#=============================================================================================
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+def dir_mb(path):
+    return sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files) / 1024 / 1024
+
+def payment_ms(recent, repeat, budget):
+    rnd = random.Random(1)
+    samples = benchmark_suite.measure(lambda: core.add_payment(rnd.choice(recent), 1), repeat, budget)[0]
+    return benchmark_suite.summarize(samples)["median_ms"]
+
+def compare(label, repeat, **filters):
+    best = {}
+    for _ in range(repeat):
+        for r in core.compare_report_engines(**filters):
+            old = best.setdefault(r["report"], r)
+            old["sql_ms"], old["columnar_ms"] = min(old["sql_ms"], r["sql_ms"]), min(old["columnar_ms"], r["columnar_ms"])
+            old["match"] &= r["match"]
+    print(f"\n{label}\n{'report':<24} {'rows':>9} {'sql ms':>9} {'columnar ms':>12} {'speedup':>8}  match")
+    for r in best.values():
+        print(f"{r['report']:<24} {r['rows']:>9,} {r['sql_ms']:>9.1f} {r['columnar_ms']:>12.1f} "
+              f"{r['sql_ms'] / r['columnar_ms']:>7.1f}x  {r['match'] or r['difference']}")
+
+def run(db_file, payments, repeat, budget):
+    core.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="analytics_bench_"), os.path.basename(db_file))
+    shutil.copyfile(db_file, core.DB_FILE)
+    core.init_db()
+    core.get_dataframe("SELECT 1", cached=False)   # import pandas before anything is timed
+
+    result, seconds = timed(core.refresh_analytics)
+    print(f"full snapshot: {result['parts_written']:,} parts, {result['rows_written']:,} rows in {seconds:.1f} s "
+          f"({dir_mb(core.analytics_dir_for(core.DB_FILE)):,.0f} MB)")
+    _, seconds = timed(lambda: [core.get_analytics_snapshot().table(t) for t in core.ANALYTICS_TABLES])
+    print(f"snapshot loaded into memory in {seconds:.2f} s")
+
+    recent = [r[0] for r in core.run_query("SELECT booking_id FROM Bookings ORDER BY booking_id DESC LIMIT 200")]
+    rnd = random.Random(2)
+    for _ in range(payments):
+        core.add_payment(rnd.choice(recent), 1)
+    result, seconds = timed(core.refresh_analytics)
+    print(f"after {payments:,} payments: {result['parts_written']} parts, {result['rows_written']:,} rows rewritten "
+          f"in {seconds * 1000:.0f} ms")
+    _, seconds = timed(lambda: [core.get_analytics_snapshot().table(t) for t in core.ANALYTICS_TABLES])
+    print(f"changed parts reloaded in {seconds * 1000:.0f} ms")
+
+    compare("whole tables (booking report: newest rows for the page)", repeat, limit=core.EXPORT_PREVIEW_ROWS)
+    compare("whole tables (booking report: every row)", repeat)
+    dest_id, = core.run_query("""SELECT tp.dest_id FROM Bookings b JOIN TravelPackages tp ON tp.pkg_id = b.pkg_id
+                                 GROUP BY tp.dest_id ORDER BY COUNT(*) DESC LIMIT 1""")[0]
+    compare(f"busiest destination ({dest_id}), one year", repeat, date_from="2025-01-01", date_to="2025-12-31", dest_id=dest_id)
+
+    with_triggers = payment_ms(recent, repeat * 20, budget)
+    triggers = [name for name, in core.run_query("SELECT name FROM sqlite_master WHERE name LIKE 'trg_analytics_%'")]
+    for name in triggers:
+        core.run_query(f"DROP TRIGGER {name}", fetch=False)
+    without = payment_ms(recent, repeat * 20, budget)
+    print(f"\nadd_payment: {with_triggers:.3f} ms with change tracking, {without:.3f} ms without")
+    core.close_pools()
+
+#=============================================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the reports on SQLite and on the columnar snapshot.")
+    parser.add_argument("db", help="database to copy (e.g. one generated by benchmark_suite.py --workdir)")
+    parser.add_argument("--payments", type=int, default=DEFAULT_PAYMENTS, help="payments before the incremental refresh")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="runs per report (best is kept)")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="seconds per add_payment case")
+    args = parser.parse_args(argv)
+    run(args.db, args.payments, args.repeat, args.budget)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
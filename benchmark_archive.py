@@ -0,0 +1,83 @@
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import benchmark_suite
+import travel_core as core
+
+#=============================================================================================
+#   Hot/cold archive benchmark
+#
+#   usage:  python benchmark_archive.py DB [--cutoff YYYY-MM-DD] [--repeat N] [--budget SECONDS]
+#   e.g.    python benchmark_archive.py suite_1000000.db --cutoff 2025-06-01
+#
+#   Copies DB to a throw-away directory and times, with the result cache cleared before every
+#   run, every registered page/report query, the dashboard and the bookings grid, and a payment
+#   (a write, which now also locks the attached archive). Then archives the completed bookings
+#   made before the cutoff (travel_core.archive_bookings) and times the same cases again; the
+#   "with archive" reports read hot + archived rows, the others the hot set only.
+#=============================================================================================
+
+DEFAULT_REPEAT = 10
+DEFAULT_BUDGET_SECONDS = 5.0
+
+#=============================================================================================
+
+def cases(rnd):
+    # the newest bookings, which stay hot
+    recent = [r[0] for r in core.run_query("SELECT booking_id FROM Bookings ORDER BY booking_id DESC LIMIT 200")]
+
+    return benchmark_suite.query_cases() + [
+        ("api", "dashboard_metrics", lambda: core.dashboard_metrics(ttl=0)),
+        ("api", "fetch_grid_page bookings", lambda: core.fetch_grid_page("bookings", "Date", True)),
+        ("api", "revenue_series month", lambda: core.revenue_series("month")),
+        ("write", "add_payment", lambda: core.add_payment(rnd.choice(recent), 1)),
+    ]
+
+def time_cases(rnd, repeat, budget):
+    return {name: benchmark_suite.summarize(benchmark_suite.measure(fn, repeat, budget)[0])["median_ms"]
+            for _, name, fn in cases(rnd)}
+
+def file_mb(path):
+    return os.path.getsize(path) / 1024 / 1024 if os.path.exists(path) else 0.0
+
+def run(db_file, cutoff, repeat, budget):
+    core.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="archive_bench_"), os.path.basename(db_file))
+    shutil.copyfile(db_file, core.DB_FILE)
+    core.init_db()
+    core.get_dataframe("SELECT 1", cached=False)   # import pandas before anything is timed
+    hot_rows = core.get_row_count("Bookings")
+    before = time_cases(random.Random(1), repeat, budget)
+
+    start = time.perf_counter()
+    result = core.archive_bookings(cutoff)
+    seconds = time.perf_counter() - start
+    core.run_query("PRAGMA wal_checkpoint(TRUNCATE)", fetch=False)
+    print(f"archived {result['bookings_archived']:,} of {hot_rows:,} bookings made before {result['cutoff']} "
+          f"in {seconds:.1f} s ({result['payments_archived']:,} payments, ${result['revenue_archived']:,.0f}); "
+          f"hot file {file_mb(core.DB_FILE):,.0f} MB, archive {file_mb(core.archive_file_for(core.DB_FILE)):,.0f} MB")
+    after = time_cases(random.Random(1), repeat, budget)
+
+    print(f"{'case':<60} {'before ms':>11} {'after ms':>10} {'change':>8}")
+    for name, old in before.items():
+        print(f"{name:<60.60} {old:>11.3f} {after[name]:>10.3f} {after[name] / old if old else 0:>7.2f}x")
+    core.close_pools()
+
+#=============================================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the page queries before and after archiving old bookings.")
+    parser.add_argument("db", help="database to copy (e.g. one generated by benchmark_suite.py --workdir)")
+    parser.add_argument("--cutoff", help="archive bookings made before this date (default: ARCHIVE_AFTER_DAYS ago)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="max runs per case")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="seconds per case")
+    args = parser.parse_args(argv)
+    run(args.db, args.cutoff, args.repeat, args.budget)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,123 @@
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import travel_core as core
+
+#=============================================================================================
+#   Room availability benchmark
+#
+#   usage:  python benchmark_availability.py [reservation counts ...]
+#   e.g.    python benchmark_availability.py 10000 100000 500000
+#
+#   Builds a throw-away database per reservation count (HOTELS hotels x ROOMS_PER_HOTEL rooms,
+#   non-overlapping stays of 1-14 nights per room) and times, per query, with the result cache
+#   bypassed:
+#     hotel        free rooms in one hotel for a random week (R*Tree interval index)
+#     scan         the same question asked of Reservations by room (the no-R*Tree fallback)
+#     destination  free rooms across all HOTELS_PER_DESTINATION hotels of a destination,
+#                  one statement
+#=============================================================================================
+
+DEFAULT_COUNTS = [10000, 100000, 500000]
+HOTELS = 200
+ROOMS_PER_HOTEL = 50
+HOTELS_PER_DESTINATION = 10
+QUERIES = 200
+FIRST_DAY = date(2025, 1, 1)
+
+#=============================================================================================
+
+def fill_hotels(conn):
+    dest_ids = []
+    for d in range(HOTELS // HOTELS_PER_DESTINATION):
+        dest_ids.append(conn.execute("INSERT INTO Destinations (city, country) VALUES (?, 'Benchmark')",
+                                     (f"City {d}",)).lastrowid)
+    for h in range(HOTELS):
+        hotel_id = conn.execute("INSERT INTO Services (service_name, base_price) VALUES (?, 100)",
+                                (f"Bench Hotel {h}",)).lastrowid
+        conn.execute("INSERT INTO Hotels (hotel_id, stars) VALUES (?, 4)", (hotel_id,))
+        conn.executemany("INSERT INTO Rooms (hotel_id, room_no) VALUES (?, ?)",
+                         [(hotel_id, str(100 + r)) for r in range(ROOMS_PER_HOTEL)])
+        pkg_id = conn.execute("INSERT INTO TravelPackages (dest_id, pkg_name, price) VALUES (?, ?, 1000)",
+                              (dest_ids[h // HOTELS_PER_DESTINATION], f"Bench Package {h}")).lastrowid
+        conn.execute("INSERT INTO PackageContents (pkg_id, service_id) VALUES (?, ?)", (pkg_id, hotel_id))
+    conn.commit()
+    return dest_ids
+
+def fill_reservations(conn, n, seed=42):
+    rnd = random.Random(seed)
+    rooms = conn.execute("SELECT room_id, hotel_id FROM Rooms r JOIN Hotels h USING (hotel_id)").fetchall()
+    booking_id = conn.execute("SELECT MIN(booking_id) FROM Bookings").fetchone()[0]
+    # stays of one room never overlap (the allocation guard would refuse them): each room
+    # gets back-to-back stays from a random start, separated by random gaps
+    next_free = {room_id: rnd.randrange(365) for room_id, _ in rooms}
+    rows = []
+    for _ in range(n):
+        room_id, hotel_id = rnd.choice(rooms)
+        start = FIRST_DAY + timedelta(days=next_free[room_id] + rnd.randrange(7))
+        end = start + timedelta(days=rnd.randint(1, 14))
+        next_free[room_id] = (end - FIRST_DAY).days
+        rows.append((booking_id, hotel_id, room_id, str(start), str(end)))
+    conn.executemany("INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (?, ?, ?, ?, ?)", rows)
+    conn.commit()
+
+#=============================================================================================
+
+def per_query_ms(conn, sql, make_params, rnd):
+    start = time.perf_counter()
+    for _ in range(QUERIES):
+        conn.execute(sql, make_params(rnd)).fetchall()
+    return (time.perf_counter() - start) * 1000 / QUERIES
+
+def random_week(rnd):
+    start = FIRST_DAY + timedelta(days=rnd.randrange(730))
+    return str(start), str(start + timedelta(days=7))
+
+def run(counts):
+    workdir = tempfile.mkdtemp(prefix="availability_bench_")
+    print(f"{'reservations':>12} {'hotel ms':>10} {'scan ms':>10} {'destination ms':>15}")
+
+    for n in counts:
+        core.DB_FILE = os.path.join(workdir, f"bench_{n}.db")
+        core.init_db()
+
+        with core.get_pool().connection() as conn:
+            dest_ids = fill_hotels(conn)
+            fill_reservations(conn, n)
+            conn.execute("ANALYZE")   # planner statistics for the filled tables, not the empty ones
+            hotel_ids = [r[0] for r in conn.execute("SELECT hotel_id FROM Hotels")]
+
+            def hotel_params(rnd):
+                h = rnd.choice(hotel_ids)
+                check_in, check_out = random_week(rnd)
+                return (h, h, h, *core.stay_params(check_in, check_out))
+
+            def scan_params(rnd):
+                check_in, check_out = random_week(rnd)
+                return (rnd.choice(hotel_ids), *core.stay_params(check_in, check_out))
+
+            def destination_params(rnd):
+                check_in, check_out = random_week(rnd)
+                return (rnd.choice(dest_ids), *core.stay_params(check_in, check_out))
+
+            # both forms must agree before either is timed
+            for _ in range(20):
+                p = scan_params(random.Random(_))
+                assert conn.execute(core.FREE_ROOMS_SQL, (p[0], p[0], *p)).fetchall() == \
+                    conn.execute(core.FREE_ROOMS_NO_INDEX_SQL, p).fetchall(), "interval index disagrees with Reservations"
+
+            hotel_ms = per_query_ms(conn, core.FREE_ROOMS_SQL, hotel_params, random.Random(1))
+            scan_ms = per_query_ms(conn, core.FREE_ROOMS_NO_INDEX_SQL, scan_params, random.Random(1))
+            destination_ms = per_query_ms(conn, core.FREE_ROOMS_FOR_DESTINATION_SQL, destination_params, random.Random(1))
+
+        print(f"{n:>12} {hotel_ms:10.3f} {scan_ms:10.3f} {destination_ms:15.3f}")
+        core.close_pools()
+
+#=============================================================================================
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or DEFAULT_COUNTS)
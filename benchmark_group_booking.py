@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import travel_core as core
+
+#=============================================================================================
+#   Group booking benchmark
+#
+#   usage:  python benchmark_group_booking.py [group sizes ...]
+#   e.g.    python benchmark_group_booking.py 1 10 500
+#
+#   Books a package with one hotel and one flight for groups of each size, with a room, a seat
+#   and a deposit per traveller, on a throw-away database:
+#     single  one create_booking + add_payment per traveller (the per-traveller form)
+#     group   one create_group_booking (one transaction, executemany per table)
+#   Every run gets a fresh package whose hotel and flight have exactly `size` rooms and seats,
+#   so both ways allocate the same inventory.
+#=============================================================================================
+
+DEFAULT_SIZES = [1, 10, 500]
+REPEAT = 5
+DEPOSIT = 100
+CHECK_IN = date(2030, 6, 1)
+
+#=============================================================================================
+
+def fresh_package(cust_id, size, run):
+    hotel_id = core.add_service("Hotel", f"Group Hotel {size}-{run}", 100, 4, [str(1000 + r) for r in range(size)])
+    flight_id = core.add_service("Flight", f"Group Flight {size}-{run}", 200, "GB", [f"{r // 6 + 1}{'ABCDEF'[r % 6]}" for r in range(size)])
+    dest_id = core.add_destination(f"Group City {size}-{run}", "Benchmark")
+    pkg_id = core.add_package(dest_id, f"Group Package {size}-{run}", price=1000)
+    core.add_package_service(pkg_id, hotel_id)
+    core.add_package_service(pkg_id, flight_id)
+    return pkg_id
+
+def book_singly(cust_id, pkg_id, size):
+    for _ in range(size):
+        booking_id = core.create_booking(cust_id, pkg_id, date.today(), CHECK_IN, CHECK_IN + timedelta(days=7))["booking_id"]
+        core.add_payment(booking_id, DEPOSIT)
+
+def book_group(cust_id, pkg_id, size):
+    core.create_group_booking([cust_id] * size, pkg_id, date.today(), CHECK_IN, CHECK_IN + timedelta(days=7), deposit=DEPOSIT)
+
+def run(sizes):
+    core.DB_FILE = os.path.join(tempfile.mkdtemp(prefix="group_bench_"), "bench.db")
+    core.init_db()
+    cust_id = core.add_customer("Group Leader", "leader@example.com")
+    print(f"{'travellers':>10} {'single ms':>11} {'group ms':>10} {'single/s':>10} {'group/s':>10} {'speedup':>8}")
+
+    for size in sizes:
+        timings = {}
+        for name, book in (("single", book_singly), ("group", book_group)):
+            best = float("inf")
+            for run_no in range(REPEAT):
+                pkg_id = fresh_package(cust_id, size, f"{name}{run_no}")
+                start = time.perf_counter()
+                book(cust_id, pkg_id, size)
+                best = min(best, (time.perf_counter() - start) * 1000)
+                booked = core.run_query("""SELECT COUNT(*), COUNT(DISTINCT r.room_id), SUM(b.total_paid) FROM Bookings b
+                                           JOIN Reservations r ON r.booking_id = b.booking_id WHERE b.pkg_id = ?""", (pkg_id,))[0]
+                assert booked == (size, size, size * DEPOSIT), f"{name} booked {booked} for {size} travellers"
+            timings[name] = best
+        print(f"{size:>10} {timings['single']:11.2f} {timings['group']:10.2f} {size * 1000 / timings['single']:10.0f} "
+              f"{size * 1000 / timings['group']:10.0f} {timings['single'] / timings['group']:7.1f}x")
+    core.close_pools()
+
+#=============================================================================================
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or DEFAULT_SIZES)
@@ -0,0 +1,106 @@
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+import travel_core as core
+
+#=============================================================================================
+#   Payment status reconciliation benchmark
+#
+#   usage:  python benchmark_payment_status.py [booking counts ...]
+#   e.g.    python benchmark_payment_status.py 1000 10000 100000
+#
+#   Builds a throw-away database per booking count and times:
+#     legacy       the old per-booking loop (4 queries per booking)
+#     full         update_all_booking_payment_statuses(), the set-based ledger rebuild
+#     1% payments  inserting payments for 1% of the bookings, ledger triggers included
+#=============================================================================================
+
+DEFAULT_COUNTS = [1000, 10000, 100000]
+LEGACY_MAX_BOOKINGS = 100000   # the old loop commits once per booking; skip it above this
+
+#=============================================================================================
+
+def fill_bookings(conn, n_bookings, seed=42):
+    rnd = random.Random(seed)
+    cust_ids = [r[0] for r in conn.execute("SELECT cust_id FROM Customers")]
+    pkgs = conn.execute("SELECT pkg_id, price FROM TravelPackages").fetchall()
+
+    bookings = []
+    for _ in range(n_bookings):
+        bookings.append((rnd.choice(cust_ids), rnd.choice(pkgs)[0], "2025-06-01"))
+    conn.executemany("INSERT INTO Bookings (cust_id, pkg_id, booking_date) VALUES (?, ?, ?)", bookings)
+
+    price_of = dict(pkgs)
+    payments = []
+    for booking_id, pkg_id in conn.execute("SELECT booking_id, pkg_id FROM Bookings"):
+        roll = rnd.random()
+        if roll < 0.3:
+            continue
+        amount = price_of[pkg_id] if roll > 0.7 else price_of[pkg_id] / 2
+        payments.append((booking_id, amount))
+    conn.executemany("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", payments)
+    conn.commit()
+
+#=============================================================================================
+
+def legacy_update_all(conn):
+    """The pre-set-based algorithm, kept here only as the baseline."""
+    for (booking_id,) in conn.execute("SELECT booking_id FROM Bookings").fetchall():
+        total_paid = conn.execute("SELECT COALESCE(SUM(amount),0) FROM Payments WHERE booking_id=?", (booking_id,)).fetchone()[0]
+        pkg_id = conn.execute("SELECT pkg_id FROM Bookings WHERE booking_id=?", (booking_id,)).fetchone()[0]
+        price = conn.execute("SELECT price FROM TravelPackages WHERE pkg_id=?", (pkg_id,)).fetchone()[0]
+        status = 0 if total_paid <= 0 else (1 if total_paid < price else 2)
+        conn.execute("UPDATE Bookings SET is_paid=? WHERE booking_id=?", (status, booking_id))
+        conn.commit()
+
+#=============================================================================================
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+def run(counts):
+    workdir = tempfile.mkdtemp(prefix="pay_status_bench_")
+    print(f"{'bookings':>10} {'legacy ms':>12} {'full ms':>10} {'1% payments ms':>15}")
+
+    for n in counts:
+        core.DB_FILE = os.path.join(workdir, f"bench_{n}.db")
+        core.init_db()
+
+        with core.get_pool().connection() as conn:
+            fill_bookings(conn, n)
+
+        legacy_ms = legacy_status = None
+        if n <= LEGACY_MAX_BOOKINGS:
+            conn = sqlite3.connect(core.DB_FILE)
+            legacy_ms = timed(legacy_update_all, conn)
+            conn.close()
+            legacy_status = core.run_query("SELECT booking_id, is_paid FROM Bookings ORDER BY booking_id")
+
+        core.run_query("UPDATE Bookings SET is_paid = 0", fetch=False)
+        full_ms = timed(core.update_all_booking_payment_statuses)
+        if legacy_status is not None:
+            assert legacy_status == core.run_query("SELECT booking_id, is_paid FROM Bookings ORDER BY booking_id"), \
+                "set-based statuses differ from the legacy loop"
+
+        touched = core.run_query("SELECT booking_id FROM Bookings ORDER BY RANDOM() LIMIT ?", (max(1, n // 100),))
+        with core.get_pool().connection() as conn:
+            start = time.perf_counter()
+            conn.executemany("INSERT INTO Payments (booking_id, amount) VALUES (?, 1)", touched)
+            conn.commit()
+            payments_ms = (time.perf_counter() - start) * 1000
+        assert core.update_all_booking_payment_statuses() == 0, "ledger triggers left bookings out of date"
+
+        legacy_txt = f"{legacy_ms:12.1f}" if legacy_ms is not None else f"{'skipped':>12}"
+        print(f"{n:>10} {legacy_txt} {full_ms:10.1f} {payments_ms:15.1f}")
+        core.close_pools()
+
+#=============================================================================================
+
+if __name__ == "__main__":
+    run([int(a) for a in sys.argv[1:]] or DEFAULT_COUNTS)
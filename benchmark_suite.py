@@ -0,0 +1,212 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import generate_data
+import travel_core as core
+
+#=============================================================================================
+#   Data-layer benchmark suite
+#
+#   usage:  python benchmark_suite.py [booking counts ...] [--out FILE] [--baseline FILE]
+#   e.g.    python benchmark_suite.py 10000 1000000 10000000 --out results.json
+#
+#   Per booking count, generates (or reuses, see --workdir) a synthetic database with
+#   generate_data.py and times, with the result cache cleared before every run:
+#     query  every registered page/report query (REPORT_QUERIES), all rows read
+#     api    the read functions the pages call (dashboard, grids, typeahead, availability)
+#     write  the write paths (customers, bookings with room + seat, payments, package
+#            changes, deletes) and the full ledger rebuild
+#   Each case runs up to --repeat times within --budget seconds. Results (min/median/p95/max
+#   ms per case) are printed and written as JSON; --baseline compares medians with an earlier
+#   results file and exits non-zero when a case got REGRESSION_FACTOR slower.
+#=============================================================================================
+
+DEFAULT_COUNTS = [10000, 1000000]
+DEFAULT_REPEAT = 20
+DEFAULT_BUDGET_SECONDS = 5.0
+REGRESSION_FACTOR = 1.25
+REGRESSION_MIN_MS = 1.0        # ignore changes below this: timer noise
+FAR_CHECK_IN = date(2030, 1, 1)
+
+#=============================================================================================
+
+def measure(fn, repeat, budget):
+    """Run fn() up to `repeat` times (at least once) within `budget` seconds; returns timings in
+    ms and the last result."""
+    timings, result = [], None
+    cache = core.get_query_cache()
+    deadline = time.perf_counter() + budget
+    while len(timings) < repeat and (not timings or time.perf_counter() < deadline):
+        cache.clear()
+        cache.read_tables("SELECT 1 FROM Bookings")   # reload the schema map outside the timing
+        start = time.perf_counter()
+        result = fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+def summarize(timings):
+    ordered = sorted(timings)
+    return {"runs": len(ordered), "min_ms": ordered[0], "median_ms": ordered[len(ordered) // 2],
+            "p95_ms": ordered[int(len(ordered) * 0.95)], "max_ms": ordered[-1]}
+
+def read_all(sql, params):
+    with core.get_pool().connection() as conn:
+        n = 0
+        for _ in conn.execute(sql, params):
+            n += 1
+    return n
+
+#=============================================================================================
+
+def query_cases():
+    return [("query", name, lambda q=q: read_all(q["sql"], q["params"])) for name, q in core.REPORT_QUERIES.items()]
+
+def api_cases(rnd, sample):
+    def week():
+        start = generate_data.FIRST_BOOKING_DAY + timedelta(days=rnd.randrange(generate_data.BOOKING_DAYS))
+        return start, start + timedelta(days=7)
+
+    return [
+        ("api", "dashboard_metrics", lambda: core.dashboard_metrics(ttl=0)["recent_rows"]),
+        ("api", "revenue_series month", lambda: core.revenue_series("month")),
+        ("api", "revenue_series day", lambda: core.revenue_series("day", "2025-01-01")),
+        ("api", "fetch_grid_page bookings", lambda: core.fetch_grid_page("bookings", "Date", True)[0]),
+        ("api", "fetch_grid_page customers by name", lambda: core.fetch_grid_page("customers", "Name", False)[0]),
+        ("api", "search_options customers", lambda: core.search_options("customers", rnd.choice(generate_data.FIRST_NAMES)[:2])),
+        ("api", "search_options bookings", lambda: core.search_options("bookings", rnd.choice(generate_data.FIRST_NAMES)[:2])),
+        ("api", "free_rooms", lambda: core.free_rooms(rnd.choice(sample["hotels"]), *week())),
+        ("api", "free_rooms_for_destination", lambda: core.free_rooms_for_destination(rnd.choice(sample["dests"]), *week())),
+        ("api", "free_seats", lambda: core.free_seats(rnd.choice(sample["flights"]))),
+        ("api", "audit_query_plans", core.audit_query_plans),
+    ]
+
+def write_cases(rnd, sample):
+    created = []
+
+    def book():
+        check_in = FAR_CHECK_IN + timedelta(days=rnd.randrange(365))
+        try:
+            result = core.create_booking(rnd.choice(sample["customers"]), rnd.choice(sample["packages"]),
+                                         date.today(), check_in, check_in + timedelta(days=3))
+        except core.AllocationError:    # the sampled flight sold out meanwhile
+            return 0
+        created.append(result["booking_id"])
+        return 1
+
+    def add_customer():
+        return core.add_customer("Benchmark Customer", f"bench{time.time_ns()}{rnd.random()}@example.com")
+
+    return [
+        ("write", "add_customer", add_customer),
+        ("write", "create_booking with room + seat", book),
+        ("write", "add_payment", lambda: core.add_payment(rnd.choice(created or sample["bookings"]), 50)),
+        ("write", "update_booking package", lambda: core.update_booking(rnd.choice(created or sample["bookings"]),
+                                                                        pkg_id=rnd.choice(sample["packages"]))),
+        ("write", "delete_booking", lambda: core.delete_booking(created.pop()) if created else 0),
+        ("write", "update_all_booking_payment_statuses", core.update_all_booking_payment_statuses),
+    ]
+
+def sample_ids(rnd, size=200):
+    """Random existing ids to drive the api and write cases."""
+    with core.get_pool().connection() as conn:
+        def pick(sql):
+            rows = [r[0] for r in conn.execute(sql)]
+            return rnd.sample(rows, min(size, len(rows)))
+        return {
+            "customers": pick("SELECT cust_id FROM Customers"),
+            "bookings": pick("SELECT booking_id FROM Bookings"),
+            "hotels": pick("SELECT hotel_id FROM Hotels"),
+            "dests": pick("SELECT DISTINCT dest_id FROM TravelPackages"),
+            # packages whose flight still has seats, so create_booking can succeed
+            "packages": pick("""SELECT pc.pkg_id FROM PackageContents pc JOIN Flights f ON f.flight_id = pc.service_id
+                                WHERE EXISTS (SELECT 1 FROM Seats s WHERE s.flight_id = f.flight_id
+                                              AND NOT EXISTS (SELECT 1 FROM Tickets t WHERE t.seat_id = s.seat_id))"""),
+            "flights": pick("SELECT flight_id FROM Flights"),
+        }
+
+#=============================================================================================
+
+def prepare(n, workdir):
+    core.DB_FILE = os.path.join(workdir, f"suite_{n}.db")
+    if not os.path.exists(core.DB_FILE):
+        print(f"generating {n:,} bookings into {core.DB_FILE}", file=sys.stderr)
+        generate_data.generate(n)
+    core.init_db()
+    core.get_dataframe("SELECT 1", cached=False)   # import pandas before anything is timed
+
+def run(counts, repeat, budget, workdir):
+    results = []
+    for n in counts:
+        prepare(n, workdir)
+        rnd = random.Random(n)
+        sample = sample_ids(rnd)
+        print(f"\n{n:,} bookings")
+        print(f"{'case':<60} {'runs':>5} {'median ms':>11} {'p95 ms':>10} {'rows':>10}")
+        for group, name, fn in query_cases() + api_cases(rnd, sample) + write_cases(rnd, sample):
+            timings, result = measure(fn, repeat, budget)
+            # queries return their row count; api calls return what they fetched; writes nothing useful
+            rows = result if group == "query" else (len(result) if group == "api" and hasattr(result, "__len__") else None)
+            result = {"bookings": n, "group": group, "case": name, "rows": rows, **summarize(timings)}
+            results.append(result)
+            rows_txt = f"{rows:,}" if isinstance(rows, int) else "-"
+            print(f"{group + ': ' + name:<60.60} {result['runs']:>5} {result['median_ms']:>11.3f} "
+                  f"{result['p95_ms']:>10.3f} {rows_txt:>10}")
+        core.close_pools()
+    return results
+
+def compare(results, baseline_file):
+    """Print median changes against an earlier results file; returns the regressed cases."""
+    with open(baseline_file, encoding="utf-8") as f:
+        before = {(r["bookings"], r["case"]): r["median_ms"] for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\n{'vs ' + baseline_file:<60} {'before ms':>11} {'now ms':>10} {'change':>8}")
+    for r in results:
+        old = before.get((r["bookings"], r["case"]))
+        if old is None:
+            continue
+        ratio = r["median_ms"] / old if old else float("inf")
+        regressed = ratio >= REGRESSION_FACTOR and r["median_ms"] - old >= REGRESSION_MIN_MS
+        if regressed:
+            regressions.append(r)
+        print(f"{str(r['bookings']) + ' ' + r['case']:<60.60} {old:>11.3f} {r['median_ms']:>10.3f} "
+              f"{ratio:>7.2f}x{'  REGRESSION' if regressed else ''}")
+    return regressions
+
+#=============================================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark every query and write path of travel_core.")
+    parser.add_argument("counts", type=int, nargs="*", default=DEFAULT_COUNTS, help="booking counts")
+    parser.add_argument("--out", default="benchmark_results.json", help="JSON results file (default: %(default)s)")
+    parser.add_argument("--baseline", help="earlier results file to compare against")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="max runs per case")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET_SECONDS, help="seconds per case")
+    parser.add_argument("--workdir", help="keep generated databases here and reuse them on later runs")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="suite_bench_")
+    os.makedirs(workdir, exist_ok=True)
+    results = run(args.counts, args.repeat, args.budget, workdir)
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "platform": platform.platform(),
+        "schema_version": core.SCHEMA_VERSION, "repeat": args.repeat, "budget_seconds": args.budget,
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"\nwrote {len(results)} results to {args.out}")
+    if args.baseline and compare(results, args.baseline):
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
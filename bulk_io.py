@@ -0,0 +1,319 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+import travel_core as core
+
+#=============================================================================================
+#   Bulk import / export for customers, bookings and payments
+#
+#   usage:  python bulk_io.py import  <customers|bookings|payments> <file> [--chunk N] [--skip-invalid]
+#           python bulk_io.py export  <customers|bookings|payments> <file> [--chunk N]
+#           python bulk_io.py report    <file.csv|file.parquet> [--from DATE] [--to DATE] [--dest ID] [--history]
+#           python bulk_io.py reconcile
+#           python bulk_io.py rollups
+#
+#   Files are CSV (header row) or JSON lines, chosen by extension (.csv / .jsonl / .ndjson)
+#   or --format. Import streams the file in chunks; each chunk is validated in batch (required
+#   columns, types, foreign keys, unique keys) and written with one executemany inside one
+#   write transaction. The per-row ledger and revenue rollup triggers are switched off for those
+#   transactions; after bookings or payments the booking ledger (total_paid, balance_due,
+#   is_paid) and the revenue rollups are rebuilt together, once, at the end.
+#   Columns missing from the file take their table default; an id column may be given to keep
+#   historical ids, so bookings and payments can be loaded in that order afterwards.
+#=============================================================================================
+
+DEFAULT_CHUNK_ROWS = 50000
+
+# columns: importable column -> type; fks: column -> (parent table, parent key);
+# derived: exported but ignored on import (the ledger recomputes them).
+BULK_TABLES = {
+    "customers": {
+        "table": "Customers", "key": "cust_id",
+        "columns": {"cust_id": int, "name": str, "email": str},
+        "required": ["name", "email"], "unique": ["email"], "fks": {}, "derived": [],
+    },
+    "bookings": {
+        "table": "Bookings", "key": "booking_id",
+        "columns": {"booking_id": int, "cust_id": int, "pkg_id": int, "booking_date": str},
+        "required": ["cust_id", "pkg_id"], "unique": [],
+        "fks": {"cust_id": ("Customers", "cust_id"), "pkg_id": ("TravelPackages", "pkg_id")},
+        "derived": ["is_paid", "total_paid", "balance_due"],
+    },
+    "payments": {
+        "table": "Payments", "key": "payment_id",
+        "columns": {"payment_id": int, "booking_id": int, "amount": float, "payment_date": str},
+        "required": ["booking_id", "amount"], "unique": [],
+        "fks": {"booking_id": ("Bookings", "booking_id")}, "derived": [],
+    },
+}
+
+# AFTER INSERT triggers bypassed during a chunk; the chunk fixes RowCounts itself and the
+# ledger and revenue rollups are rebuilt at the end. Guards (BEFORE triggers) and everything
+# else stay on.
+BULK_DEFERRED_TRIGGERS = ("trg_count_{table}_ins", "trg_ledger_%_ins", "trg_revenue_%_ins")
+
+class BulkImportError(Exception):
+    pass
+
+#=============================================================================================
+
+def detect_format(path, fmt=None):
+    if fmt:
+        return fmt
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".csv":
+        return "csv"
+    if ext in (".jsonl", ".ndjson", ".json"):
+        return "jsonl"
+    raise BulkImportError(f"Cannot tell the format of {path}; pass --format csv|jsonl.")
+
+def read_records(f, fmt):
+    """Yield (line number, dict) from an open CSV or JSON-lines file, one record at a time."""
+    if fmt == "csv":
+        reader = csv.DictReader(f)
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_no, line in enumerate(f, 1):
+            if line.strip():
+                yield line_no, json.loads(line)
+
+def import_columns(spec, first_record):
+    """The importable columns present in the file, in table order; rejects unknown columns."""
+    fields = [c for c in first_record if c not in spec["derived"]]
+    unknown = [c for c in fields if c not in spec["columns"]]
+    if unknown:
+        raise BulkImportError(f"Unknown column(s) for {spec['table']}: {', '.join(unknown)}")
+    missing = [c for c in spec["required"] if c not in fields]
+    if missing:
+        raise BulkImportError(f"Missing required column(s) for {spec['table']}: {', '.join(missing)}")
+    return [c for c in spec["columns"] if c in fields]
+
+#=============================================================================================
+
+def convert_rows(spec, columns, records):
+    """Typed value tuples plus (line, reason) rejects for missing or malformed values."""
+    rows, rejects = [], []
+    for line_no, record in records:
+        values = []
+        try:
+            for col in columns:
+                raw = record.get(col)
+                if raw is None or raw == "":
+                    if col in spec["required"]:
+                        raise ValueError(f"{col} is required")
+                    values.append(None)
+                else:
+                    values.append(spec["columns"][col](raw))
+        except (TypeError, ValueError) as e:
+            rejects.append((line_no, str(e)))
+            continue
+        rows.append((line_no, tuple(values)))
+    return rows, rejects
+
+def existing_values(conn, table, column, values):
+    """Which of `values` already appear in table.column -- one query for the whole chunk."""
+    if not values:
+        return set()
+    return {r[0] for r in conn.execute(f"SELECT {column} FROM {table} WHERE {column} IN (SELECT value FROM json_each(?))",
+                                       (json.dumps(list(values)),))}
+
+def validate_chunk(conn, spec, columns, rows):
+    """Batch foreign-key and uniqueness checks. Returns (valid rows, rejects)."""
+    bad = {}
+    for col, (parent, parent_key) in spec["fks"].items():
+        i = columns.index(col)
+        refs = {values[i] for _, values in rows if values[i] is not None}
+        missing = refs - existing_values(conn, parent, parent_key, refs)
+        for line_no, values in rows:
+            if values[i] in missing:
+                bad.setdefault(line_no, f"{col} {values[i]} not found in {parent}")
+
+    for col in spec["unique"] + ([spec["key"]] if spec["key"] in columns else []):
+        i = columns.index(col)
+        values_given = {values[i] for _, values in rows if values[i] is not None}
+        taken = existing_values(conn, spec["table"], col, values_given)
+        if col == spec["key"] and spec["table"] in core.ARCHIVED_TABLES and core.archive_attached(conn):
+            # an archived id reused by a hot row would hide the archived one from the history views
+            taken |= existing_values(conn, f"archive.{spec['table']}", col, values_given)
+        seen = set()
+        for line_no, values in rows:
+            if values[i] is None:
+                continue
+            if values[i] in taken or values[i] in seen:
+                bad.setdefault(line_no, f"duplicate {col} {values[i]}")
+            seen.add(values[i])
+
+    valid = [values for line_no, values in rows if line_no not in bad]
+    return valid, sorted(bad.items())
+
+#=============================================================================================
+
+def deferred_triggers(conn, table):
+    patterns = [p.format(table=table) for p in BULK_DEFERRED_TRIGGERS]
+    where = " OR ".join("name LIKE ?" for _ in patterns)
+    return conn.execute(f"SELECT name, sql FROM sqlite_master WHERE type='trigger' AND tbl_name=? AND ({where})",
+                        (table, *patterns)).fetchall()
+
+def write_chunk(conn, spec, columns, rows):
+    """executemany one validated chunk with the per-row insert triggers dropped for the
+    duration of this transaction (DDL is transactional, so no other writer ever sees them gone)."""
+    table = spec["table"]
+    triggers = deferred_triggers(conn, table)
+    for name, _ in triggers:
+        conn.execute(f"DROP TRIGGER {name}")
+    conn.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})", rows)
+    conn.execute("UPDATE RowCounts SET n = n + ? WHERE table_name = ?", (len(rows), table))
+    for _, sql in triggers:
+        conn.execute(sql)
+    return len(rows)
+
+def bulk_import(kind, path, fmt=None, chunk_rows=DEFAULT_CHUNK_ROWS, skip_invalid=False, log=sys.stderr):
+    """Stream a file into the table. Returns {"imported", "rejected", "seconds"}. Without
+    skip_invalid the first chunk holding an invalid row stops the import (earlier chunks stay,
+    with the ledger and rollups rebuilt for them)."""
+    spec = BULK_TABLES[kind]
+    fmt = detect_format(path, fmt)
+    start = time.perf_counter()
+    imported, rejected, failure = 0, [], None
+
+    try:
+        with open(path, newline="", encoding="utf-8") as f:
+            records = read_records(f, fmt)
+            first = next(records, None)
+            if first is None:
+                return {"imported": 0, "rejected": [], "seconds": 0.0}
+            columns = import_columns(spec, first[1])
+            records = _prepend(first, records)
+
+            while True:
+                chunk = list(islice(records, chunk_rows))
+                if not chunk:
+                    break
+                rows, rejects = convert_rows(spec, columns, chunk)
+
+                def work(conn):
+                    valid, invalid = validate_chunk(conn, spec, columns, rows)
+                    invalid = sorted(rejects + invalid)
+                    if invalid and not skip_invalid:
+                        shown = "; ".join(f"line {n}: {why}" for n, why in invalid[:10])
+                        raise BulkImportError(f"{len(invalid)} invalid row(s) in the chunk after {imported} imported rows: {shown}")
+                    return write_chunk(conn, spec, columns, valid), invalid
+
+                written, invalid = core.write_transaction(work, spec["table"], "RowCounts")
+                imported += written
+                rejected += invalid
+                rate = imported / max(time.perf_counter() - start, 1e-9)
+                print(f"  {spec['table']}: {imported:,} rows ({rate:,.0f} rows/s), {len(rejected):,} rejected", file=log)
+    except BaseException as e:
+        failure = e
+        raise
+    finally:
+        # also after a failed chunk, whose predecessors committed without the per-row triggers;
+        # ledger and rollups are rebuilt together (a booking decides where its payments roll up)
+        if spec["table"] in ("Bookings", "Payments") and imported:
+            try:
+                changed = core.update_all_booking_payment_statuses()
+                print(f"  booking ledger reconciled ({changed:,} bookings updated)", file=log)
+                print(f"  revenue rollups rebuilt ({core.refresh_revenue_rollups():,} rows)", file=log)
+            except Exception as e:
+                # the reconcile and rollups maintenance jobs repair it later; a failed import
+                # still reports its own error, not this one
+                print(f"  ledger/rollup rebuild failed: {e!r} (run maintenance.py --once reconcile rollups)", file=log)
+                if failure is None:
+                    raise
+    return {"imported": imported, "rejected": rejected, "seconds": time.perf_counter() - start}
+
+def _prepend(first, rest):
+    yield first
+    yield from rest
+
+#=============================================================================================
+
+def bulk_export(kind, path, fmt=None, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Stream the table to a file in key order, fetchmany() chunks at a time. Returns rows written."""
+    spec = BULK_TABLES[kind]
+    fmt = detect_format(path, fmt)
+    columns = list(spec["columns"]) + [c for c in spec["derived"] if core.table_has_column(spec["table"], c)]
+    written = 0
+    with core.snapshot_read() as conn, open(path, "w", newline="", encoding="utf-8") as f:
+        cur = conn.execute(f"SELECT {', '.join(columns)} FROM {spec['table']} ORDER BY {spec['key']}")
+        writer = csv.writer(f) if fmt == "csv" else None
+        if writer:
+            writer.writerow(columns)
+        while True:
+            rows = cur.fetchmany(chunk_rows)
+            if not rows:
+                break
+            if writer:
+                writer.writerows(rows)
+            else:
+                f.writelines(json.dumps(dict(zip(columns, r))) + "\n" for r in rows)
+            written += len(rows)
+    return written
+
+#=============================================================================================
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import/export for the travel booking database.")
+    parser.add_argument("--db", default=core.DB_FILE, help="database file (default: %(default)s)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    for name in ("import", "export"):
+        p = sub.add_parser(name)
+        p.add_argument("kind", choices=list(BULK_TABLES))
+        p.add_argument("file")
+        p.add_argument("--format", choices=["csv", "jsonl"])
+        p.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per transaction / fetch")
+        if name == "import":
+            p.add_argument("--skip-invalid", action="store_true", help="skip invalid rows instead of stopping")
+    p = sub.add_parser("report", help="stream the comprehensive booking report to CSV or Parquet")
+    p.add_argument("file")
+    p.add_argument("--format", choices=["csv", "parquet"])
+    p.add_argument("--chunk", type=int, default=core.EXPORT_CHUNK_ROWS, help="rows per fetch / row group")
+    p.add_argument("--from", dest="date_from", help="first booking date (YYYY-MM-DD)")
+    p.add_argument("--to", dest="date_to", help="last booking date (YYYY-MM-DD)")
+    p.add_argument("--dest", type=int, help="destination id")
+    p.add_argument("--history", action="store_true", help="include archived bookings")
+    sub.add_parser("reconcile", help="rebuild the booking ledger and revenue rollups (e.g. after an interrupted import)")
+    sub.add_parser("rollups", help="rebuild the revenue rollups from Payments (backfills)")
+    args = parser.parse_args(argv)
+
+    core.DB_FILE = args.db
+    core.init_db()
+    try:
+        if args.command == "import":
+            result = bulk_import(args.kind, args.file, args.format, args.chunk, args.skip_invalid)
+            for line_no, why in result["rejected"][:20]:
+                print(f"  rejected line {line_no}: {why}", file=sys.stderr)
+            print(f"imported {result['imported']:,} {args.kind} in {result['seconds']:.1f} s, "
+                  f"{len(result['rejected']):,} rejected")
+        elif args.command == "export":
+            start = time.perf_counter()
+            n = bulk_export(args.kind, args.file, args.format, args.chunk)
+            print(f"exported {n:,} {args.kind} in {time.perf_counter() - start:.1f} s")
+        elif args.command == "report":
+            fmt = args.format or ("parquet" if args.file.lower().endswith(".parquet") else "csv")
+            start = time.perf_counter()
+            n = core.export_booking_report(args.file, fmt, args.chunk, date_from=args.date_from,
+                                           date_to=args.date_to, dest_id=args.dest, history=args.history)
+            print(f"exported {n:,} booking report rows in {time.perf_counter() - start:.1f} s")
+        elif args.command == "rollups":
+            start = time.perf_counter()
+            print(f"{core.refresh_revenue_rollups():,} rollup rows rebuilt in {time.perf_counter() - start:.1f} s")
+        else:
+            print(f"{core.update_all_booking_payment_statuses():,} bookings updated, "
+                  f"{core.refresh_revenue_rollups():,} rollup rows rebuilt")
+    except BulkImportError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    finally:
+        core.close_pools()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,236 @@
+import argparse
+import random
+import sys
+import time
+from array import array
+from datetime import date, timedelta
+
+import bulk_io
+import travel_core as core
+
+#=============================================================================================
+#   Synthetic data generator
+#
+#   usage:  python generate_data.py <bookings> [--db FILE] [--seed N] [--customers N] ...
+#   e.g.    python generate_data.py 1000000 --db big.db
+#
+#   Appends a reproducible data set (same seed, same rows) sized from the booking count:
+#   customers, destinations, hotels with 30-400 rooms, flights with the seat map of a real
+#   aircraft type, packages of one hotel + one flight, and per booking a payment (none, half
+#   or full), a room stay that never overlaps another stay of the room, and a ticket while the
+#   flight has seats left. Rows go in with explicit ids, one write transaction per chunk, using
+#   the bulk importer's trigger handling; the booking ledger and revenue rollups are rebuilt
+#   once at the end.
+#=============================================================================================
+
+DEFAULT_CHUNK_ROWS = 50000
+BOOKINGS_PER_CUSTOMER = 5
+BOOKINGS_PER_PACKAGE = 150
+PACKAGES_PER_HOTEL = 4
+DESTINATIONS = 100
+FIRST_BOOKING_DAY = date(2024, 1, 1)
+BOOKING_DAYS = 730
+
+# (type, rows, seat letters) -- seat maps of common aircraft
+AIRCRAFT = [("E190", 25, "ACDF"), ("A320", 30, "ABCDEF"), ("B737", 32, "ABCDEF"), ("A330", 36, "ABCDEFGH")]
+AIRLINES = ["Turkish Airlines", "Pegasus", "Lufthansa", "Air France", "KLM", "Emirates", "British Airways"]
+COUNTRIES = ["Turkey", "Italy", "Spain", "France", "Greece", "Germany", "Japan", "Egypt", "Portugal", "Croatia"]
+FIRST_NAMES = ["Ayse", "Mehmet", "Elif", "Can", "Zeynep", "Emre", "Maria", "John", "Sofia", "Luca", "Anna", "Omar"]
+LAST_NAMES = ["Yilmaz", "Kaya", "Demir", "Sahin", "Celik", "Smith", "Rossi", "Garcia", "Muller", "Dubois", "Silva"]
+
+def default_sizes(n_bookings):
+    packages = max(20, n_bookings // BOOKINGS_PER_PACKAGE)
+    return {
+        "customers": max(100, n_bookings // BOOKINGS_PER_CUSTOMER),
+        "destinations": min(DESTINATIONS, packages),
+        "packages": packages,
+        "hotels": max(5, packages // PACKAGES_PER_HOTEL),
+    }
+
+#=============================================================================================
+
+def next_ids(conn):
+    """First free id per table (archived ids included), so generated rows can carry explicit
+    ids and be appended."""
+    keys = {"Customers": "cust_id", "Destinations": "dest_id", "Services": "service_id", "Rooms": "room_id",
+            "Seats": "seat_id", "TravelPackages": "pkg_id", "PackageContents": "id", "Bookings": "booking_id",
+            "Payments": "payment_id", "Reservations": "res_id", "Tickets": "ticket_id"}
+    return {t: core.next_free_id(conn, t, k) for t, k in keys.items()}
+
+def insert(conn, table, columns, rows):
+    """executemany through the bulk importer: RowCounts bumped once, ledger/rollup triggers deferred."""
+    return bulk_io.write_chunk(conn, {"table": table}, columns, rows)
+
+def chunked(rows, size):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+#=============================================================================================
+
+def generate_catalog(sizes, ids, rnd, chunk_rows):
+    """Destinations, hotels + rooms, flights + seats and packages. Returns the inventory layout
+    the booking generator needs (all plain lists/arrays indexed by position)."""
+    dest_ids = list(range(ids["Destinations"], ids["Destinations"] + sizes["destinations"]))
+    dests = [(d, f"City {d}", rnd.choice(COUNTRIES)) for d in dest_ids]
+
+    service_id, room_id, seat_id = ids["Services"], ids["Rooms"], ids["Seats"]
+    services, hotels, flights, rooms, seats = [], [], [], [], []
+    hotel_layout = []     # (hotel_id, dest_id, first room position, room count)
+    for h in range(sizes["hotels"]):
+        dest_id = dest_ids[h % len(dest_ids)]
+        n_rooms = rnd.randint(30, 400)
+        services.append((service_id, f"Hotel {service_id} {dests[h % len(dests)][1]}", rnd.randint(40, 400)))
+        hotels.append((service_id, rnd.randint(1, 5)))
+        hotel_layout.append((service_id, dest_id, len(rooms), n_rooms))
+        floors = n_rooms // 20 + 1
+        rooms.extend((room_id + i, service_id, str((i % floors + 1) * 100 + i // floors + 1)) for i in range(n_rooms))
+        room_id += n_rooms
+        service_id += 1
+
+    packages, contents = [], []
+    flight_layout = []    # (flight_id, first seat id, seat count) per package
+    pkg_hotel = []        # hotel position per package
+    pkg_id, content_id = ids["TravelPackages"], ids["PackageContents"]
+    for p in range(sizes["packages"]):
+        h = p % len(hotel_layout)
+        hotel_id, dest_id = hotel_layout[h][:2]
+        _, n_rows, letters = rnd.choice(AIRCRAFT)
+        services.append((service_id, f"Flight {service_id}", rnd.randint(60, 900)))
+        flights.append((service_id, rnd.choice(AIRLINES)))
+        seat_nos = [f"{r}{l}" for r in range(1, n_rows + 1) for l in letters]
+        seats.extend((seat_id + i, service_id, no) for i, no in enumerate(seat_nos))
+        flight_layout.append((service_id, seat_id, len(seat_nos)))
+        seat_id += len(seat_nos)
+        packages.append((pkg_id, dest_id, f"Package {pkg_id}", rnd.randint(5, 50) * 100))
+        contents += [(content_id, pkg_id, hotel_id), (content_id + 1, pkg_id, service_id)]
+        pkg_hotel.append(h)
+        pkg_id, content_id, service_id = pkg_id + 1, content_id + 2, service_id + 1
+
+    for table, columns, rows in [
+        ("Destinations", ["dest_id", "city", "country"], dests),
+        ("Services", ["service_id", "service_name", "base_price"], services),
+        ("Hotels", ["hotel_id", "stars"], hotels),
+        ("Flights", ["flight_id", "airline"], flights),
+        ("Rooms", ["room_id", "hotel_id", "room_no"], rooms),
+        ("Seats", ["seat_id", "flight_id", "seat_no"], seats),
+        ("TravelPackages", ["pkg_id", "dest_id", "pkg_name", "price"], packages),
+        ("PackageContents", ["id", "pkg_id", "service_id"], contents),
+    ]:
+        for chunk in chunked(rows, chunk_rows):
+            core.write_transaction(lambda conn: insert(conn, table, columns, chunk), table, "RowCounts")
+
+    return {"packages": [(p[0], p[3]) for p in packages], "pkg_hotel": pkg_hotel,
+            "hotel_layout": hotel_layout, "room_ids": array("q", (r[0] for r in rooms)),
+            "flight_layout": flight_layout, "counts": {"services": len(services), "rooms": len(rooms), "seats": len(seats)}}
+
+def generate_customers(n, ids, rnd, chunk_rows):
+    first = ids["Customers"]
+    rows = [(c, f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}", f"customer{c}@example.com")
+            for c in range(first, first + n)]
+    for chunk in chunked(rows, chunk_rows):
+        core.write_transaction(lambda conn: insert(conn, "Customers", ["cust_id", "name", "email"], chunk),
+                               "Customers", "RowCounts")
+    return list(range(first, first + n))
+
+#=============================================================================================
+
+def generate_bookings(n, cust_ids, catalog, ids, rnd, chunk_rows, log):
+    """Bookings with their payments, room stays and tickets, one write transaction per chunk."""
+    packages, pkg_hotel, hotel_layout = catalog["packages"], catalog["pkg_hotel"], catalog["hotel_layout"]
+    room_ids, flight_layout = catalog["room_ids"], catalog["flight_layout"]
+    room_free = array("i", [0]) * len(room_ids)       # first free day (from FIRST_BOOKING_DAY) per room
+    seats_sold = array("i", [0]) * len(flight_layout)
+    booking_id, payment_id, res_id, ticket_id = ids["Bookings"], ids["Payments"], ids["Reservations"], ids["Tickets"]
+    counts = {"bookings": 0, "payments": 0, "reservations": 0, "tickets": 0}
+    start = time.perf_counter()
+
+    while counts["bookings"] < n:
+        bookings, payments, reservations, tickets = [], [], [], []
+        for _ in range(min(chunk_rows, n - counts["bookings"])):
+            p = rnd.randrange(len(packages))
+            pkg_id, price = packages[p]
+            day = rnd.randrange(BOOKING_DAYS)
+            booked = FIRST_BOOKING_DAY + timedelta(days=day)
+            bookings.append((booking_id, rnd.choice(cust_ids), pkg_id, str(booked)))
+
+            roll = rnd.random()
+            if roll >= 0.3:
+                payments.append((payment_id, booking_id, price if roll >= 0.6 else price / 2, str(booked)))
+                payment_id += 1
+
+            hotel_id, _, first_room, n_rooms = hotel_layout[pkg_hotel[p]]
+            r = first_room + rnd.randrange(n_rooms)
+            stay_start = max(day + rnd.randint(7, 120), room_free[r])
+            stay_end = stay_start + rnd.randint(1, 14)
+            room_free[r] = stay_end
+            reservations.append((res_id, booking_id, hotel_id, room_ids[r],
+                                 str(FIRST_BOOKING_DAY + timedelta(days=stay_start)),
+                                 str(FIRST_BOOKING_DAY + timedelta(days=stay_end))))
+            res_id += 1
+
+            first_seat, n_seats = flight_layout[p][1:]
+            if seats_sold[p] < n_seats:          # sold-out flights leave the booking without a ticket
+                tickets.append((ticket_id, booking_id, first_seat + seats_sold[p], str(booked)))
+                seats_sold[p] += 1
+                ticket_id += 1
+            booking_id += 1
+
+        def work(conn):
+            insert(conn, "Bookings", ["booking_id", "cust_id", "pkg_id", "booking_date"], bookings)
+            insert(conn, "Payments", ["payment_id", "booking_id", "amount", "payment_date"], payments)
+            insert(conn, "Reservations", ["res_id", "booking_id", "service_id", "room_id", "check_in", "check_out"], reservations)
+            insert(conn, "Tickets", ["ticket_id", "booking_id", "seat_id", "issue_date"], tickets)
+        core.write_transaction(work, "Bookings", "Payments", "Reservations", "Tickets", "RowCounts")
+
+        for key, rows in (("bookings", bookings), ("payments", payments), ("reservations", reservations), ("tickets", tickets)):
+            counts[key] += len(rows)
+        rate = counts["bookings"] / max(time.perf_counter() - start, 1e-9)
+        print(f"  bookings: {counts['bookings']:,} of {n:,} ({rate:,.0f} rows/s)", file=log)
+    return counts
+
+#=============================================================================================
+
+def generate(n_bookings, seed=42, chunk_rows=DEFAULT_CHUNK_ROWS, log=sys.stderr, **sizes):
+    """Append a synthetic data set to core.DB_FILE. Keyword sizes (customers, destinations,
+    packages, hotels) override default_sizes(). Returns the row counts written."""
+    sizes = {**default_sizes(n_bookings), **{k: v for k, v in sizes.items() if v is not None}}
+    rnd = random.Random(seed)
+    core.init_db()
+    with core.get_pool().connection() as conn:
+        ids = next_ids(conn)
+
+    start = time.perf_counter()
+    catalog = generate_catalog(sizes, ids, rnd, chunk_rows)
+    cust_ids = generate_customers(sizes["customers"], ids, rnd, chunk_rows)
+    print(f"  catalog: {sizes['packages']:,} packages, {catalog['counts']['rooms']:,} rooms, "
+          f"{catalog['counts']['seats']:,} seats; {len(cust_ids):,} customers", file=log)
+    counts = generate_bookings(n_bookings, cust_ids, catalog, ids, rnd, chunk_rows, log)
+    core.update_all_booking_payment_statuses()
+    core.refresh_revenue_rollups()
+    with core.get_pool().connection() as conn:
+        conn.execute("ANALYZE")    # planner statistics for the filled tables
+    counts.update(sizes, **catalog["counts"], seconds=time.perf_counter() - start)
+    return counts
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic travel booking data set.")
+    parser.add_argument("bookings", type=int)
+    parser.add_argument("--db", default=core.DB_FILE, help="database file (default: %(default)s)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk", type=int, default=DEFAULT_CHUNK_ROWS, help="rows per transaction")
+    for size in ("customers", "destinations", "packages", "hotels"):
+        parser.add_argument(f"--{size}", type=int, help=f"number of {size} (default: scaled from bookings)")
+    args = parser.parse_args(argv)
+
+    core.DB_FILE = args.db
+    try:
+        counts = generate(args.bookings, args.seed, args.chunk, customers=args.customers,
+                          destinations=args.destinations, packages=args.packages, hotels=args.hotels)
+    finally:
+        core.close_pools()
+    print(f"generated {counts['bookings']:,} bookings, {counts['payments']:,} payments, "
+          f"{counts['reservations']:,} reservations, {counts['tickets']:,} tickets in {counts['seconds']:.1f} s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import argparse
+import sys
+import time
+
+import travel_core as core
+
+#=============================================================================================
+#   Background maintenance as its own process
+#
+#   usage:  python maintenance.py [--db FILE] [--every JOB=SECONDS ...]
+#           python maintenance.py --once [JOB ...]
+#
+#   Runs the same scheduler the app starts in-process (travel_core.MAINTENANCE_JOBS: WAL
+#   checkpoint, statistics refresh, incremental vacuum, ledger reconciliation, revenue rollup
+#   repair, and the archive and analytics snapshot jobs, which are off unless given an interval)
+#   in the foreground until interrupted. Due jobs are claimed in MaintenanceRuns, so this
+#   process and any number of app servers never run the same job twice in one interval.
+#   --once runs the given jobs (default: every job with a nonzero interval) immediately,
+#   prints their results and exits, e.g. from cron. `--once convert-vacuum` is a one-off,
+#   never part of the default: it converts a database created before incremental vacuum with
+#   a full VACUUM, which locks out writers until it is done.
+#=============================================================================================
+
+# run by --once only when named; not scheduled
+ONE_OFF_COMMANDS = {"convert-vacuum": core.convert_to_incremental_vacuum}
+
+def parse_intervals(pairs):
+    intervals = {}
+    for pair in pairs:
+        job, _, seconds = pair.partition("=")
+        try:
+            if job not in core.MAINTENANCE_JOBS:
+                raise ValueError(job)
+            intervals[job] = float(seconds)
+        except ValueError:
+            raise SystemExit(f"bad --every {pair!r}; expected JOB=SECONDS with JOB in {', '.join(core.MAINTENANCE_JOBS)}")
+    return intervals
+
+def print_stats(scheduler):
+    for job, s in scheduler.stats().items():
+        print(f"  {job:<11} runs {s['runs']:>4}  last {s['last_ms']:9.1f} ms  longest lock {s['max_lock_ms']:6.1f} ms  "
+              f"{s['last_result']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the travel database maintenance jobs.")
+    parser.add_argument("--db", default=core.DB_FILE, help="database file (default: %(default)s)")
+    parser.add_argument("--every", nargs="*", default=[], metavar="JOB=SECONDS",
+                        help="override a job's interval (0 switches it off)")
+    parser.add_argument("--once", nargs="*", metavar="JOB",
+                        help="run these jobs (default: every job with an interval) now and exit; also convert-vacuum")
+    args = parser.parse_args(argv)
+
+    core.DB_FILE = args.db
+    core.init_db()
+    scheduler = core.get_maintenance_scheduler()
+    scheduler.intervals.update(parse_intervals(args.every))
+    try:
+        if args.once is not None:
+            # an interval of 0 (archive and analytics by default) means the job is off
+            for job in args.once or [job for job, seconds in scheduler.intervals.items() if seconds]:
+                if job in ONE_OFF_COMMANDS:
+                    print(f"{job}: {ONE_OFF_COMMANDS[job]()}")
+                    continue
+                if job not in core.MAINTENANCE_JOBS:
+                    raise SystemExit(f"unknown job {job!r}; expected one of {', '.join([*core.MAINTENANCE_JOBS, *ONE_OFF_COMMANDS])}")
+                print(f"{job}: {scheduler.run_job(job, force=True)}")
+        else:
+            scheduler.start()
+            print(f"maintenance running on {args.db} (Ctrl+C to stop)")
+            try:
+                while True:
+                    time.sleep(60)
+                    print_stats(scheduler)
+            except KeyboardInterrupt:
+                scheduler.stop()
+        print_stats(scheduler)
+    finally:
+        core.close_pools()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+import travel_core as core
+
+#=============================================================================================
+#   Concurrent seat/room allocation stress test
+#
+#   usage:  python stress_allocation.py [processes] [seconds]
+#   e.g.    python stress_allocation.py 8 20
+#
+#   PACKAGES packages of one hotel (ROOMS_PER_HOTEL rooms) and one flight (SEATS_PER_FLIGHT
+#   seats). Every process books random packages for random 1-3 night stays inside a
+#   WINDOW_DAYS window through create_booking() until the inventory runs dry or time is up;
+#   a share of the attempts instead tickets an explicitly chosen, possibly taken, seat.
+#   Afterwards the database must hold no seat ticketed twice, no overlapping stays in a room,
+#   and no booking with only part of its package reserved. Exits non-zero otherwise.
+#=============================================================================================
+
+DEFAULT_PROCESSES = 8
+DEFAULT_SECONDS = 20
+PACKAGES = 20
+ROOMS_PER_HOTEL = 20
+SEATS_PER_FLIGHT = 200
+WINDOW_DAYS = 30
+EXPLICIT_SEAT_SHARE = 0.3
+GIVE_UP_AFTER_REJECTS = 200    # consecutive rejections before a process decides it is sold out
+FIRST_DAY = date(2025, 7, 1)
+
+#=============================================================================================
+
+def setup(db_file):
+    core.DB_FILE = db_file
+    core.init_db()
+    with core.get_pool().connection() as conn:
+        cust_id = conn.execute("INSERT INTO Customers (name, email) VALUES ('Stress Test', 'stress@test')").lastrowid
+        dest_id = conn.execute("INSERT INTO Destinations (city, country) VALUES ('Stress City', 'Benchmark')").lastrowid
+        for p in range(PACKAGES):
+            hotel_id = conn.execute("INSERT INTO Services (service_name, base_price) VALUES (?, 100)", (f"Stress Hotel {p}",)).lastrowid
+            conn.execute("INSERT INTO Hotels (hotel_id, stars) VALUES (?, 3)", (hotel_id,))
+            conn.executemany("INSERT INTO Rooms (hotel_id, room_no) VALUES (?, ?)", [(hotel_id, str(r)) for r in range(ROOMS_PER_HOTEL)])
+            flight_id = conn.execute("INSERT INTO Services (service_name, base_price) VALUES (?, 100)", (f"Stress Flight {p}",)).lastrowid
+            conn.execute("INSERT INTO Flights (flight_id, airline) VALUES (?, 'ST')", (flight_id,))
+            conn.executemany("INSERT INTO Seats (flight_id, seat_no) VALUES (?, ?)", [(flight_id, str(s)) for s in range(SEATS_PER_FLIGHT)])
+            pkg_id = conn.execute("INSERT INTO TravelPackages (dest_id, pkg_name, price) VALUES (?, ?, 1000)", (dest_id, f"Stress Package {p}")).lastrowid
+            conn.executemany("INSERT INTO PackageContents (pkg_id, service_id) VALUES (?, ?)", [(pkg_id, hotel_id), (pkg_id, flight_id)])
+        conn.commit()
+        pkgs = [r[0] for r in conn.execute("SELECT pkg_id FROM TravelPackages WHERE pkg_name LIKE 'Stress%'")]
+        seats = [(r[0], r[1]) for r in conn.execute("SELECT flight_id, seat_id FROM Seats JOIN Flights USING (flight_id) WHERE airline = 'ST'")]
+    core.close_pools()
+    return cust_id, pkgs, seats
+
+#=============================================================================================
+
+def worker(db_file, cust_id, pkgs, seats, seconds, seed, results):
+    core.DB_FILE = db_file
+    rnd = random.Random(seed)
+    counts = {"bookings": 0, "explicit_seats": 0, "rejected": 0, "busy": 0}
+    rejects_in_a_row = 0
+    start = time.perf_counter()
+    deadline = start + seconds
+    while time.perf_counter() < deadline and rejects_in_a_row < GIVE_UP_AFTER_REJECTS:
+        try:
+            if rnd.random() < EXPLICIT_SEAT_SHARE:
+                flight_id, seat_id = rnd.choice(seats)
+                booking_id = core.create_booking(cust_id, rnd.choice(pkgs), FIRST_DAY)["booking_id"]
+                core.allocate_seat(booking_id, flight_id, seat_id)
+                counts["explicit_seats"] += 1
+            else:
+                check_in = FIRST_DAY + timedelta(days=rnd.randrange(WINDOW_DAYS))
+                core.create_booking(cust_id, rnd.choice(pkgs), FIRST_DAY, check_in, check_in + timedelta(days=rnd.randint(1, 3)))
+                counts["bookings"] += 1
+            rejects_in_a_row = 0
+        except core.AllocationError:
+            counts["rejected"] += 1
+            rejects_in_a_row += 1
+        except sqlite3.OperationalError as e:
+            if not core.is_busy_error(e):
+                raise
+            counts["busy"] += 1
+    counts["seconds"] = time.perf_counter() - start
+    counts.update(core.get_lock_stats().stats())
+    results.put(counts)
+
+#=============================================================================================
+
+def verify(conn):
+    """Names of the broken guarantees (empty when all hold)."""
+    problems = []
+    if conn.execute("SELECT seat_id FROM Tickets WHERE seat_id IS NOT NULL GROUP BY seat_id HAVING COUNT(*) > 1").fetchall():
+        problems.append("a seat was ticketed twice")
+    overlap = conn.execute(f"""SELECT 1 FROM Reservations a JOIN Reservations res
+                                ON {core.reservation_overlap_sql("a.room_id", core.span_start_sql("a"), core.span_end_sql("a"))}
+                               WHERE res.res_id > a.res_id LIMIT 1""").fetchall()
+    if overlap:
+        problems.append("a room has overlapping stays")
+    partial = conn.execute("""SELECT b.booking_id FROM Bookings b
+                              JOIN Reservations r ON r.booking_id = b.booking_id
+                              LEFT JOIN Tickets t ON t.booking_id = b.booking_id
+                              WHERE t.ticket_id IS NULL LIMIT 1""").fetchall()
+    if partial:
+        problems.append("a booking got a room but no seat")
+    spans = conn.execute("SELECT COUNT(*) FROM ReservationSpans").fetchone()[0]
+    dated = conn.execute("SELECT COUNT(*) FROM Reservations WHERE room_id IS NOT NULL AND check_in IS NOT NULL").fetchone()[0]
+    if spans != dated:
+        problems.append("the interval index is out of step with Reservations")
+    return problems
+
+def run(processes, seconds):
+    db_file = os.path.join(tempfile.mkdtemp(prefix="alloc_stress_"), "stress.db")
+    cust_id, pkgs, seats = setup(db_file)
+
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    procs = [ctx.Process(target=worker, args=(db_file, cust_id, pkgs, seats, seconds, i, results)) for i in range(processes)]
+    for p in procs:
+        p.start()
+    per_process = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+    elapsed = max(r["seconds"] for r in per_process)   # busiest process, without interpreter start-up
+
+    total = {k: sum(r[k] for r in per_process) for k in ("bookings", "explicit_seats", "rejected", "busy", "transactions", "retries", "gave_up")}
+    allocations = total["bookings"] + total["explicit_seats"]
+    print(f"processes: {processes}  elapsed: {elapsed:.1f} s")
+    print(f"package bookings: {total['bookings']}  explicit seats: {total['explicit_seats']}  "
+          f"rejected: {total['rejected']}  busy errors: {total['busy']}")
+    print(f"allocations/s: {allocations / elapsed:.0f}  write transactions/s: {total['transactions'] / elapsed:.0f}")
+    print(f"lock wait  avg: {max(r['avg_wait_ms'] for r in per_process):.2f} ms (worst process)  "
+          f"p95: {max(r['p95_wait_ms'] for r in per_process):.2f} ms  max: {max(r['max_wait_ms'] for r in per_process):.2f} ms  "
+          f"retries: {total['retries']}  gave up: {total['gave_up']}")
+
+    conn = sqlite3.connect(db_file)
+    problems = verify(conn)
+    seats_sold = conn.execute("SELECT COUNT(*) FROM Tickets t JOIN Seats s USING (seat_id) JOIN Flights f USING (flight_id) WHERE f.airline = 'ST'").fetchone()[0]
+    conn.close()
+    print(f"seats sold: {seats_sold} of {len(seats)}")
+    if problems:
+        print("FAILED: " + "; ".join(problems))
+        sys.exit(1)
+    print("OK: no double allocation")
+
+#=============================================================================================
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:]]
+    run(args[0] if args else DEFAULT_PROCESSES, args[1] if len(args) > 1 else DEFAULT_SECONDS)
@@ -0,0 +1,41 @@
+#=============================================================================================
+#   Recomputations of the trigger-maintained state, for asserting it is exact.
+#=============================================================================================
+
+def ledger_drift(db):
+    """Bookings whose total_paid / balance_due / is_paid differ from their payments."""
+    with db.get_pool().connection() as conn:
+        changed = db.reconcile_payment_statuses(conn)
+        conn.rollback()
+    return changed
+
+def row_count_drift(db):
+    """{table: (RowCounts.n, COUNT(*))} for every counted table that is off."""
+    with db.get_pool().connection() as conn:
+        counts = dict(conn.execute("SELECT table_name, n FROM RowCounts"))
+        actual = {t: conn.execute(f"SELECT COUNT(*) FROM {t}").fetchone()[0] for t in db.COUNTED_TABLES}
+    return {t: (counts.get(t), n) for t, n in actual.items() if counts.get(t) != n}
+
+def rollup_drift(db):
+    """{rollup table or "revenue": difference} for every revenue rollup (and the running
+    total) that differs from a recomputation from Payments."""
+    with db.get_pool().connection() as conn:
+        drift = db.revenue_rollup_drift(conn)
+    return {table: rows for table, rows in drift.items() if (abs(rows or 0) > 0.005 if table == "revenue" else rows)}
+
+def span_drift(db):
+    """Rows that ReservationSpans has and a recomputation from Reservations lacks, and the
+    other way round."""
+    expected = f"""SELECT res.res_id, rm.hotel_id, rm.hotel_id, {db.span_start_sql("res")}, {db.span_end_sql("res")}, res.room_id
+                   FROM Reservations res JOIN Rooms rm ON rm.room_id = res.room_id
+                   WHERE rm.hotel_id IS NOT NULL AND julianday(date(res.check_in)) IS NOT NULL"""
+    stored = "SELECT res_id, hotel_lo, hotel_hi, day_lo, day_hi, room_id FROM ReservationSpans"
+    with db.get_pool().connection() as conn:
+        return (conn.execute(f"{stored} EXCEPT {expected}").fetchall(),
+                conn.execute(f"{expected} EXCEPT {stored}").fetchall())
+
+def assert_consistent(db):
+    assert ledger_drift(db) == 0
+    assert row_count_drift(db) == {}
+    assert rollup_drift(db) == {}
+    assert span_drift(db) == ([], [])
@@ -0,0 +1,20 @@
+import pathlib
+import sys
+
+import pytest
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parents[1]))
+
+import travel_core as core  # noqa: E402
+
+#=============================================================================================
+#   Every test gets its own database file (and so its own pools, cache and counters, which
+#   are per DB_FILE), migrated to the current schema.
+#=============================================================================================
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    monkeypatch.setattr(core, "DB_FILE", str(tmp_path / "travel.db"))
+    core.init_db()
+    yield core
+    core.close_pools()
@@ -0,0 +1,107 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from checks import assert_consistent
+
+PKG, HOTEL, FLIGHT = 1, 6, 1          # sample data: package 1 is hotel 6 plus flight 1
+
+def test_guard_rejects_a_double_sold_seat(db):
+    booking = db.create_booking(1, PKG, "2025-06-01", "2025-07-01", "2025-07-03")
+    seat, = booking["seats"]
+    with pytest.raises(sqlite3.IntegrityError, match="seat already ticketed"):
+        db.run_query("INSERT INTO Tickets (booking_id, seat_id) VALUES (?, ?)", (2, seat), fetch=False)
+    other = db.create_booking(2, PKG, "2025-06-01", "2025-07-01", "2025-07-03")["seats"][0]
+    with pytest.raises(sqlite3.IntegrityError, match="seat already ticketed"):
+        db.run_query("UPDATE Tickets SET seat_id = ? WHERE seat_id = ?", (seat, other), fetch=False)
+    with pytest.raises(db.AllocationError, match="already ticketed"):
+        db.write_transaction(lambda conn: db.reserve_seat(conn, 3, FLIGHT, seat_id=seat), "Tickets")
+    assert db.run_query("SELECT COUNT(*) FROM Tickets WHERE seat_id = ?", (seat,)) == [(1,)]
+    assert_consistent(db)
+
+def test_guard_rejects_an_overlapping_stay(db):
+    db.run_query("DELETE FROM Rooms WHERE hotel_id = ? AND room_id <> 1", (HOTEL,), fetch=False)   # a one-room hotel
+    room, = db.create_booking(1, PKG, "2025-06-01", "2025-07-01", "2025-07-05")["rooms"]
+    insert = "INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (2, ?, ?, ?, ?)"
+    for check_in, check_out in [("2025-07-04", "2025-07-08"), ("2025-06-28", "2025-07-02"), ("2025-07-02", "2025-07-03")]:
+        with pytest.raises(sqlite3.IntegrityError, match="room already reserved"):
+            db.run_query(insert, (HOTEL, room, check_in, check_out), fetch=False)
+    db.run_query(insert, (HOTEL, room, "2025-07-05", "2025-07-07"), fetch=False)       # stays are half-open
+    (res_id,), = db.run_query("SELECT MAX(res_id) FROM Reservations")
+    with pytest.raises(sqlite3.IntegrityError, match="room already reserved"):
+        db.run_query("UPDATE Reservations SET check_in = '2025-07-03' WHERE res_id = ?", (res_id,), fetch=False)
+    (bookings,), = db.run_query("SELECT COUNT(*) FROM Bookings")
+    with pytest.raises(db.AllocationError, match="No free room"):
+        db.create_booking(3, PKG, "2025-06-01", "2025-07-06", "2025-07-07")
+    assert db.run_query("SELECT COUNT(*) FROM Bookings") == [(bookings,)]        # the booking went with the room
+    assert db.run_query("SELECT COUNT(*) FROM Reservations WHERE room_id = ? AND check_in >= '2025-07'", (room,)) == [(2,)]
+    assert_consistent(db)
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_a_stay_without_check_out_is_one_night(db, monkeypatch, indexed):
+    if not indexed:
+        monkeypatch.setattr(db, "interval_index_available", lambda conn=None: False)
+    db.run_query("DELETE FROM Rooms WHERE hotel_id = ? AND room_id <> 1", (HOTEL,), fetch=False)   # a one-room hotel
+    booking = db.create_booking(1, PKG, "2025-06-01", "2025-07-04")
+    assert db.run_query("SELECT room_id, check_out FROM Reservations WHERE booking_id = ?",
+                        (booking["booking_id"],)) == [(booking["rooms"][0], None)]
+    for check_in, check_out in [("2025-07-04", None), ("2025-07-03", "2025-07-05"), ("2025-07-04", "2025-07-04")]:
+        assert db.free_rooms(HOTEL, check_in, check_out) == []
+        with pytest.raises(db.AllocationError, match="No free room"):
+            db.create_booking(2, PKG, "2025-06-01", check_in, check_out)
+    assert db.create_booking(2, PKG, "2025-06-01", "2025-07-05")["rooms"] == booking["rooms"]
+    assert_consistent(db)
+
+def test_concurrent_allocations_never_sell_a_seat_twice(db):
+    (seats,), = db.run_query("SELECT COUNT(*) FROM Seats WHERE flight_id = 2")
+    threads = 3 * seats
+    start, sold, refused = threading.Barrier(threads), [], []
+
+    def book():
+        start.wait()
+        try:
+            sold.append(db.allocate_seat(1, 2)[1])
+        except db.AllocationError:
+            refused.append(1)
+
+    workers = [threading.Thread(target=book) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join(30)
+    assert sorted(sold) == sorted(seat_id for seat_id, in db.run_query("SELECT seat_id FROM Seats WHERE flight_id = 2"))
+    assert len(refused) == threads - seats
+    assert db.get_lock_stats().stats()["gave_up"] == 0
+    assert_consistent(db)
+
+def test_concurrent_bookings_with_dates_on_a_one_connection_pool(db):
+    """create_booking's room lookup runs inside its write transaction; with one pooled
+    connection any second checkout there would never return."""
+    db.get_pool().max_size = 1
+    db.get_query_cache().clear()
+    (rooms,), = db.run_query("SELECT COUNT(*) FROM Rooms WHERE hotel_id = ?", (HOTEL,))
+    (seats,), = db.run_query("SELECT COUNT(*) FROM Seats WHERE flight_id = ? AND seat_id NOT IN (SELECT seat_id FROM Tickets)", (FLIGHT,))
+    threads = 8
+    start, booked, refused = threading.Barrier(threads), [], []
+
+    def book(cust_id):
+        start.wait()
+        try:
+            booked.append(db.create_booking(cust_id, PKG, "2025-06-01", "2025-07-05", "2025-07-06"))
+        except db.AllocationError:
+            refused.append(cust_id)
+
+    workers = [threading.Thread(target=book, args=(1 + i % 5,), daemon=True) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    deadline = time.monotonic() + 30
+    for worker in workers:
+        worker.join(max(0, deadline - time.monotonic()))
+    assert not any(worker.is_alive() for worker in workers)
+    assert len(booked) == min(rooms, seats, threads) and len(refused) == threads - len(booked)
+    assert len({b["rooms"][0] for b in booked}) == len(booked)
+    assert len({b["seats"][0] for b in booked}) == len(booked)
+    assert db.get_lock_stats().stats()["gave_up"] == 0
+    assert_consistent(db)
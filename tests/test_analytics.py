@@ -0,0 +1,26 @@
+import maintenance
+
+def test_columnar_reports_match_sql(db):
+    db.add_payment(2, 125)
+    results = db.compare_report_engines()
+    assert {r["report"] for r in results} == set(db.ANALYTICS_REPORTS)
+    assert [(r["report"], r["difference"]) for r in results if not r["match"]] == []
+    filtered = db.compare_report_engines(date_from="2025-02-01", dest_id=2)
+    assert all(r["match"] for r in filtered)
+
+def test_refresh_rewrites_only_the_changed_parts(db):
+    first = db.refresh_analytics()
+    assert first["parts_written"] == len(db.ANALYTICS_TABLES)
+    assert db.refresh_analytics()["parts_written"] == 0
+    db.add_payment(3, 40)
+    assert db.analytics_status()["pending_parts"] == 2          # the payment and its booking's ledger
+    assert db.refresh_analytics()["parts_written"] == 2
+    spending = db.report_frame("customer spending", engine="columnar").set_index("cust_id")
+    assert spending.equals(db.report_frame("customer spending").set_index("cust_id"))
+
+def test_maintenance_exports_only_when_the_job_has_an_interval(db):
+    folder = db.analytics_dir_for(db.DB_FILE)
+    maintenance.main(["--db", db.DB_FILE, "--once"])
+    assert not folder.exists() or not any(folder.iterdir())
+    maintenance.main(["--db", db.DB_FILE, "--every", "analytics=3600", "--once"])
+    assert len(list(folder.glob("*/*.parquet"))) == len(db.ANALYTICS_TABLES)
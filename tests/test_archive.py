@@ -0,0 +1,98 @@
+import io
+
+import pytest
+
+import bulk_io
+import generate_data
+from checks import assert_consistent
+
+HISTORY_TOTALS_SQL = """SELECT (SELECT COUNT(*) FROM BookingHistory), (SELECT COUNT(*) FROM PaymentHistory),
+                               (SELECT COALESCE(SUM(amount), 0) FROM PaymentHistory)"""
+
+def paid_booking(db, booking_date="2020-01-01"):
+    """A booking on package 1, paid in full, so the archive takes it."""
+    booking_id = db.create_booking(1, 1, booking_date)["booking_id"]
+    db.add_payment(booking_id, db.get_package_price(1))
+    return booking_id
+
+def test_archive_moves_only_completed_bookings(db):
+    old, unpaid, recent = paid_booking(db), db.create_booking(1, 1, "2020-01-01")["booking_id"], paid_booking(db, "2025-06-01")
+    before = db.run_query(HISTORY_TOTALS_SQL)
+    archived = db.archive_bookings("2021-01-01")
+    assert archived["bookings_archived"] == 1
+    assert archived["revenue_archived"] == pytest.approx(db.get_package_price(1))
+    assert [r[0] for r in db.run_query("SELECT booking_id FROM Bookings WHERE booking_id IN (?, ?, ?)", (old, unpaid, recent))] == [unpaid, recent]
+    assert db.run_query("SELECT booking_date FROM BookingHistory WHERE booking_id = ?", (old,)) == [("2020-01-01",)]
+    assert db.run_query(HISTORY_TOTALS_SQL) == before                  # moved, not lost
+    assert db.archive_bookings("2021-01-01")["bookings_archived"] == 0
+    assert_consistent(db)
+
+def tour(db, rooms=4, seats=6):
+    """An auto-priced package of one hotel and one flight: (pkg_id, hotel_id, flight_id)."""
+    hotel = db.add_service("Hotel", "Test Inn", 100, 4, [f"{101 + i}" for i in range(rooms)])
+    flight = db.add_service("Flight", "Test Air 1", 200, "GB", [f"{1 + i}A" for i in range(seats)])
+    pkg = db.add_package(1, "Test tour")
+    db.add_package_service(pkg, hotel)
+    db.add_package_service(pkg, flight)
+    return pkg, hotel, flight
+
+def test_mixed_writes_keep_every_derived_table_exact(db):
+    pkg, _, _ = tour(db)
+    cust = db.add_customer("Test Traveller", "traveller@example.com")
+    old = db.create_booking(cust, pkg, "2020-03-01", "2020-04-01", "2020-04-05")["booking_id"]
+    kept = db.create_booking(1, pkg, "2025-06-01", "2025-07-01", "2025-07-03")["booking_id"]
+    group = db.create_group_booking([2, 3, 3], pkg, "2025-06-02", "2025-07-02", "2025-07-04", deposit=30)["booking_ids"]
+    db.add_payment(old, db.get_package_price(pkg))
+    db.add_payment(kept, 50)
+    payment = db.add_payment(kept, 20)
+    assert_consistent(db)
+
+    db.execute_write("UPDATE Payments SET amount = ? WHERE payment_id = ?", (25, payment))
+    db.execute_write("DELETE FROM Payments WHERE booking_id = ? AND payment_id <> ?", (kept, payment))
+    db.execute_write("UPDATE Payments SET amount = 45 WHERE booking_id = ?", (group[1],))
+    db.update_booking(kept, pkg_id=1)                                 # re-priced from another package
+    db.update_package(pkg, price=999)                                 # every booking of the package re-priced
+    db.execute_write("UPDATE TravelPackages SET dest_id = 2 WHERE pkg_id = ?", (pkg,))   # revenue moves destination
+    (due,), = db.run_query("SELECT balance_due FROM Bookings WHERE booking_id = ?", (old,))
+    db.add_payment(old, due)
+    db.execute_write("UPDATE Reservations SET check_out = '2025-07-10' WHERE booking_id = ?", (group[1],))
+    db.delete_booking(group[2])                                       # cascades to payments, room, seat
+    db.delete_customer(2)                                             # cascades through their bookings
+    assert_consistent(db)
+
+    before = db.run_query(HISTORY_TOTALS_SQL)
+    archived = db.archive_bookings("2021-01-01")
+    assert archived["bookings_archived"] >= 1
+    assert not db.run_query("SELECT 1 FROM Bookings WHERE booking_id = ?", (old,))
+    assert db.run_query(HISTORY_TOTALS_SQL) == before                  # moved, not lost
+    assert_consistent(db)
+
+    db.add_payment(kept, 5)
+    db.create_booking(cust, pkg, "2025-08-01", "2025-07-03", "2025-07-04")
+    assert_consistent(db)
+
+def test_archived_booking_id_cannot_be_imported_again(db, tmp_path):
+    booking_id = paid_booking(db)
+    assert db.archive_bookings("2021-01-01")["bookings_archived"] >= 1
+    assert not db.run_query("SELECT 1 FROM Bookings WHERE booking_id = ?", (booking_id,))
+
+    path = tmp_path / "bookings.csv"
+    path.write_text(f"booking_id,cust_id,pkg_id,booking_date\n{booking_id},1,1,2025-05-05\n", encoding="utf-8")
+    with pytest.raises(bulk_io.BulkImportError, match=f"duplicate booking_id {booking_id}"):
+        bulk_io.bulk_import("bookings", str(path), log=io.StringIO())
+    assert db.run_query("SELECT booking_date FROM BookingHistory WHERE booking_id = ?", (booking_id,)) == [("2020-01-01",)]
+
+def test_generated_ids_start_above_archived_ones(db):
+    booking_id = paid_booking(db)
+    db.archive_bookings("2021-01-01")
+    db.run_query("DELETE FROM main.sqlite_sequence WHERE name = 'Bookings'", fetch=False)   # lost high-water mark
+    with db.get_pool().connection() as conn:
+        assert generate_data.next_ids(conn)["Bookings"] > booking_id
+
+def test_dashboard_revenue_agrees_with_the_chart_after_archiving(db):
+    paid_booking(db)
+    archived = db.archive_bookings("2021-01-01")
+    metrics = db.dashboard_metrics(ttl=0)
+    assert metrics["revenue"] == pytest.approx(db.revenue_series("month")["amount"].sum())
+    assert metrics["archived_bookings"] == archived["bookings_archived"]
+    assert metrics["archived_revenue"] == pytest.approx(archived["revenue_archived"])
@@ -0,0 +1,40 @@
+from checks import assert_consistent
+
+HOTEL, FLIGHT = 6, 1          # sample data: room 1 of hotel 6 is reserved 2025-01-10..15, seat 1 of flight 1 ticketed
+
+def reserve(db, room_id, check_in, check_out):
+    db.run_query("INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (1, ?, ?, ?, ?)",
+                 (HOTEL, room_id, check_in, check_out), fetch=False)
+
+def free_room_ids(db, check_in, check_out):
+    return {room_id for room_id, _ in db.free_rooms(HOTEL, check_in, check_out)}
+
+def test_stays_are_half_open(db):
+    reserve(db, 2, "2025-07-01", "2025-07-05")
+    assert 2 not in free_room_ids(db, "2025-07-04", "2025-07-06")
+    assert 2 not in free_room_ids(db, "2025-06-28", "2025-07-02")
+    assert 2 not in free_room_ids(db, "2025-07-02", "2025-07-03")
+    assert 2 in free_room_ids(db, "2025-07-05", "2025-07-07")
+    assert 2 in free_room_ids(db, "2025-06-28", "2025-07-01")
+    assert db.room_is_free(2, "2025-07-05", "2025-07-07") and not db.room_is_free(2, "2025-07-03", "2025-07-04")
+
+def test_index_and_fallback_queries_agree(db, monkeypatch):
+    reserve(db, 2, "2025-07-01", "2025-07-05")
+    reserve(db, 3, "2025-07-03", None)                              # no check-out: one night
+    stays = [("2025-01-12", "2025-01-13"), ("2025-07-01", "2025-07-02"), ("2025-07-03", "2025-07-04"), ("2025-07-04", "2025-07-09")]
+    with_index = [(db.free_rooms(HOTEL, *stay), db.free_rooms_for_destination(1, *stay).values.tolist()) for stay in stays]
+    monkeypatch.setattr(db, "interval_index_available", lambda conn=None: False)
+    assert [(db.free_rooms(HOTEL, *stay), db.free_rooms_for_destination(1, *stay).values.tolist()) for stay in stays] == with_index
+    assert 3 in free_room_ids(db, "2025-07-04", "2025-07-09") and 3 not in free_room_ids(db, "2025-07-03", "2025-07-04")
+
+def test_ticketed_seats_are_not_free(db):
+    assert 1 not in {seat_id for seat_id, _ in db.free_seats(FLIGHT)}
+    db.run_query("DELETE FROM Tickets WHERE seat_id = 1", fetch=False)
+    assert 1 in {seat_id for seat_id, _ in db.free_seats(FLIGHT)}
+
+def test_interval_index_follows_reservation_changes(db):
+    reserve(db, 2, "2025-07-01", "2025-07-05")
+    db.run_query("UPDATE Reservations SET room_id = 3, check_out = '2025-07-09' WHERE room_id = 2", fetch=False)
+    db.run_query("UPDATE Rooms SET hotel_id = 7 WHERE room_id = 1", fetch=False)
+    db.run_query("DELETE FROM Bookings WHERE booking_id = 1", fetch=False)     # cascades to its reservations
+    assert_consistent(db)
@@ -0,0 +1,64 @@
+import io
+
+import pytest
+
+import bulk_io
+from checks import assert_consistent
+
+BOOKINGS_SQL = "SELECT booking_id, cust_id, pkg_id, booking_date, is_paid, total_paid, balance_due FROM Bookings ORDER BY booking_id"
+PAYMENTS_SQL = "SELECT payment_id, booking_id, amount, payment_date FROM Payments ORDER BY payment_id"
+
+def write_csv(path, header, rows):
+    path.write_text("\n".join([header] + [",".join(map(str, r)) for r in rows]) + "\n", encoding="utf-8")
+    return str(path)
+
+def test_payments_import_keeps_derived_state(db, tmp_path):
+    path = write_csv(tmp_path / "payments.csv", "booking_id,amount", [(1, 10), (2, 20.5), (3, 30)])
+    result = bulk_io.bulk_import("payments", path, chunk_rows=2, log=io.StringIO())
+    assert result["imported"] == 3
+    assert_consistent(db)
+
+def test_export_reimports_to_the_same_rows(db, tmp_path):
+    bookings, payments = db.run_query(BOOKINGS_SQL), db.run_query(PAYMENTS_SQL)
+    assert bulk_io.bulk_export("bookings", str(tmp_path / "bookings.jsonl"), chunk_rows=2) == len(bookings)
+    assert bulk_io.bulk_export("payments", str(tmp_path / "payments.csv")) == len(payments)
+    db.run_query("DELETE FROM Bookings", fetch=False)                  # cascades to the payments
+
+    bulk_io.bulk_import("bookings", str(tmp_path / "bookings.jsonl"), chunk_rows=2, log=io.StringIO())
+    bulk_io.bulk_import("payments", str(tmp_path / "payments.csv"), log=io.StringIO())
+    assert db.run_query(BOOKINGS_SQL) == bookings
+    assert db.run_query(PAYMENTS_SQL) == payments
+    assert_consistent(db)
+
+def test_skip_invalid_reports_rows_and_imports_the_rest(db, tmp_path):
+    path = write_csv(tmp_path / "bookings.csv", "cust_id,pkg_id,booking_date",
+                     [(1, 1, "2025-03-01"), (999999, 1, "2025-03-02"), (2, "x", "2025-03-03"), (2, 2, "2025-03-04")])
+    result = bulk_io.bulk_import("bookings", path, skip_invalid=True, log=io.StringIO())
+    assert result["imported"] == 2
+    assert [line for line, _ in result["rejected"]] == [3, 4]
+    assert_consistent(db)
+
+def test_failed_chunk_still_rebuilds_ledger_for_committed_chunks(db, tmp_path):
+    path = write_csv(tmp_path / "payments.csv", "booking_id,amount", [(1, 10), (2, 20), (999999, 5)])
+    with pytest.raises(bulk_io.BulkImportError):
+        bulk_io.bulk_import("payments", path, chunk_rows=2, log=io.StringIO())
+    assert db.run_query("SELECT COUNT(*) FROM Payments WHERE amount IN (10, 20)")[0][0] >= 2
+    assert_consistent(db)
+
+def test_failed_rebuild_does_not_hide_the_import_error(db, tmp_path, monkeypatch):
+    def broken():
+        raise RuntimeError("ledger unavailable")
+    monkeypatch.setattr(db, "update_all_booking_payment_statuses", broken)
+    log = io.StringIO()
+    path = write_csv(tmp_path / "payments.csv", "booking_id,amount", [(1, 10), (2, 20), (999999, 5)])
+    with pytest.raises(bulk_io.BulkImportError):
+        bulk_io.bulk_import("payments", path, chunk_rows=2, log=log)
+    assert "rebuild failed" in log.getvalue()
+    with pytest.raises(RuntimeError, match="ledger unavailable"):             # nothing else to report
+        bulk_io.bulk_import("payments", write_csv(tmp_path / "ok.csv", "booking_id,amount", [(3, 30)]), log=log)
+
+def test_bookings_import_keeps_ledger_and_rollups(db, tmp_path):
+    path = write_csv(tmp_path / "bookings.csv", "cust_id,pkg_id,booking_date", [(1, 1, "2025-03-01"), (2, 2, "2025-03-02")])
+    result = bulk_io.bulk_import("bookings", path, log=io.StringIO())
+    assert result["imported"] == 2
+    assert_consistent(db)
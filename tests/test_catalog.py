@@ -0,0 +1,24 @@
+def test_catalog_matches_the_tables(db):
+    catalog = db.get_catalog()
+    assert list(catalog.destinations) == [r[0] for r in db.run_query(db.CATALOG_SQL["destinations"][1])]
+    for pkg_id, dest_id, pkg_name, price in db.run_query("SELECT pkg_id, dest_id, pkg_name, price FROM TravelPackages"):
+        package = catalog.packages[pkg_id]
+        assert (package.dest_id, package.pkg_name, package.price) == (dest_id, pkg_name, price)
+    assert catalog.services[1].kind == "Flight" and catalog.services[6].kind == "Hotel"
+    assert catalog.packages.get(999999) is None and 999999 not in catalog.destinations
+    city, country = db.run_query("SELECT city, country FROM Destinations WHERE dest_id = 1")[0]
+    assert catalog.labels("destinations")[1] == f"{city}, {country}"
+    assert set(catalog.labels("packages", where=lambda p: p.dest_id == 1)) == {1, 9}
+
+def test_catalog_reloads_only_after_a_catalog_write(db):
+    catalog = db.get_catalog()
+    db.add_customer("Not In The Catalog", "nic@example.com")
+    assert db.get_catalog() is catalog
+    dest = db.add_destination("Catalogville", "Testland")
+    reloaded = db.get_catalog()
+    assert reloaded is not catalog and reloaded.destinations[dest].city == "Catalogville"
+
+def test_text_column_round_trips():
+    from travel_core import TextColumn
+    values = ["", "Zürich", "a", "", "Åre"]
+    assert list(TextColumn(values)) == values
@@ -0,0 +1,28 @@
+import pytest
+
+from checks import assert_consistent
+
+ACTUAL_SQL = """SELECT (SELECT COUNT(*) FROM Customers), (SELECT COUNT(*) FROM Bookings),
+                       (SELECT COUNT(*) FROM TravelPackages), (SELECT COALESCE(SUM(amount), 0) FROM Payments)"""
+
+def figures(metrics):
+    return metrics["customers"], metrics["bookings"], metrics["packages"], pytest.approx(metrics["revenue"])
+
+def test_metrics_match_a_recount(db):
+    db.add_payment(1, 123.45)
+    db.execute_write("UPDATE Payments SET amount = amount + 1 WHERE booking_id = 2")
+    db.delete_booking(3)
+    metrics = db.dashboard_metrics(ttl=0)
+    assert figures(metrics) == db.run_query(ACTUAL_SQL)[0]
+    assert len(metrics["recent_rows"]) > 0
+    assert_consistent(db)
+
+def test_snapshot_is_reused_until_a_write(db):
+    first = db.dashboard_metrics()
+    assert db.dashboard_metrics()["cached"]
+    db.add_customer("Ada", "ada@example.com")
+    again = db.dashboard_metrics()
+    assert not again["cached"]
+    assert again["customers"] == first["customers"] + 1
+    assert not db.dashboard_metrics(ttl=0)["cached"]
+    assert db.get_dashboard_stats().stats()["cached"] == 1
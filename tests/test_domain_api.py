@@ -0,0 +1,43 @@
+import pathlib
+import subprocess
+import sys
+
+import pytest
+
+from checks import assert_consistent
+
+def test_travel_core_imports_without_streamlit_or_pandas():
+    code = "import sys, travel_core; print(sorted(m for m in ('streamlit', 'pandas') if m in sys.modules))"
+    out = subprocess.run([sys.executable, "-c", code], cwd=pathlib.Path(__file__).resolve().parents[1],
+                         capture_output=True, text=True, check=True).stdout
+    assert out.strip() == "[]"
+
+def test_domain_writes_book_and_cascade(db):
+    dest = db.add_destination("Testville", "Testland")
+    hotel = db.add_service("Hotel", "Test Inn", 100, 4, ["101", "102"])
+    flight = db.add_service("Flight", "Test Air 1", 200, "GB")
+    pkg = db.add_package(dest, "Test tour", 500)
+    db.add_package_service(pkg, hotel)
+    db.add_package_service(pkg, flight)
+    cust = db.add_customer("Test Traveller", "traveller@example.com")
+
+    booking = db.create_booking(cust, pkg, "2025-06-01", "2025-07-01", "2025-07-03")
+    assert len(booking["rooms"]) == 1 and len(booking["seats"]) == 1
+    assert len(db.free_rooms(hotel, "2025-07-02", "2025-07-03")) == 1
+    db.add_payment(booking["booking_id"], 500)
+    assert db.run_query("SELECT is_paid FROM Bookings WHERE booking_id = ?", (booking["booking_id"],)) == [(2,)]
+    assert db.update_customer(cust, name="Renamed Traveller") == 1
+    assert db.run_query("SELECT name FROM Customers WHERE cust_id = ?", (cust,)) == [("Renamed Traveller",)]
+    assert_consistent(db)
+
+    assert db.delete_customer(cust) == 1
+    assert db.run_query("SELECT COUNT(*) FROM Bookings WHERE cust_id = ?", (cust,)) == [(0,)]
+    assert len(db.free_rooms(hotel, "2025-07-02", "2025-07-03")) == 2
+    assert_consistent(db)
+
+def test_failed_service_write_leaves_nothing_behind(db):
+    (before,), = db.run_query("SELECT COUNT(*) FROM Services")
+    with pytest.raises(ValueError, match="Unknown service kind"):
+        db.add_service("Train", "Test Rail", 50, None)
+    assert db.run_query("SELECT COUNT(*) FROM Services") == [(before,)]
+    assert_consistent(db)
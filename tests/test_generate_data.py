@@ -0,0 +1,25 @@
+import io
+import json
+
+import benchmark_suite
+import generate_data
+from checks import assert_consistent
+
+TABLE_ROWS_SQL = "SELECT (SELECT COUNT(*) FROM Bookings), (SELECT COUNT(*) FROM Payments), (SELECT COUNT(*) FROM Reservations)"
+
+def test_generated_data_appends_with_every_derived_table_exact(db):
+    (bookings, payments, reservations), = db.run_query(TABLE_ROWS_SQL)
+    counts = generate_data.generate(2000, chunk_rows=500, log=io.StringIO())
+    assert db.run_query(TABLE_ROWS_SQL) == [(bookings + counts["bookings"], payments + counts["payments"],
+                                              reservations + counts["reservations"])]
+    assert counts["bookings"] == 2000
+    assert_consistent(db)
+
+def test_baseline_comparison_flags_only_real_regressions(tmp_path):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"results": [{"bookings": 10, "case": "fast", "median_ms": 0.01},
+                                                {"bookings": 10, "case": "slow", "median_ms": 10.0}]}))
+    now = [{"bookings": 10, "case": "fast", "median_ms": 0.05},        # 5x, but below the noise floor
+           {"bookings": 10, "case": "slow", "median_ms": 20.0},
+           {"bookings": 10, "case": "new", "median_ms": 99.0}]
+    assert [r["case"] for r in benchmark_suite.compare(now, str(baseline))] == ["slow"]
@@ -0,0 +1,43 @@
+import pytest
+
+from checks import assert_consistent
+
+def all_pages(db, grid, sort, descending, page_size):
+    """Every row of a grid, by following next-page anchors from the first page."""
+    rows, anchor = [], None
+    while True:
+        df, has_next, anchor = db.fetch_grid_page(grid, sort, descending, anchor, page_size)
+        rows += [tuple(r) for r in df.itertuples(index=False)]
+        if not has_next:
+            return rows
+
+@pytest.mark.parametrize("grid", ["customers", "destinations", "services", "packages", "package_contents", "bookings"])
+def test_paging_returns_every_row_once(db, grid):
+    spec = db.GRIDS[grid]
+    (total,), = db.run_query(f"SELECT COUNT(*) FROM ({spec['select']})")
+    assert db.get_row_count(spec["count_table"]) == total
+    for sort in spec["sorts"]:
+        for descending in (False, True):
+            rows = all_pages(db, grid, sort, descending, page_size=2)
+            assert len(rows) == total
+            assert len({r[0] for r in rows}) == total
+
+@pytest.mark.parametrize("grid, sort, table, column", [("packages", "Name", "TravelPackages", "pkg_name"),
+                                                        ("bookings", "Date", "Bookings", "booking_date")])
+def test_paging_keeps_rows_with_null_sort_values(db, grid, sort, table, column):
+    key = db.GRIDS[grid]["key"].split(".")[1]
+    db.run_query(f"UPDATE {table} SET {column} = NULL WHERE {key} % 2 = 0", fetch=False)
+    db.run_query(f"UPDATE {table} SET {column} = (SELECT MIN({column}) FROM {table}) WHERE {key} = 3", fetch=False)
+    spec = db.GRIDS[grid]
+    for descending in (False, True):
+        direction = "DESC" if descending else "ASC"
+        expected = db.run_query(f"{spec['select']} ORDER BY {spec['sorts'][sort]} {direction}, {spec['key']} {direction}")
+        for page_size in (1, 2, 3):
+            assert all_pages(db, grid, sort, descending, page_size) == expected
+
+def test_row_counts_follow_inserts_deletes_and_cascades(db):
+    db.run_query("INSERT INTO Customers (name, email) VALUES ('Ada', 'ada@example.com')", fetch=False)
+    (cust_id,), = db.run_query("SELECT cust_id FROM Bookings LIMIT 1")
+    db.run_query("DELETE FROM Customers WHERE cust_id = ?", (cust_id,), fetch=False)   # cascades to bookings and payments
+    db.run_query("DELETE FROM Services WHERE service_id = (SELECT MIN(service_id) FROM Services)", fetch=False)
+    assert_consistent(db)
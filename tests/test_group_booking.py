@@ -0,0 +1,47 @@
+import pytest
+
+from checks import assert_consistent
+
+def group_package(db, rooms, seats):
+    dest = db.add_destination("Groupville", "Testland")
+    hotel = db.add_service("Hotel", "Group Inn", 100, 3, rooms)
+    flight = db.add_service("Flight", "Group Air 1", 200, "GB", seats)
+    pkg = db.add_package(dest, "Group tour", 500)
+    db.add_package_service(pkg, hotel)
+    db.add_package_service(pkg, flight)
+    return pkg, hotel, flight
+
+def test_pick_block_prefers_neighbours():
+    from travel_core import pick_block
+    assert pick_block([1, 2, 3, 4, 5], [1, 3, 4, 5], 3) == [3, 4, 5]
+    assert pick_block([1, 2, 3, 4, 5], [1, 3, 5], 2) == [1, 3]
+    assert pick_block([1, 2, 3], [2], 2) is None
+
+def test_group_booking_books_every_traveller_with_a_deposit(db):
+    pkg, hotel, flight = group_package(db, ["101", "102", "103", "104"], ["1A", "1B", "1C"])
+    group = db.create_group_booking([1, 1, 2], pkg, "2025-06-01", "2025-07-01", "2025-07-03", deposit=50)
+    assert len(group["booking_ids"]) == 3
+    assert len(group["rooms"][hotel]) == 3 and len(group["seats"][flight]) == 3
+    assert [room_no for _, room_no in db.free_rooms(hotel, "2025-07-01", "2025-07-03")] == ["104"]   # 101-103 together
+    assert db.run_query("SELECT SUM(total_paid), COUNT(*) FROM Bookings WHERE pkg_id = ?", (pkg,)) == [(150, 3)]
+    assert_consistent(db)
+
+def test_group_booking_is_all_or_nothing(db):
+    pkg, hotel, flight = group_package(db, ["101", "102", "103"], ["1A", "1B"])
+    counts = "SELECT (SELECT COUNT(*) FROM Bookings), (SELECT COUNT(*) FROM Reservations), (SELECT COUNT(*) FROM Payments)"
+    before = db.run_query(counts)
+    with pytest.raises(db.AllocationError, match="seat"):
+        db.create_group_booking([1, 2, 3], pkg, "2025-06-01", "2025-07-01", "2025-07-03", deposit=50)
+    assert db.run_query(counts) == before
+    assert_consistent(db)
+
+def test_group_stay_without_check_out_is_one_night(db):
+    pkg, hotel, flight = group_package(db, ["101", "102", "103"], ["1A", "1B", "1C", "1D"])
+    group = db.create_group_booking([1, 2], pkg, "2025-06-01", "2025-07-04")
+    assert db.run_query("SELECT COUNT(*) FROM Reservations WHERE booking_id IN (?, ?) AND check_out IS NULL",
+                        tuple(group["booking_ids"])) == [(2,)]
+    assert [room_no for _, room_no in db.free_rooms(hotel, "2025-07-04", None)] == ["103"]
+    with pytest.raises(db.AllocationError, match="room"):
+        db.create_group_booking([3, 4], pkg, "2025-06-01", "2025-07-03", "2025-07-05")
+    assert db.create_group_booking([3, 4], pkg, "2025-06-01", "2025-07-05")["rooms"] == group["rooms"]
+    assert_consistent(db)
@@ -0,0 +1,12 @@
+def flagged(db):
+    return [(f["query"], f["plan"]) for f in db.audit_query_plans(large_table_rows=0) if f["flagged"]]
+
+def test_every_managed_index_exists(db):
+    assert [name for name, _, _, exists in db.index_status() if not exists] == []
+
+def test_registered_queries_scan_only_what_they_declare(db):
+    assert [(query, plan) for query, plan in flagged(db)] == []
+
+def test_audit_flags_a_scan_left_by_a_missing_index(db):
+    db.run_query("DROP INDEX idx_bookings_date", fetch=False)
+    assert any(query == "Dashboard: recent bookings" for query, _ in flagged(db))
@@ -0,0 +1,61 @@
+import sqlite3
+
+import maintenance
+import travel_core as core
+from checks import assert_consistent
+
+def test_a_job_runs_once_per_interval_across_schedulers(db):
+    first, second = db.MaintenanceScheduler(), db.MaintenanceScheduler()
+    assert first.run_job("statistics") is not None
+    assert second.run_job("statistics") is None
+    assert second.run_job("statistics", force=True) is not None
+    assert "statistics" not in second.due_jobs()
+    assert db.run_query("SELECT runs FROM MaintenanceRuns WHERE job = 'statistics'") == [(2,)]
+
+def test_repair_jobs_fix_state_written_around_the_triggers(db):
+    db.run_query("UPDATE Bookings SET total_paid = 1, balance_due = 0, is_paid = 2 WHERE booking_id = 1", fetch=False)
+    db.run_query("UPDATE RevenueByPackage SET amount = 1 WHERE pkg_id = 1", fetch=False)
+    db.run_query("DELETE FROM RevenueByDay", fetch=False)
+    scheduler = db.MaintenanceScheduler()
+    assert scheduler.run_job("reconcile", force=True) == "bookings_fixed: 1"
+    assert not scheduler.run_job("rollups", force=True).startswith("failed")
+    assert_consistent(db)
+    assert scheduler.stats()["rollups"]["writes"] > 0
+
+def test_vacuum_job_releases_free_pages_on_a_new_database(db):
+    db.write_transaction(lambda conn: conn.execute("CREATE TABLE Scratch (x)"))
+    db.write_transaction(lambda conn: conn.executemany("INSERT INTO Scratch VALUES (?)", [("x" * 1000,)] * 500), "Scratch")
+    db.write_transaction(lambda conn: conn.execute("DELETE FROM Scratch"), "Scratch")
+    result = db.MaintenanceScheduler().run_job("vacuum", force=True)
+    assert not result.startswith(("failed", "skipped")) and "pages_released: 0" not in result
+
+def fill_and_empty(table):
+    core.write_transaction(lambda conn: conn.executemany(f"INSERT INTO {table} VALUES (?)", [("x" * 1000,)] * 500), table)
+    core.write_transaction(lambda conn: conn.execute(f"DELETE FROM {table}"), table)
+
+def test_convert_vacuum_lets_the_vacuum_job_release_pages(tmp_path, monkeypatch, capsys):
+    path = tmp_path / "old.db"
+    sqlite3.connect(path).execute("CREATE TABLE Legacy (x)").connection.close()   # an existing file: auto_vacuum NONE
+    monkeypatch.setattr(core, "DB_FILE", str(path))
+    core.init_db()
+    fill_and_empty("Legacy")
+    assert "skipped" in core.maintain_vacuum(core.write_timed)
+
+    maintenance.main(["--db", str(path), "--once", "convert-vacuum"])
+    assert "convert-vacuum: {'converted': True" in capsys.readouterr().out
+    assert core.convert_to_incremental_vacuum()["converted"] is False
+
+    fill_and_empty("Legacy")
+    assert core.maintain_vacuum(core.write_timed)["pages_released"] > 0
+    core.close_pools()
+
+def test_bare_once_skips_jobs_without_an_interval(db, capsys):
+    booking_id = db.create_booking(1, 1, "2020-01-01")["booking_id"]
+    db.add_payment(booking_id, db.get_package_price(1))
+    archived = db.run_query("SELECT COUNT(*) FROM BookingHistory")
+    maintenance.main(["--db", db.DB_FILE, "--once"])
+    ran = [line.split(":")[0] for line in capsys.readouterr().out.splitlines() if not line.startswith(" ")]
+    assert ran == [job for job, (_, interval) in db.MAINTENANCE_JOBS.items() if interval]
+    assert "archive" not in ran
+    assert db.run_query("SELECT booking_id FROM Bookings WHERE booking_id = ?", (booking_id,)) == [(booking_id,)]
+    assert db.run_query("SELECT COUNT(*) FROM BookingHistory") == archived
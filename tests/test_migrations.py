@@ -0,0 +1,15 @@
+SAMPLE_ROWS_SQL = "SELECT (SELECT COUNT(*) FROM Customers), (SELECT COUNT(*) FROM TravelPackages)"
+
+def test_new_database_is_at_the_latest_version(db):
+    with db.get_pool().connection() as conn:
+        assert conn.execute("PRAGMA user_version").fetchone() == (db.SCHEMA_VERSION,)
+        assert db.migrate(conn) == []
+
+def test_steps_rerun_safely_over_an_older_version(db):
+    seeded = db.run_query(SAMPLE_ROWS_SQL)
+    with db.get_pool().connection() as conn:
+        conn.execute("PRAGMA user_version = 1")
+        applied = db.migrate(conn)
+        assert applied == [name for version, name, _ in db.MIGRATIONS if version > 1]
+        assert conn.execute("PRAGMA user_version").fetchone() == (db.SCHEMA_VERSION,)
+    assert db.run_query(SAMPLE_ROWS_SQL) == seeded                 # sample data is not seeded twice
@@ -0,0 +1,23 @@
+def add_customer(db, name, email):
+    db.run_query("INSERT INTO Customers (name, email) VALUES (?, ?)", (name, email), fetch=False)
+    (cust_id,), = db.run_query("SELECT MAX(cust_id) FROM Customers")
+    return cust_id
+
+def test_option_labels_map_every_key_to_its_label(db):
+    df = db.get_dataframe("SELECT dest_id, city, country FROM Destinations")
+    labels = db.option_labels(df, "dest_id", "{city}, {country}")
+    assert labels == {r.dest_id: f"{r.city}, {r.country}" for r in df.itertuples()}
+
+def test_like_fallback_matches_a_name_prefix_case_insensitively(db, monkeypatch):
+    monkeypatch.setattr(db, "search_index_available", lambda: False)
+    zelda = add_customer(db, "Zelda Quill", "zelda@example.com")
+    assert db.search_options("customers", "zEL") == {zelda: "Zelda Quill <zelda@example.com>"}
+    assert db.search_options("customers", "quill") == {}
+
+def test_like_fallback_treats_wildcards_literally_and_honours_the_limit(db, monkeypatch):
+    monkeypatch.setattr(db, "search_index_available", lambda: False)
+    for i in range(3):
+        add_customer(db, f"Zz_{i}", f"z{i}@example.com")
+    add_customer(db, "Zzx", "zzx@example.com")
+    assert len(db.search_options("customers", "Zz_")) == 3
+    assert len(db.search_options("customers", "Zz", limit=2)) == 2
@@ -0,0 +1,50 @@
+from checks import assert_consistent
+
+LEDGER_SQL = "SELECT total_paid, balance_due, is_paid FROM Bookings WHERE booking_id = ?"
+
+def new_booking(db, pkg_id=1):
+    db.run_query("INSERT INTO Bookings (cust_id, pkg_id, booking_date) VALUES (1, ?, '2025-01-01')", (pkg_id,), fetch=False)
+    (booking_id,), = db.run_query("SELECT MAX(booking_id) FROM Bookings")
+    return booking_id
+
+def pay(db, booking_id, amount):
+    db.run_query("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", (booking_id, amount), fetch=False)
+
+def test_ledger_follows_payments_against_the_package_price(db):
+    price = db.get_package_price(1)
+    unpaid, partial, paid = new_booking(db), new_booking(db), new_booking(db)
+    pay(db, partial, price / 2)
+    pay(db, paid, price / 2)
+    pay(db, paid, price / 2)
+    assert [db.run_query(LEDGER_SQL, (b,))[0] for b in (unpaid, partial, paid)] == [
+        (0, price, 0), (price / 2, price / 2, 1), (price, 0, 2)]
+
+    db.run_query("DELETE FROM Payments WHERE booking_id = ?", (paid,), fetch=False)
+    assert db.run_query(LEDGER_SQL, (paid,)) == [(0, price, 0)]
+
+def test_ledger_follows_payment_booking_and_price_changes(db):
+    price = db.get_package_price(1)
+    booking, other = new_booking(db), new_booking(db)
+    pay(db, booking, price)
+    db.run_query("UPDATE Payments SET amount = amount / 4 WHERE booking_id = ?", (booking,), fetch=False)
+    db.run_query("UPDATE Payments SET booking_id = ? WHERE booking_id = ?", (other, booking), fetch=False)
+    db.run_query("UPDATE Bookings SET pkg_id = 2 WHERE booking_id = ?", (other,), fetch=False)
+    db.run_query("UPDATE TravelPackages SET price = price * 2 WHERE pkg_id = 1", fetch=False)
+    assert db.run_query(LEDGER_SQL, (booking,)) == [(0, 2 * price, 0)]
+    assert_consistent(db)
+
+def test_rebuild_repairs_a_ledger_written_around_the_triggers(db):
+    booking = new_booking(db)
+    db.run_query("UPDATE Bookings SET total_paid = 1, balance_due = 0, is_paid = 2 WHERE booking_id = ?", (booking,), fetch=False)
+    assert db.update_all_booking_payment_statuses() == 1
+    assert db.update_all_booking_payment_statuses() == 0
+    assert_consistent(db)
+
+def test_ledger_repairs_run_as_write_transactions(db):
+    booking = new_booking(db)
+    transactions = db.get_lock_stats().stats()["transactions"]
+    db.run_query("UPDATE Bookings SET total_paid = 1, balance_due = 0, is_paid = 2 WHERE booking_id = ?", (booking,), fetch=False)
+    db.update_booking_payment_status(booking)
+    assert db.run_query(LEDGER_SQL, (booking,)) == [(0, db.get_package_price(1), 0)]
+    assert db.update_all_booking_payment_statuses() == 0
+    assert db.get_lock_stats().stats()["transactions"] == transactions + 2
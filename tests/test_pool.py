@@ -0,0 +1,52 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+def test_queries_reuse_tuned_connections(db):
+    opens = db.get_pool_stats()["opens"]
+    for _ in range(5):
+        db.run_query("SELECT COUNT(*) FROM Customers")
+    db.get_dataframe("SELECT * FROM Destinations")
+    stats = db.get_pool_stats()
+    assert stats["opens"] == opens
+    assert stats["in_use"] == 0
+    with db.get_pool().connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+        assert conn.execute("PRAGMA foreign_keys").fetchone() == (1,)
+        assert conn.execute("PRAGMA busy_timeout").fetchone() == (db.DB_BUSY_TIMEOUT_MS,)
+
+def test_checkout_beyond_max_size_waits_for_a_release(db):
+    pool = db.ConnectionPool(db.DB_FILE, max_size=1)
+    first = pool.acquire()
+    got = []
+    thread = threading.Thread(target=lambda: got.append(pool.acquire()))
+    thread.start()
+    thread.join(0.2)
+    assert not got                                     # blocked while the only connection is out
+    pool.release(first)
+    thread.join(10)
+    assert got == [first]
+    stats = pool.stats()
+    assert (stats["opens"], stats["reuses"], stats["waits"]) == (1, 1, 1)
+    pool.release(got[0])
+    pool.close_all()
+
+def test_failed_statement_rolls_back_and_returns_the_connection(db):
+    (before,), = db.run_query("SELECT COUNT(*) FROM Customers")
+    with pytest.raises(sqlite3.IntegrityError):
+        with db.get_pool().connection() as conn:
+            conn.execute("INSERT INTO Customers (name, email) VALUES ('Ada', 'ada@example.com')")
+            conn.execute("INSERT INTO Bookings (cust_id, pkg_id, booking_date) VALUES (999999, 1, '2025-01-01')")
+    assert db.run_query("SELECT COUNT(*) FROM Customers") == [(before,)]
+    assert db.get_pool_stats()["in_use"] == 0
+
+def test_connection_opened_during_a_write_does_not_wait_for_it(db):
+    def work(conn):
+        start = time.perf_counter()
+        db.db_connect().close()
+        return time.perf_counter() - start
+    assert db.write_transaction(work, "Customers") < 1
+    with db.get_pool().connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)   # new file: INCREMENTAL
@@ -0,0 +1,55 @@
+from checks import assert_consistent
+
+def priced_tour(db, **rules):
+    hotel = db.add_service("Hotel", "Test Inn", 100, 4)
+    flight = db.add_service("Flight", "Test Air 1", 200, "GB")
+    pkg = db.add_package(1, "Test tour", **rules)
+    db.add_package_service(pkg, hotel)
+    db.add_package_service(pkg, flight)
+    return pkg, hotel, flight
+
+def test_auto_price_follows_services_contents_and_rules(db):
+    pkg, hotel, flight = priced_tour(db, markup_pct=10, discount_pct=50)
+    assert db.get_package_price(pkg) == 165.0                          # 300 * 1.1 * 0.5
+    booking = db.create_booking(1, pkg, "2025-06-01")["booking_id"]
+    db.add_payment(booking, 165)
+
+    db.update_service(hotel, base_price=300)
+    assert db.get_package_price(pkg) == 275.0
+    assert db.run_query("SELECT balance_due, is_paid FROM Bookings WHERE booking_id = ?", (booking,)) == [(110, 1)]
+    db.remove_package_content(db.run_query("SELECT id FROM PackageContents WHERE service_id = ?", (flight,))[0][0])
+    db.set_package_pricing(pkg, discount_pct=0)
+    assert db.get_package_price(pkg) == 330.0
+    assert_consistent(db)
+
+def test_quote_is_cached_until_invalidated(db):
+    pkg, hotel, _ = priced_tour(db)
+    first = db.quote_package(pkg)
+    assert (first["price"], first["services"], first["cached"]) == (300, 2, False)
+    assert db.quote_package(pkg)["cached"]
+    db.update_service(hotel, base_price=150)
+    again = db.quote_package(pkg)
+    assert (again["price"], again["cached"]) == (350, False)
+    assert db.quote_package(999999) is None
+
+def test_quote_can_be_read_without_a_write(db, monkeypatch):
+    pkg, hotel, _ = priced_tour(db)
+    monkeypatch.setattr(db, "write_transaction", None)                 # any write would fail
+    quote = db.quote_package(pkg, store=False)
+    assert (quote["price"], quote["services"], quote["quoted_at"], quote["cached"]) == (300, 2, None, False)
+    assert db.run_query("SELECT COUNT(*) FROM PackageQuotes WHERE pkg_id = ?", (pkg,)) == [(0,)]
+    assert db.quote_package(999999, store=False) is None
+
+def test_fixed_price_packages_keep_their_price(db):
+    pkg, hotel, _ = priced_tour(db, price=999)
+    db.update_service(hotel, base_price=1)
+    assert db.get_package_price(pkg) == 999
+    assert db.quote_package(pkg)["price"] == 201
+
+def test_reprice_catalog_repairs_drifted_auto_prices(db):
+    pkg, _, _ = priced_tour(db)
+    db.execute_write("UPDATE TravelPackages SET price = 1 WHERE pkg_id = ?", (pkg,))   # a write around the rules
+    assert db.reprice_catalog()["repriced"] == 1
+    assert db.get_package_price(pkg) == 300
+    assert db.reprice_catalog(stale_only=True) == {"quoted": 0, "repriced": 0}
+    assert_consistent(db)
@@ -0,0 +1,37 @@
+import logging
+
+SQL = "SELECT COUNT(*) FROM Customers WHERE name <> ?"
+
+def statement(profiler, sql):
+    key = " ".join(sql.split())
+    return next(row for row in profiler.top(n=1000) if row["statement"] == key)
+
+def test_calls_hits_rows_and_pages_are_counted(db):
+    profiler = db.get_query_profiler()
+    profiler.reset()
+    with db.profile_page("show_reports"):
+        db.run_query(SQL, ("x",))
+        db.run_query(SQL, ("x",))                                    # answered by the query cache
+    db.get_dataframe("SELECT name FROM Customers", cached=False)
+    row = statement(profiler, SQL)
+    assert (row["calls"], row["cache_hits"], row["avg_rows"], row["pages"]) == (1, 1, 1, "show_reports")
+    assert sum(row["histogram"]) == 1
+    assert statement(profiler, "SELECT name FROM Customers")["pages"] == "-"
+
+def test_statements_over_the_threshold_are_logged_with_their_plan(db, caplog):
+    profiler = db.get_query_profiler()
+    profiler.reset()
+    profiler.slow_ms = 0
+    try:
+        with caplog.at_level(logging.WARNING, logger="travel_core.slow_queries"):
+            db.run_query("SELECT * FROM Bookings WHERE booking_date >= ?", ("2025-01-01",))
+    finally:
+        profiler.slow_ms = db.SLOW_QUERY_MS
+    slow, = profiler.slow_queries()
+    assert "idx_bookings_date" in slow["plan"]
+    assert "slow query" in caplog.text
+
+def test_histogram_percentile_is_the_bucket_bound(db):
+    assert db.histogram_percentile([0] * 8, 0.95) == 0.0
+    assert db.histogram_percentile([90, 5, 5, 0, 0, 0, 0, 0], 0.95) == 5.0
+    assert db.histogram_percentile([0, 0, 0, 0, 0, 0, 0, 1], 0.95) == float("inf")
@@ -0,0 +1,59 @@
+import sqlite3
+import threading
+
+COUNT_SQL = "SELECT COUNT(*) FROM Customers"
+BOOKINGS_SQL = "SELECT COUNT(*) FROM Bookings"
+
+def test_cached_select_is_dropped_by_a_write(db):
+    (before,), = db.run_query(COUNT_SQL)
+    db.run_query("INSERT INTO Customers (name, email) VALUES ('Ada', 'ada@example.com')", fetch=False)
+    assert db.run_query(COUNT_SQL) == [(before + 1,)]
+
+def test_result_is_cached_when_no_write_intervened(db):
+    cache = db.get_query_cache()
+    db.run_query(COUNT_SQL)
+    hits = cache.stats()["hits"]
+    db.run_query(COUNT_SQL)
+    assert cache.stats()["hits"] == hits + 1
+
+def test_cascade_children_are_invalidated_with_their_parent(db):
+    (cust_id,), = db.run_query("SELECT cust_id FROM Bookings LIMIT 1")
+    (before,), = db.run_query(BOOKINGS_SQL)
+    db.run_query("DELETE FROM Customers WHERE cust_id = ?", (cust_id,), fetch=False)
+    assert db.run_query(BOOKINGS_SQL)[0][0] < before
+
+def test_commit_by_another_process_flushes_the_cache(db):
+    (before,), = db.run_query(COUNT_SQL)
+    other = sqlite3.connect(db.DB_FILE)
+    other.execute("INSERT INTO Customers (name, email) VALUES ('Ada', 'ada@example.com')")
+    other.commit()
+    other.close()
+    assert db.run_query(COUNT_SQL) == [(before + 1,)]
+
+def test_result_read_before_a_concurrent_write_is_not_cached(db):
+    """A reader misses, reads, and only stores its rows after a writer has committed and
+    invalidated: the cache must not keep the pre-write rows."""
+    (before,), = db.run_query(COUNT_SQL)
+    cache = db.get_query_cache()
+    cache.clear()
+    key = db.cache_key("rows", COUNT_SQL, ())
+    read_done, write_done = threading.Event(), threading.Event()
+
+    def reader():
+        found, _ = cache.get(key)
+        assert not found
+        with db.get_pool().connection() as conn:
+            rows = conn.execute(COUNT_SQL).fetchall()
+        read_done.set()
+        write_done.wait(10)
+        cache.put(key, rows, cache.read_tables(COUNT_SQL))
+
+    thread = threading.Thread(target=reader)
+    thread.start()
+    read_done.wait(10)
+    db.add_customer("Ada", "ada@example.com")
+    write_done.set()
+    thread.join(10)
+
+    assert cache.stats()["stale_puts"] == 1
+    assert db.run_query(COUNT_SQL) == [(before + 1,)]
@@ -0,0 +1,30 @@
+import csv
+
+import pytest
+
+FILTERS = {"date_from": "2025-02-01", "date_to": "2025-04-30", "dest_id": 2}
+
+def expected_ids(db, date_from=None, date_to=None, dest_id=None):
+    rows = db.run_query("""SELECT b.booking_id FROM Bookings b JOIN TravelPackages tp ON tp.pkg_id = b.pkg_id
+                           WHERE b.booking_date >= COALESCE(?, '') AND b.booking_date <= COALESCE(?, '9999-12-31')
+                             AND tp.dest_id = COALESCE(?, tp.dest_id)
+                           ORDER BY b.booking_date DESC""", (date_from, date_to, dest_id))
+    return [r[0] for r in rows]
+
+@pytest.mark.parametrize("filters", [{}, {"date_from": "2025-02-01", "date_to": "2025-04-30"}, FILTERS])
+def test_csv_export_holds_exactly_the_filtered_bookings(db, tmp_path, filters):
+    path = tmp_path / "report.csv"
+    written = db.export_booking_report(str(path), "csv", chunk_rows=2, **filters)
+    with open(path, newline="", encoding="utf-8") as f:
+        header, *rows = list(csv.reader(f))
+    assert header == list(db.BOOKING_EXPORT_TYPES)
+    assert [int(r[0]) for r in rows] == expected_ids(db, **filters)
+    assert written == len(rows) > 0
+
+def test_parquet_export_matches_the_csv(db, tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    db.export_booking_report(str(tmp_path / "report.csv"), "csv", chunk_rows=2)
+    assert db.export_booking_report(str(tmp_path / "report.parquet"), "parquet", chunk_rows=2) == len(expected_ids(db))
+    table = pq.read_table(tmp_path / "report.parquet")
+    assert table.column_names == list(db.BOOKING_EXPORT_TYPES)
+    assert table.column("ID").to_pylist() == expected_ids(db)
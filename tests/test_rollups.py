@@ -0,0 +1,48 @@
+from checks import assert_consistent
+
+def rollup(db, table, key, value):
+    return db.run_query(f"SELECT amount, payments FROM {table} WHERE {key} = ?", (value,))
+
+def test_rollups_follow_payment_changes(db):
+    db.run_query("INSERT INTO Payments (booking_id, amount, payment_date) VALUES (1, 250, '2025-03-04')", fetch=False)
+    assert rollup(db, "RevenueByDay", "day", "2025-03-04") == [(250, 1)]
+    assert rollup(db, "RevenueByPackage", "pkg_id", 1) == [(5250, 2)]
+
+    db.run_query("UPDATE Payments SET amount = 100, payment_date = '2025-04-01' WHERE payment_date = '2025-03-04'", fetch=False)
+    assert rollup(db, "RevenueByDay", "day", "2025-03-04") == []
+    assert rollup(db, "RevenueByMonth", "month", "2025-04") == [(100, 1)]
+    assert_consistent(db)
+
+    db.run_query("DELETE FROM Payments WHERE payment_date = '2025-04-01'", fetch=False)
+    assert rollup(db, "RevenueByMonth", "month", "2025-04") == []
+    assert_consistent(db)
+
+def test_rollups_follow_booking_package_and_cascades(db):
+    db.run_query("UPDATE Bookings SET pkg_id = 2, cust_id = 3 WHERE booking_id = 1", fetch=False)
+    assert rollup(db, "RevenueByPackage", "pkg_id", 1) == []
+    assert rollup(db, "RevenueByCustomer", "cust_id", 3) == [(9000, 2)]
+    assert_consistent(db)
+
+    db.run_query("UPDATE TravelPackages SET dest_id = 3 WHERE pkg_id = 2", fetch=False)
+    assert rollup(db, "RevenueByDestination", "dest_id", 2) == []
+    assert_consistent(db)
+
+    db.run_query("DELETE FROM Bookings WHERE booking_id = 2", fetch=False)
+    db.run_query("DELETE FROM Customers WHERE cust_id = 1", fetch=False)
+    assert_consistent(db)
+
+def test_revenue_series_matches_payments(db):
+    db.run_query("INSERT INTO Payments (booking_id, amount, payment_date) VALUES (2, 120, '2025-11-30')", fetch=False)
+    series = db.revenue_series("month")
+    expected = db.run_query("""SELECT strftime('%Y-%m', payment_date), SUM(amount), COUNT(*) FROM Payments
+                               GROUP BY 1 ORDER BY 1""")
+    assert [tuple(row) for row in series.itertuples(index=False)] == expected
+    days = db.revenue_series("day", "2025-11-30")
+    assert tuple(days.iloc[0]) == ("2025-11-30", 120, 1)
+    assert days["period"].min() >= "2025-11-30"
+
+def test_refresh_repairs_a_rollup_written_around_the_triggers(db):
+    db.run_query("UPDATE RevenueByPackage SET amount = 1 WHERE pkg_id = 1", fetch=False)
+    db.run_query("DELETE FROM RevenueByDay", fetch=False)
+    db.refresh_revenue_rollups()
+    assert_consistent(db)
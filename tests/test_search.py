@@ -0,0 +1,23 @@
+def test_any_word_prefix_matches_without_diacritics(db):
+    zelda = db.add_customer("Zelda Quill", "zelda@quillmail.example")
+    ayse = db.add_customer("Ayşe Gül", "ayse@example.com")
+    label = "Zelda Quill <zelda@quillmail.example>"
+    assert db.search_options("customers", "quil") == {zelda: label}
+    assert db.search_options("customers", "zelda qu") == {zelda: label}
+    assert db.search_options("customers", "quillmail") == {zelda: label}
+    assert list(db.search_options("customers", "gul")) == [ayse]
+
+def test_index_follows_updates_and_deletes(db):
+    cust = db.add_customer("Zelda Quill", "zelda@example.com")
+    db.update_customer(cust, name="Zora Quill")
+    assert db.search_options("customers", "zelda") == {cust: "Zora Quill <zelda@example.com>"}   # still in the email
+    assert list(db.search_options("customers", "zora")) == [cust]
+    db.delete_customer(cust)
+    assert db.search_options("customers", "zora") == {}
+
+def test_every_source_searches_its_own_table(db):
+    dest = db.add_destination("Zanzibar", "Tanzania")
+    pkg = db.add_package(dest, "Spice Island Escape", 900)
+    assert db.search_options("destinations", "tanz") == {dest: "Zanzibar, Tanzania"}
+    assert list(db.search_options("packages", "spice isl")) == [pkg]
+    assert db.search_index_available()
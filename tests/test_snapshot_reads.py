@@ -0,0 +1,29 @@
+import sqlite3
+
+import pytest
+
+def test_report_reads_use_read_only_connections(db):
+    reads = db.get_snapshot_stats().stats()["reads"]
+    frame = db.get_dataframe("SELECT * FROM Customers", cached=False)
+    assert len(frame) == db.run_query("SELECT COUNT(*) FROM Customers")[0][0]
+    assert db.get_snapshot_stats().stats()["reads"] == reads + 1
+    with db.snapshot_read() as conn:
+        with pytest.raises(sqlite3.OperationalError):
+            conn.execute("DELETE FROM Customers")
+
+def test_a_snapshot_ignores_commits_made_while_it_reads(db):
+    count = "SELECT COUNT(*) FROM Customers"
+    with db.snapshot_read() as conn:
+        conn.execute("BEGIN")
+        (before,), = conn.execute(count).fetchall()
+        db.write_transaction(lambda w: w.execute("INSERT INTO Customers (name, email) VALUES ('Ada', 'ada@example.com')"), "Customers")
+        assert conn.execute(count).fetchall() == [(before,)]
+        conn.commit()
+        assert conn.execute(count).fetchall() == [(before + 1,)]
+    assert db.get_snapshot_stats().stats()["stale_reads"] == 1
+
+def test_reads_do_not_wait_for_an_open_write(db):
+    def work(conn):
+        conn.execute("DELETE FROM Payments")
+        return db.get_dataframe("SELECT COUNT(*) AS n FROM Payments", cached=False)["n"][0]
+    assert db.write_transaction(work, "Payments") > 0    # the committed snapshot, not the pending delete
@@ -0,0 +1,3555 @@
+import bisect
+import contextvars
+import csv
+import functools
+import importlib.util
+import itertools
+import logging
+import pathlib
+import random
+import re
+import sqlite3
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from datetime import date, timedelta
+
+#=============================================================================================
+#   Travel booking data layer: connections, schema migrations, query cache, booking ledger,
+#   availability and allocation, and the page/report queries. No Streamlit import, and pandas
+#   is only imported the first time a DataFrame is asked for, so batch jobs and scripts can
+#   `import travel_core` cheaply. The Streamlit app (BayramYavuz_Code.py) is built on it.
+#=============================================================================================
+
+DB_FILE = "travel_system_final.db"
+
+DB_POOL_SIZE = 8                      # max simultaneously checked-out connections
+DB_READ_POOL_SIZE = 4                 # read-only connections for reports, dashboards and exports
+DB_BUSY_TIMEOUT_MS = 5000             # how long a writer waits on a locked database
+DB_CACHE_SIZE_KB = 20000              # page cache per connection (~20 MB)
+DB_MMAP_SIZE = 256 * 1024 * 1024      # memory-mapped I/O window
+
+QUERY_CACHE_MAX_BYTES = 64 * 1024 * 1024   # memory cap for cached SELECT results
+QUERY_CACHE_MAX_ENTRIES = 512
+
+#=============================================================================================
+
+def process_resource(fn):
+    """Create a resource once per process and argument tuple (e.g. one pool per database file)
+    and hand the same object to every caller and thread afterwards."""
+    resources, lock = {}, threading.Lock()
+
+    @functools.wraps(fn)
+    def getter(*args):
+        with lock:
+            if args not in resources:
+                resources[args] = fn(*args)
+            return resources[args]
+
+    getter.clear = resources.clear
+    return getter
+
+#=============================================================================================
+
+def db_connect(db_file=None, readonly=False):
+    """Open a new tuned connection. Pragmas are applied once, when the connection is opened, and
+    the archive database is attached (attach_archive). readonly opens a file:...?mode=ro URI
+    connection, which can never take the write lock; the database must exist and already be in
+    WAL mode (init_db makes sure of both)."""
+    db_file = db_file or DB_FILE
+    if readonly:
+        conn = sqlite3.connect(pathlib.Path(db_file).resolve().as_uri() + "?mode=ro", uri=True,
+                               timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+    else:
+        conn = sqlite3.connect(db_file, timeout=DB_BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+        if conn.execute("PRAGMA page_count;").fetchone()[0] == 0:
+            # only takes effect on a new, empty file; on an existing one it would wait for the write lock
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL;")
+        conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS};")
+    conn.execute(f"PRAGMA cache_size = -{DB_CACHE_SIZE_KB};")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    conn.execute("PRAGMA foreign_keys = ON;")
+    attach_archive(conn, db_file, readonly)
+    return conn
+
+#=============================================================================================
+
+class ConnectionPool:
+    """Keeps opened connections alive so queries and reruns reuse them instead of reconnecting."""
+
+    def __init__(self, db_file, max_size=DB_POOL_SIZE, readonly=False):
+        self.db_file = db_file
+        self.max_size = max_size
+        self.readonly = readonly
+        self._idle = []
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._stats = {"opens": 0, "reuses": 0, "waits": 0, "wait_time_ms": 0.0, "discarded": 0}
+
+    def acquire(self):
+        start = time.perf_counter()
+        with self._cond:
+            waited = False
+            while not self._idle and self._in_use >= self.max_size:
+                waited = True
+                self._cond.wait()
+            self._in_use += 1
+            conn = self._idle.pop() if self._idle else None
+            wait_ms = (time.perf_counter() - start) * 1000
+            self._stats["wait_time_ms"] += wait_ms
+            if waited:
+                self._stats["waits"] += 1
+            if conn is not None:
+                self._stats["reuses"] += 1
+                return conn
+
+        try:
+            conn = db_connect(self.db_file, self.readonly)
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._stats["opens"] += 1
+        return conn
+
+    def release(self, conn):
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+        with self._cond:
+            self._in_use -= 1
+            if healthy:
+                self._idle.append(conn)
+            else:
+                self._stats["discarded"] += 1
+            self._cond.notify()
+        if not healthy:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        with self._cond:
+            snapshot = dict(self._stats)
+            snapshot["in_use"] = self._in_use
+            snapshot["idle"] = len(self._idle)
+            snapshot["max_size"] = self.max_size
+        return snapshot
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+#=============================================================================================
+
+@process_resource
+def pool_for(db_file):
+    """One pool per database file and server process, shared by every session and kept across reruns."""
+    return ConnectionPool(db_file)
+
+def get_pool():
+    return pool_for(DB_FILE)
+
+def get_pool_stats():
+    return get_pool().stats()
+
+@process_resource
+def read_pool_for(db_file):
+    """Read-only connections for report, dashboard and export reads. In WAL mode they read the
+    last committed snapshot without blocking writers or waiting for them, and a long report never
+    ties up a connection the booking pages need."""
+    return ConnectionPool(db_file, DB_READ_POOL_SIZE, readonly=True)
+
+def get_read_pool():
+    return read_pool_for(DB_FILE)
+
+def close_pools():
+    """Close the idle connections of both pools (scripts, before switching DB_FILE or exiting)."""
+    get_pool().close_all()
+    get_read_pool().close_all()
+
+SNAPSHOT_SAMPLES = 1000        # recent snapshot reads kept for the percentiles
+
+class SnapshotStats:
+    """Reads on the read-only pool: how long they waited for a connection, how long they read,
+    and how many finished stale, i.e. a writer committed while they read, so the result lags the
+    database by at most the read time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"reads": 0, "stale_reads": 0, "wait_time_ms": 0.0, "max_wait_ms": 0.0, "max_stale_ms": 0.0}
+        self._recent = []      # (wait_ms, stale_ms)
+
+    def record(self, wait_ms, read_ms, stale):
+        with self._lock:
+            self._stats["reads"] += 1
+            self._stats["wait_time_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            if stale:
+                self._stats["stale_reads"] += 1
+                self._stats["max_stale_ms"] = max(self._stats["max_stale_ms"], read_ms)
+            self._recent.append((wait_ms, read_ms if stale else 0.0))
+            if len(self._recent) > SNAPSHOT_SAMPLES:
+                del self._recent[0]
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            waits = sorted(w for w, _ in self._recent)
+            stale = sorted(s for _, s in self._recent)
+        snapshot["avg_wait_ms"] = snapshot["wait_time_ms"] / snapshot["reads"] if snapshot["reads"] else 0.0
+        snapshot["p95_wait_ms"] = waits[int(len(waits) * 0.95)] if waits else 0.0
+        snapshot["p95_stale_ms"] = stale[int(len(stale) * 0.95)] if stale else 0.0
+        return snapshot
+
+@process_resource
+def snapshot_stats_for(db_file):
+    return SnapshotStats()
+
+def get_snapshot_stats():
+    return snapshot_stats_for(DB_FILE)
+
+@contextmanager
+def snapshot_read():
+    """Check out a read-only connection for one report/dashboard/export read and record its wait
+    and staleness in get_snapshot_stats(). PRAGMA data_version changes when another connection
+    committed, which for a read-only connection is every commit."""
+    checkout = time.perf_counter()
+    with get_read_pool().connection() as conn:
+        start = time.perf_counter()
+        version = conn.execute("PRAGMA data_version").fetchone()[0]
+        yield conn
+        stale = conn.execute("PRAGMA data_version").fetchone()[0] != version
+        get_snapshot_stats().record((start - checkout) * 1000, (time.perf_counter() - start) * 1000, stale)
+
+#=============================================================================================
+
+def column_exists(cursor, table, column):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return column in [r[1] for r in cursor.fetchall()]
+
+def table_has_column(table, column):
+    with get_pool().connection() as conn:
+        return column_exists(conn.cursor(), table, column)
+
+#=============================================================================================
+
+TABLE_REF_RE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+WRITE_TARGET_RE = re.compile(r"\b(?:INSERT\s+(?:OR\s+\w+\s+)?INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+(\w+)", re.IGNORECASE)
+CACHEABLE_RE = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+
+def estimate_size(value):
+    """Approximate bytes held by a cached DataFrame, list of row tuples or dict of those."""
+    if hasattr(value, "memory_usage"):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if hasattr(value, "size_bytes"):
+        return value.size_bytes()
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(v) if isinstance(v, (list, dict)) else sys.getsizeof(v)
+                                          for v in value.values())
+    if not value:
+        return sys.getsizeof(value)
+    sample = value[:50]
+    per_row = sum(sys.getsizeof(r) + sum(sys.getsizeof(v) for v in r) for r in sample) / len(sample)
+    return int(sys.getsizeof(value) + per_row * len(value))
+
+#=============================================================================================
+
+class QueryCache:
+    """LRU cache of SELECT results, invalidated per table.
+
+    Every entry remembers the tables it read. A write drops the entries reading any table the
+    write can change: the table itself, ON DELETE/UPDATE CASCADE children and trigger targets.
+    Commits made by other processes are detected with PRAGMA data_version and flush everything.
+
+    A result computed while a write was being committed may predate it, so every invalidation
+    bumps a generation counter and stamps the tables it dropped; get() remembers (per thread)
+    the generation it looked a key up at, and put() discards the value if one of its tables
+    was invalidated since."""
+
+    def __init__(self, db_file, max_bytes=QUERY_CACHE_MAX_BYTES, max_entries=QUERY_CACHE_MAX_ENTRIES):
+        self.db_file = db_file
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()      # key -> (value, tables, size)
+        self._bytes = 0
+        self._lock = threading.RLock()
+        self._watcher = None               # private connection used only for PRAGMA data_version
+        self._data_version = None
+        self._sources = None               # table/view name -> base tables it reads
+        self._write_effects = None         # table -> every table a write to it can change
+        self._generation = 0               # bumped by every invalidation and flush
+        self._invalidated_at = {}          # table -> generation it was last invalidated at
+        self._flushed_at = 0               # generation of the last flush of everything
+        self._lookups = threading.local()  # key -> generation of this thread's last get()
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "external_flushes": 0,
+                       "stale_puts": 0}
+
+    def _load_schema(self):
+        if self._watcher is None:
+            self._watcher = db_connect(self.db_file)
+        objects = self._watcher.execute("SELECT type, name, tbl_name, sql FROM sqlite_master").fetchall()
+        tables = {name for kind, name, _, _ in objects if kind == "table"}
+
+        sources = {t: {t} for t in tables}
+        for kind, name, _, sql in objects:
+            if kind == "view":
+                sources[name] = {t for t, _ in TABLE_REF_RE.findall(sql) if t in tables}
+
+        edges = {t: set() for t in tables}
+        for child in tables:
+            for fk in self._watcher.execute(f"PRAGMA foreign_key_list({child})"):
+                parent, on_update, on_delete = fk[2], fk[5], fk[6]
+                if parent in edges and (on_update != "NO ACTION" or on_delete != "NO ACTION"):
+                    edges[parent].add(child)
+        for kind, _, table, sql in objects:
+            if kind == "trigger" and table in edges:
+                body = sql.split("BEGIN", 1)[-1]
+                edges[table].update(t for t in WRITE_TARGET_RE.findall(body) if t in tables)
+
+        effects = {}
+        for table in tables:
+            seen, todo = {table}, [table]
+            while todo:
+                for nxt in edges[todo.pop()] - seen:
+                    seen.add(nxt)
+                    todo.append(nxt)
+            effects[table] = seen
+        self._sources, self._write_effects = sources, effects
+
+    def _sync_data_version(self):
+        """Flush if another connection committed since the last check. Caller holds the lock."""
+        if self._sources is None:
+            self._load_schema()
+        version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+        if self._data_version is not None and version != self._data_version:
+            self._stats["external_flushes"] += 1
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self._flushed_at = self._generation
+            self._load_schema()   # the other writer may have migrated the schema
+        self._data_version = version
+
+    def _thread_lookups(self):
+        if not hasattr(self._lookups, "at"):
+            self._lookups.at = {}
+        return self._lookups.at
+
+    def read_tables(self, query):
+        """Base tables a SELECT reads, or None when it references something we can't track."""
+        with self._lock:
+            if self._sources is None:
+                self._load_schema()
+            tables = set()
+            for name, _ in TABLE_REF_RE.findall(query):
+                if name not in self._sources:
+                    return None
+                tables |= self._sources[name]
+            return frozenset(tables)
+
+    def get(self, key):
+        """Return (found, value)."""
+        with self._lock:
+            self._sync_data_version()
+            lookups = self._thread_lookups()
+            if len(lookups) >= self.max_entries:    # hits that were never followed by a put
+                lookups.clear()
+            lookups[key] = self._generation
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats["misses"] += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return True, entry[0]
+
+    def put(self, key, value, tables):
+        """Store the value computed after this thread's get(key) missed (or found it too old),
+        unless a write to one of `tables` was committed since that lookup."""
+        size = estimate_size(value)
+        looked_up_at = self._thread_lookups().pop(key, None)
+        if size > self.max_bytes // 4:
+            return
+        with self._lock:
+            if (looked_up_at is None or self._flushed_at > looked_up_at
+                    or any(self._invalidated_at.get(t, 0) > looked_up_at for t in tables)):
+                self._stats["stale_puts"] += 1
+                return
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[2]
+            self._entries[key] = (value, tables, size)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, _, old_size) = self._entries.popitem(last=False)
+                self._bytes -= old_size
+                self._stats["evictions"] += 1
+
+    def invalidate(self, tables):
+        """Call after committing a write to `tables` through this process."""
+        with self._lock:
+            if self._sources is None:
+                self._load_schema()
+            affected = set()
+            for table in tables:
+                affected |= self._write_effects.get(table, {table})
+            self._generation += 1
+            for table in affected:
+                self._invalidated_at[table] = self._generation
+            for key in [k for k, (_, read, _) in self._entries.items() if read & affected]:
+                self._bytes -= self._entries.pop(key)[2]
+                self._stats["invalidations"] += 1
+            # our own commit also bumped data_version; adopt it so it isn't taken for an external write
+            self._data_version = self._watcher.execute("PRAGMA data_version").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            self._generation += 1
+            self._flushed_at = self._generation
+            self._sources = self._write_effects = None
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot["entries"] = len(self._entries)
+            snapshot["bytes"] = self._bytes
+            snapshot["max_bytes"] = self.max_bytes
+        return snapshot
+
+#=============================================================================================
+
+@process_resource
+def cache_for(db_file):
+    return QueryCache(db_file)
+
+def get_query_cache():
+    return cache_for(DB_FILE)
+
+def cache_key(kind, query, params):
+    """Key for a cacheable SELECT, or None (writes, unhashable params)."""
+    if not CACHEABLE_RE.match(query):
+        return None
+    key = (kind, query, tuple(params))
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+def note_write(*tables):
+    """Invalidate cached results after a commit that went around run_query."""
+    get_query_cache().invalidate(tables)
+
+#=============================================================================================
+
+SLOW_QUERY_MS = 200                                # default slow-query threshold
+SLOW_QUERY_LOG_SIZE = 100                          # slow statements kept for the admin panel
+PROFILE_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000)  # histogram upper bounds, plus one open bucket
+PROFILE_MAX_STATEMENTS = 500                       # beyond this, new statements share one entry
+
+slow_query_logger = logging.getLogger("travel_core.slow_queries")
+current_page = contextvars.ContextVar("current_page", default="-")
+
+@contextmanager
+def profile_page(page):
+    """Attribute the queries run inside the block to `page` (e.g. "show_dashboard")."""
+    token = current_page.set(page)
+    try:
+        yield
+    finally:
+        current_page.reset(token)
+
+class QueryProfiler:
+    """Per-statement latency histograms, row counts, pool wait and issuing pages for everything
+    run through run_query()/get_dataframe(), plus a log of statements slower than slow_ms
+    (with their query plan). Statements are keyed by their SQL text, whitespace collapsed."""
+
+    def __init__(self, slow_ms=SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._lock = threading.Lock()
+        self._statements = {}
+        self._slow = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+
+    def _entry(self, sql):
+        key = " ".join(sql.split())
+        if key not in self._statements and len(self._statements) >= PROFILE_MAX_STATEMENTS:
+            key = "(other statements)"
+        return self._statements.setdefault(key, {
+            "calls": 0, "cache_hits": 0, "total_ms": 0.0, "max_ms": 0.0, "wait_ms": 0.0, "rows": 0,
+            "histogram": [0] * (len(PROFILE_BUCKETS_MS) + 1), "pages": {},
+        })
+
+    def record_hit(self, sql):
+        page = current_page.get()
+        with self._lock:
+            entry = self._entry(sql)
+            entry["cache_hits"] += 1
+            entry["pages"][page] = entry["pages"].get(page, 0) + 1
+
+    def record(self, sql, elapsed_ms, wait_ms, rows):
+        page = current_page.get()
+        with self._lock:
+            entry = self._entry(sql)
+            entry["calls"] += 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["wait_ms"] += wait_ms
+            entry["rows"] += rows or 0
+            entry["histogram"][sum(elapsed_ms > b for b in PROFILE_BUCKETS_MS)] += 1
+            entry["pages"][page] = entry["pages"].get(page, 0) + 1
+
+    def is_slow(self, elapsed_ms):
+        return self.slow_ms is not None and elapsed_ms >= self.slow_ms
+
+    def record_slow(self, sql, params, elapsed_ms, rows, plan):
+        page = current_page.get()
+        with self._lock:
+            self._slow.append({"at": time.time(), "page": page, "ms": elapsed_ms, "rows": rows,
+                               "sql": sql.strip(), "params": repr(tuple(params))[:200], "plan": plan})
+        slow_query_logger.warning("slow query: %.1f ms, %s rows, page %s\n%s\nplan:\n%s",
+                                  elapsed_ms, rows, page, sql.strip(), plan)
+
+    def top(self, n=20, order="total_ms"):
+        """The n heaviest statements by total_ms, avg_ms, max_ms, p95_ms or calls."""
+        with self._lock:
+            items = [(sql, dict(e, histogram=list(e["histogram"]), pages=dict(e["pages"])))
+                     for sql, e in self._statements.items()]
+        rows = []
+        for sql, e in items:
+            calls = e["calls"]
+            rows.append({
+                "statement": sql, "pages": ", ".join(sorted(e["pages"], key=e["pages"].get, reverse=True)),
+                "calls": calls, "cache_hits": e["cache_hits"], "total_ms": e["total_ms"],
+                "avg_ms": e["total_ms"] / calls if calls else 0.0, "p95_ms": histogram_percentile(e["histogram"], 0.95),
+                "max_ms": e["max_ms"], "avg_rows": e["rows"] / calls if calls else 0.0,
+                "avg_wait_ms": e["wait_ms"] / calls if calls else 0.0, "histogram": e["histogram"],
+            })
+        rows.sort(key=lambda r: r[order], reverse=True)
+        return rows[:n]
+
+    def slow_queries(self):
+        with self._lock:
+            return list(reversed(self._slow))
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self._slow.clear()
+
+def histogram_percentile(histogram, q):
+    """Upper bound (ms) of the bucket holding the q-quantile; inf for the open top bucket."""
+    total = sum(histogram)
+    if not total:
+        return 0.0
+    seen = 0
+    for bound, count in zip(PROFILE_BUCKETS_MS + (float("inf"),), histogram):
+        seen += count
+        if seen >= q * total:
+            return float(bound)
+    return float("inf")
+
+@process_resource
+def profiler_for(db_file):
+    return QueryProfiler()
+
+def get_query_profiler():
+    return profiler_for(DB_FILE)
+
+def explain_plan(conn, query, params):
+    try:
+        return "\n".join(r[3] for r in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+    except sqlite3.Error as e:
+        return f"(no plan: {e})"
+
+#=============================================================================================
+
+def run_query(query, params=(), fetch=True):
+    cache = get_query_cache()
+    profiler = get_query_profiler()
+    key = cache_key("rows", query, params) if fetch else None
+    if key is not None:
+        found, rows = cache.get(key)
+        if found:
+            profiler.record_hit(query)
+            return list(rows)
+
+    checkout = time.perf_counter()
+    with get_pool().connection() as conn:
+        start = time.perf_counter()
+        cur = conn.cursor()
+        cur.execute(query, params)
+        rows = cur.fetchall() if fetch else None
+        conn.commit()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        n_rows = len(rows) if fetch else cur.rowcount
+        profiler.record(query, elapsed_ms, (start - checkout) * 1000, n_rows)
+        if profiler.is_slow(elapsed_ms):
+            profiler.record_slow(query, params, elapsed_ms, n_rows, explain_plan(conn, query, params))
+
+    written = WRITE_TARGET_RE.match(query.lstrip())
+    if written:
+        cache.invalidate([written.group(1)])
+    elif key is not None:
+        tables = cache.read_tables(query)
+        if tables is not None:
+            cache.put(key, list(rows), tables)
+    return rows
+
+#=============================================================================================
+
+def get_dataframe(query, params=(), cached=True):
+    import pandas as pd   # deferred: only DataFrame callers pay for importing pandas
+    cache = get_query_cache()
+    profiler = get_query_profiler()
+    key = cache_key("frame", query, params) if cached else None
+    if key is not None:
+        found, df = cache.get(key)
+        if found:
+            profiler.record_hit(query)
+            return df.copy()
+
+    checkout = time.perf_counter()
+    with snapshot_read() as conn:
+        start = time.perf_counter()
+        df = pd.read_sql(query, conn, params=params)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        profiler.record(query, elapsed_ms, (start - checkout) * 1000, len(df))
+        if profiler.is_slow(elapsed_ms):
+            profiler.record_slow(query, params, elapsed_ms, len(df), explain_plan(conn, query, params))
+
+    if key is not None:
+        tables = cache.read_tables(query)
+        if tables is not None:
+            cache.put(key, df.copy(), tables)
+    return df
+
+#=============================================================================================
+
+WRITE_MAX_ATTEMPTS = 8
+WRITE_BACKOFF_MS = 10          # first retry delay; doubles per attempt, plus jitter
+LOCK_WAIT_SAMPLES = 1000       # recent waits kept for the percentile
+
+class LockWaitStats:
+    """How long write transactions waited for the database write lock (BEGIN IMMEDIATE)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # transactions: write lock acquired; gave_up: still busy after WRITE_MAX_ATTEMPTS
+        self._stats = {"transactions": 0, "retries": 0, "gave_up": 0, "wait_time_ms": 0.0, "max_wait_ms": 0.0}
+        self._recent = []
+
+    def record(self, wait_ms, attempts, committed):
+        with self._lock:
+            self._stats["transactions" if committed else "gave_up"] += 1
+            self._stats["retries"] += attempts - 1
+            self._stats["wait_time_ms"] += wait_ms
+            self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+            self._recent.append(wait_ms)
+            if len(self._recent) > LOCK_WAIT_SAMPLES:
+                del self._recent[0]
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            recent = sorted(self._recent)
+        total = snapshot["transactions"] + snapshot["gave_up"]
+        snapshot["avg_wait_ms"] = snapshot["wait_time_ms"] / total if total else 0.0
+        snapshot["p95_wait_ms"] = recent[int(len(recent) * 0.95)] if recent else 0.0
+        return snapshot
+
+@process_resource
+def lock_stats_for(db_file):
+    return LockWaitStats()
+
+def get_lock_stats():
+    return lock_stats_for(DB_FILE)
+
+def is_busy_error(e):
+    code = getattr(e, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xFF in (sqlite3.SQLITE_BUSY, sqlite3.SQLITE_LOCKED)
+    return "locked" in str(e) or "busy" in str(e)
+
+def write_transaction(work, *tables):
+    """Run work(conn) in one BEGIN IMMEDIATE transaction and return its result. Taking the write
+    lock up front means the reads inside `work` see no concurrent writer until commit. When the
+    lock is still busy after busy_timeout, retry with exponential backoff; wait time is recorded
+    in get_lock_stats(). Any exception from `work` rolls everything back."""
+    lock_stats = get_lock_stats()
+    with get_pool().connection() as conn:
+        start = time.perf_counter()
+        for attempt in range(1, WRITE_MAX_ATTEMPTS + 1):
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == WRITE_MAX_ATTEMPTS:
+                    lock_stats.record((time.perf_counter() - start) * 1000, attempt, False)
+                    raise
+                delay_ms = WRITE_BACKOFF_MS * 2 ** (attempt - 1)
+                time.sleep(delay_ms * (1 + random.random()) / 1000)
+                continue
+            lock_stats.record((time.perf_counter() - start) * 1000, attempt, True)
+            try:
+                result = work(conn)
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            break
+    note_write(*tables)
+    return result
+
+#=============================================================================================
+
+def migration_base_schema(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Customers (
+        cust_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        email TEXT UNIQUE NOT NULL
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Destinations (
+        dest_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        city TEXT NOT NULL,
+        country TEXT NOT NULL
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Services (
+        service_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        service_name TEXT NOT NULL,
+        base_price REAL NOT NULL
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Hotels (
+        hotel_id INTEGER PRIMARY KEY,
+        stars INTEGER,
+        FOREIGN KEY (hotel_id) REFERENCES Services(service_id) ON DELETE CASCADE
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Flights (
+        flight_id INTEGER PRIMARY KEY,
+        airline TEXT,
+        FOREIGN KEY (flight_id) REFERENCES Services(service_id) ON DELETE CASCADE
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Rooms (
+        room_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        hotel_id INTEGER,
+        room_no TEXT,
+        FOREIGN KEY (hotel_id) REFERENCES Hotels(hotel_id) ON DELETE CASCADE
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Seats (
+        seat_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        flight_id INTEGER,
+        seat_no TEXT,
+        FOREIGN KEY (flight_id) REFERENCES Flights(flight_id) ON DELETE CASCADE
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS TravelPackages (
+        pkg_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        dest_id INTEGER,
+        pkg_name TEXT,
+        price REAL,
+        FOREIGN KEY (dest_id) REFERENCES Destinations(dest_id)
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS PackageContents (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        pkg_id INTEGER,
+        service_id INTEGER,
+        FOREIGN KEY (pkg_id) REFERENCES TravelPackages(pkg_id) ON DELETE CASCADE,
+        FOREIGN KEY (service_id) REFERENCES Services(service_id) ON DELETE CASCADE
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Bookings (
+        booking_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        cust_id INTEGER,
+        pkg_id INTEGER,
+        booking_date DATE DEFAULT CURRENT_DATE,
+        is_paid INTEGER DEFAULT 0,
+        FOREIGN KEY (cust_id) REFERENCES Customers(cust_id) ON DELETE CASCADE,
+        FOREIGN KEY (pkg_id) REFERENCES TravelPackages(pkg_id)
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Payments (
+        payment_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id INTEGER,
+        amount REAL,
+        payment_date DATE DEFAULT CURRENT_DATE,
+        FOREIGN KEY (booking_id) REFERENCES Bookings(booking_id) ON DELETE CASCADE
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Reservations (
+        res_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id INTEGER,
+        service_id INTEGER,
+        room_id INTEGER,
+        check_in DATE,
+        check_out DATE,
+        FOREIGN KEY (booking_id) REFERENCES Bookings(booking_id) ON DELETE CASCADE,
+        FOREIGN KEY (service_id) REFERENCES Services(service_id),
+        FOREIGN KEY (room_id) REFERENCES Rooms(room_id)
+    )""")
+
+    cursor.execute("""CREATE TABLE IF NOT EXISTS Tickets (
+        ticket_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        booking_id INTEGER,
+        seat_id INTEGER,
+        issue_date DATE DEFAULT CURRENT_DATE,
+        FOREIGN KEY (booking_id) REFERENCES Bookings(booking_id) ON DELETE CASCADE,
+        FOREIGN KEY (seat_id) REFERENCES Seats(seat_id)
+    )""")
+
+#=============================================================================================
+
+def migration_booking_is_paid(cursor):
+    """Databases created before payment tracking have no Bookings.is_paid column."""
+    if not column_exists(cursor, "Bookings", "is_paid"):
+        cursor.execute("ALTER TABLE Bookings ADD COLUMN is_paid INTEGER DEFAULT 0")
+
+def migration_reservation_check_out(cursor):
+    if not column_exists(cursor, "Reservations", "check_out"):
+        cursor.execute("ALTER TABLE Reservations ADD COLUMN check_out DATE")
+
+#=============================================================================================
+
+def migration_payment_status_queue(cursor):
+    # Bookings whose is_paid may be stale; filled by the triggers and drained on reconciliation
+    cursor.execute("""CREATE TABLE IF NOT EXISTS PaymentStatusQueue (
+        booking_id INTEGER PRIMARY KEY
+    )""")
+    for trigger_sql in PAYMENT_STATUS_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+#=============================================================================================
+
+def migration_seed_sample_data(cursor):
+    """Insert the sample data set into an empty database."""
+    cursor.execute("SELECT COUNT(*) FROM Customers")
+    if cursor.fetchone()[0] != 0:
+        return
+
+    customers = [
+        ("Ali Yilmaz", "ali@mail.com"),
+        ("Ayse Demir", "ayse@mail.com"),
+        ("Mehmet Kara", "mehmet@mail.com"),
+        ("Zeynep Aydin", "zeynep@mail.com"),
+        ("Burak Aslan", "burak@mail.com")
+    ]
+    cursor.executemany("INSERT INTO Customers (name, email) VALUES (?, ?)", customers)
+
+#=============================================================================================
+
+    destinations = [
+        ("Paris", "France"),
+        ("Tokyo", "Japan"),
+        ("Rome", "Italy"),
+        ("New York", "USA"),
+        ("Dubai", "UAE"),
+        ("Istanbul", "Turkey"),
+        ("Barcelona", "Spain"),
+        ("Cairo", "Egypt"),
+        ("Nice", "France (Nice)") 
+    ]
+    cursor.executemany("INSERT INTO Destinations (city, country) VALUES (?, ?)", destinations)
+
+    services = [
+        ("TK101 Flight", 1500), ("LH404 Flight", 2000), ("BA505 Flight", 2500), ("AA100 Flight", 1800), ("JL777 Flight", 2200),
+        ("Hilton Paris", 3000), ("Rixos Antalya", 4500), ("Marriott Rome", 2800), ("Plaza NYC", 5000), ("Burj Al Arab", 8000)
+    ]
+    for i, (name, price) in enumerate(services):
+        cursor.execute("INSERT INTO Services (service_name, base_price) VALUES (?, ?)", (name, price))
+        service_id = cursor.lastrowid
+        if i < 5:
+            cursor.execute("INSERT INTO Flights (flight_id, airline) VALUES (?, ?)", (service_id, name.split()[0]))
+            for seat_no in ["1A", "1B", "2A", "2B"]:
+                cursor.execute("INSERT INTO Seats (flight_id, seat_no) VALUES (?, ?)", (service_id, seat_no))
+        else: 
+            cursor.execute("INSERT INTO Hotels (hotel_id, stars) VALUES (?, ?)", (service_id, 5))
+            for room_no in ["101", "102", "201", "202"]:
+                cursor.execute("INSERT INTO Rooms (hotel_id, room_no) VALUES (?, ?)", (service_id, room_no))
+
+#=============================================================================================
+
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Paris' LIMIT 1")
+    paris_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Tokyo' LIMIT 1")
+    tokyo_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Rome' LIMIT 1")
+    rome_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='New York' LIMIT 1")
+    ny_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Dubai' LIMIT 1")
+    dubai_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Istanbul' LIMIT 1")
+    ist_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Barcelona' LIMIT 1")
+    bar_id = cursor.fetchone()[0]
+    cursor.execute("SELECT dest_id FROM Destinations WHERE city='Cairo' LIMIT 1")
+    cai_id = cursor.fetchone()[0]
+
+#=============================================================================================
+
+    packages = [
+        (paris_id, "Romantic Escape", 5000),
+        (tokyo_id, "Sakura Tour", 7000),
+        (rome_id, "Ancient Rome", 4000),
+        (ny_id, "NYC Lights", 6000),
+        (dubai_id, "Dubai Luxury", 9000),
+
+        (ist_id, "Türkiye Delight", 3500),
+        (bar_id, "Spain Fiesta", 3800),
+        (rome_id, "Italy Cultural Package", 5500),
+        (paris_id, "France Tour Deluxe", 6200),
+        (cai_id, "Egypt Nile Experience", 4800)
+    ]
+    cursor.executemany("INSERT INTO TravelPackages (dest_id, pkg_name, price) VALUES (?, ?, ?)", packages)
+
+    cursor.execute("SELECT service_id FROM Services LIMIT 10")
+    sids = [r[0] for r in cursor.fetchall()]
+    if len(sids) >= 10:
+        package_contents = [
+            (1, sids[5]), (1, sids[0]),
+            (2, sids[6]), (2, sids[1]),
+            (3, sids[7]), (3, sids[2]),
+            (4, sids[8]), (4, sids[3]),
+            (5, sids[9]), (5, sids[4]),
+            (6, sids[5]), (7, sids[6]),
+            (8, sids[7]), (9, sids[5]),
+            (10, sids[9])
+        ]
+        cursor.executemany("INSERT INTO PackageContents (pkg_id, service_id) VALUES (?, ?)", package_contents)
+
+#=============================================================================================
+
+    bookings = [
+        (1, 1, "2025-01-10", 0),
+        (2, 2, "2025-02-15", 0),
+        (3, 3, "2025-03-20", 0),
+        (4, 4, "2025-04-05", 0),
+        (1, 5, "2025-05-12", 0)
+    ]
+    cursor.executemany("INSERT INTO Bookings (cust_id, pkg_id, booking_date, is_paid) VALUES (?, ?, ?, ?)", bookings)
+
+#=============================================================================================
+
+    payments = [
+        (1, 5000), 
+        (2, 4000), 
+        (3, 4000), (4, 3000), (5, 9000)
+    ]
+    cursor.executemany("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", payments)
+
+    cursor.execute("INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (1, ?, 1, '2025-01-10', '2025-01-15')", (sids[5],))
+    cursor.execute("INSERT INTO Tickets (booking_id, seat_id, issue_date) VALUES (1, 1, '2025-01-10')")
+
+#=============================================================================================
+
+# Secondary indexes on every foreign key and on the columns the pages sort/filter by.
+# (name, table, columns) -- created by the "indexes" migration, listed on the Reports page.
+MANAGED_INDEXES = [
+    ("idx_bookings_cust", "Bookings", "cust_id"),
+    ("idx_bookings_pkg", "Bookings", "pkg_id"),
+    ("idx_bookings_date", "Bookings", "booking_date"),
+    ("idx_payments_booking", "Payments", "booking_id"),
+    ("idx_reservations_booking", "Reservations", "booking_id"),
+    ("idx_reservations_service", "Reservations", "service_id"),
+    ("idx_reservations_room", "Reservations", "room_id"),
+    ("idx_tickets_booking", "Tickets", "booking_id"),
+    ("idx_tickets_seat", "Tickets", "seat_id"),
+    ("idx_seats_flight", "Seats", "flight_id"),
+    ("idx_rooms_hotel", "Rooms", "hotel_id"),
+    ("idx_package_contents_pkg", "PackageContents", "pkg_id"),
+    ("idx_package_contents_service", "PackageContents", "service_id"),
+    ("idx_packages_dest", "TravelPackages", "dest_id"),
+    # sort keys offered by the paginated grids
+    ("idx_customers_name", "Customers", "name"),
+    ("idx_destinations_city", "Destinations", "city"),
+    ("idx_services_name", "Services", "service_name"),
+    ("idx_packages_name", "TravelPackages", "pkg_name"),
+    # case-insensitive prefix search (LIKE 'abc%') for the typeahead selectors
+    ("idx_customers_name_nocase", "Customers", "name COLLATE NOCASE"),
+    ("idx_services_name_nocase", "Services", "service_name COLLATE NOCASE"),
+    ("idx_packages_name_nocase", "TravelPackages", "pkg_name COLLATE NOCASE"),
+    ("idx_destinations_city_nocase", "Destinations", "city COLLATE NOCASE"),
+    # a customer's bookings with their paid totals, index-only
+    ("idx_bookings_cust_paid", "Bookings", "cust_id, total_paid"),
+]
+
+def migration_indexes(cursor):
+    """Create every managed index that doesn't exist yet (re-run whenever the list grows).
+    Indexes on columns a later migration adds are skipped until that migration runs."""
+    for name, table, columns in MANAGED_INDEXES:
+        column_names = [c.split()[0] for c in columns.split(",")]
+        if all(column_exists(cursor, table, c) for c in column_names):
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+    cursor.execute("ANALYZE")
+
+#=============================================================================================
+
+# Tables whose row count is kept in RowCounts by insert/delete triggers, so counts never scan.
+COUNTED_TABLES = ["Customers", "Destinations", "Services", "Hotels", "Flights", "Rooms", "Seats",
+                  "TravelPackages", "PackageContents", "Bookings", "Payments", "Reservations", "Tickets"]
+
+def migration_row_counters(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS RowCounts (
+        table_name TEXT PRIMARY KEY,
+        n INTEGER NOT NULL
+    )""")
+    for table in COUNTED_TABLES:
+        cursor.execute(f"INSERT OR REPLACE INTO RowCounts (table_name, n) SELECT ?, COUNT(*) FROM {table}", (table,))
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_count_{table}_ins AFTER INSERT ON {table} BEGIN
+            UPDATE RowCounts SET n = n + 1 WHERE table_name = '{table}';
+        END""")
+        cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS trg_count_{table}_del AFTER DELETE ON {table} BEGIN
+            UPDATE RowCounts SET n = n - 1 WHERE table_name = '{table}';
+        END""")
+
+def get_row_count(table):
+    res = run_query("SELECT n FROM RowCounts WHERE table_name=?", (table,))
+    return res[0][0] if res else 0
+
+# Running sums kept by triggers, like RowCounts; "revenue" is SUM(Payments.amount).
+def migration_running_totals(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS RunningTotals (
+        name TEXT PRIMARY KEY,
+        value REAL NOT NULL
+    )""")
+    cursor.execute("INSERT OR REPLACE INTO RunningTotals (name, value) SELECT 'revenue', COALESCE(SUM(amount), 0) FROM Payments")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_total_revenue_ins AFTER INSERT ON Payments BEGIN
+        UPDATE RunningTotals SET value = value + COALESCE(NEW.amount, 0) WHERE name = 'revenue';
+    END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_total_revenue_upd AFTER UPDATE OF amount ON Payments BEGIN
+        UPDATE RunningTotals SET value = value - COALESCE(OLD.amount, 0) + COALESCE(NEW.amount, 0) WHERE name = 'revenue';
+    END""")
+    cursor.execute("""CREATE TRIGGER IF NOT EXISTS trg_total_revenue_del AFTER DELETE ON Payments BEGIN
+        UPDATE RunningTotals SET value = value - COALESCE(OLD.amount, 0) WHERE name = 'revenue';
+    END""")
+
+def migration_revenue_rollups(cursor):
+    """Revenue rollup tables and their triggers, filled from the existing payments."""
+    for rollup in REVENUE_ROLLUPS:
+        cursor.execute(f"""CREATE TABLE IF NOT EXISTS {rollup['table']} (
+            {rollup['key']} {rollup['type']} PRIMARY KEY,
+            amount REAL NOT NULL,
+            payments INTEGER NOT NULL
+        )""")
+    for trigger_sql in revenue_rollup_triggers():
+        cursor.execute(trigger_sql)
+    rebuild_revenue_rollups(cursor)
+
+def migration_maintenance_runs(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS MaintenanceRuns (
+        job TEXT PRIMARY KEY,
+        started_at REAL,
+        finished_at REAL,
+        last_ms REAL,
+        runs INTEGER NOT NULL DEFAULT 0,
+        last_result TEXT
+    )""")
+
+# One row: what archive_bookings() moved to the archive so far, for totals over hot + archived.
+def migration_archive_state(cursor):
+    cursor.execute("""CREATE TABLE IF NOT EXISTS ArchiveState (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        bookings INTEGER NOT NULL DEFAULT 0,
+        payments INTEGER NOT NULL DEFAULT 0,
+        revenue REAL NOT NULL DEFAULT 0,
+        cutoff TEXT,
+        archived_at REAL
+    )""")
+    cursor.execute("INSERT OR IGNORE INTO ArchiveState (id) VALUES (1)")
+
+def migration_analytics_dirty(cursor):
+    """AnalyticsDirty and the triggers that fill it (see ANALYTICS_TABLES)."""
+    cursor.execute("""CREATE TABLE IF NOT EXISTS AnalyticsDirty (
+        tbl TEXT NOT NULL,
+        part INTEGER NOT NULL,
+        claimed INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (tbl, part)
+    ) WITHOUT ROWID""")
+    for trigger_sql in analytics_dirty_triggers():
+        cursor.execute(trigger_sql)
+
+def migration_package_pricing(cursor):
+    """Pricing rule columns on TravelPackages, the PackageQuotes cache and its triggers."""
+    for column, ddl in (("markup_pct", "REAL NOT NULL DEFAULT 0"), ("discount_pct", "REAL NOT NULL DEFAULT 0"),
+                        ("auto_price", "INTEGER NOT NULL DEFAULT 0")):
+        if not column_exists(cursor, "TravelPackages", column):
+            cursor.execute(f"ALTER TABLE TravelPackages ADD COLUMN {column} {ddl}")
+    cursor.execute("""CREATE TABLE IF NOT EXISTS PackageQuotes (
+        pkg_id INTEGER PRIMARY KEY,
+        contents_total REAL NOT NULL,
+        services INTEGER NOT NULL,
+        price REAL NOT NULL,
+        quoted_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (pkg_id) REFERENCES TravelPackages(pkg_id) ON DELETE CASCADE
+    )""")
+    for trigger_sql in PRICING_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+#=============================================================================================
+
+def migration_booking_ledger(cursor):
+    """Replace the payment status queue with ledger columns kept current by triggers."""
+    for trigger in ("trg_status_payment_ins", "trg_status_payment_upd", "trg_status_payment_del",
+                    "trg_status_booking_ins", "trg_status_booking_pkg", "trg_status_package_price"):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    cursor.execute("DROP TABLE IF EXISTS PaymentStatusQueue")
+
+    if not column_exists(cursor, "Bookings", "total_paid"):
+        cursor.execute("ALTER TABLE Bookings ADD COLUMN total_paid REAL NOT NULL DEFAULT 0")
+    if not column_exists(cursor, "Bookings", "balance_due"):
+        cursor.execute("ALTER TABLE Bookings ADD COLUMN balance_due REAL NOT NULL DEFAULT 0")
+    for trigger_sql in LEDGER_TRIGGERS:
+        cursor.execute(trigger_sql)
+
+    reconcile_payment_statuses(cursor.connection)
+    migration_indexes(cursor)
+
+#=============================================================================================
+
+def migration_reservation_spans(cursor):
+    """Interval index over room reservations (see RESERVATION_SPAN_TRIGGERS). Skipped when this
+    SQLite build has no R*Tree module; the availability queries then read Reservations directly."""
+    try:
+        cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS ReservationSpans USING rtree_i32({RESERVATION_SPAN_COLUMNS})")
+    except sqlite3.OperationalError:
+        return
+    for trigger_sql in RESERVATION_SPAN_TRIGGERS:
+        cursor.execute(trigger_sql)
+    cursor.execute("DELETE FROM ReservationSpans")
+    cursor.execute(RESERVATION_SPAN_INSERT_SQL.format(row="res", source="Reservations res, Rooms rm"))
+
+def migration_search_index(cursor):
+    """FTS5 search tables over the SEARCH_INDEXES columns, their sync triggers and a first
+    build. Skipped when this SQLite build has no FTS5; the typeahead then uses LIKE prefixes."""
+    for fts, spec in SEARCH_INDEXES.items():
+        try:
+            cursor.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5({', '.join(spec['columns'])},
+                content='{spec['table']}', content_rowid='{spec['key']}', prefix='1 2 3',
+                tokenize='unicode61 remove_diacritics 2')""")
+        except sqlite3.OperationalError:
+            return
+        for trigger_sql in search_index_triggers(fts, spec):
+            cursor.execute(trigger_sql)
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+
+def migration_allocation_guards(cursor):
+    """(Re)create the allocation guard triggers. They name their index (INDEXED BY): trigger
+    plans are fixed when compiled, and statistics from a near-empty table would pick a scan."""
+    for trigger_sql in ALLOCATION_TRIGGERS:
+        cursor.execute(f"DROP TRIGGER IF EXISTS {trigger_sql.split()[5]}")
+        cursor.execute(trigger_sql)
+
+#=============================================================================================
+
+def index_status():
+    """Managed indexes and whether each one exists in the database."""
+    existing = {r[0] for r in run_query("SELECT name FROM sqlite_master WHERE type='index'")}
+    return [(name, table, columns, name in existing) for name, table, columns in MANAGED_INDEXES]
+
+#=============================================================================================
+
+# Ordered schema history. PRAGMA user_version stores the last applied version; append new
+# steps at the end and never renumber. Every step must be safe to re-run on a database
+# that already has its changes (older databases were created without a version number).
+MIGRATIONS = [
+    (1, "base schema", migration_base_schema),
+    (2, "Bookings.is_paid", migration_booking_is_paid),
+    (3, "Reservations.check_out", migration_reservation_check_out),
+    (4, "payment status queue", migration_payment_status_queue),
+    (5, "sample data", migration_seed_sample_data),
+    (6, "indexes", migration_indexes),
+    (7, "row counters", migration_row_counters),
+    (8, "grid sort indexes", migration_indexes),
+    (9, "typeahead indexes", migration_indexes),
+    (10, "booking ledger", migration_booking_ledger),
+    (11, "reservation interval index", migration_reservation_spans),
+    (12, "allocation guards", migration_allocation_guards),
+    (13, "indexed allocation guards", migration_allocation_guards),
+    (14, "running totals", migration_running_totals),
+    (15, "package pricing", migration_package_pricing),
+    (16, "full-text search index", migration_search_index),
+    (17, "revenue rollups", migration_revenue_rollups),
+    (18, "maintenance runs", migration_maintenance_runs),
+    (19, "archive state", migration_archive_state),
+    (20, "analytics change tracking", migration_analytics_dirty),
+    (21, "destination typeahead index", migration_indexes),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+#=============================================================================================
+
+def migrate(conn):
+    """Apply pending migrations, each in its own write transaction. Returns the names applied."""
+    applied = []
+    for version, name, step in MIGRATIONS:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # re-check under the write lock: another process may have migrated meanwhile
+            if conn.execute("PRAGMA user_version").fetchone()[0] < version:
+                step(conn.cursor())
+                conn.execute(f"PRAGMA user_version = {version}")
+                applied.append(name)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return applied
+
+@process_resource
+def ensure_schema(db_file):
+    """Run migrations (and bring the archive tables in line) once per server process and
+    database file; warm reruns skip schema work."""
+    with pool_for(db_file).connection() as conn:
+        applied = migrate(conn)
+        ensure_archive(conn)
+        return applied
+
+#=============================================================================================
+
+# Hot/cold archive. Completed bookings older than a cutoff move, with their payments,
+# reservations and tickets, to a second database file that every connection attaches as
+# `archive` (archive_file_for). The live tables, and with them the pages, cascades, ledger,
+# rollups and counters, then only cover the hot set; historical reports read the TEMP history
+# views, which add the archived rows. All four tables have AUTOINCREMENT keys, so an id the
+# database assigns is never reused; writers that choose ids themselves start above
+# next_free_id() (generate_data) or reject archived ids (bulk_io), so a hot row never collides
+# with an archived one.
+ARCHIVE_AFTER_DAYS = 365      # default cutoff: bookings made more than this many days ago
+ARCHIVE_BATCH = 2000          # booking ids in the first archive batch; adapted to the lock budget
+
+# hot table: (primary key, history view, archive index columns)
+ARCHIVED_TABLES = {
+    "Bookings": ("booking_id", "BookingHistory", ["booking_date", "cust_id"]),
+    "Payments": ("payment_id", "PaymentHistory", ["booking_id"]),
+    "Reservations": ("res_id", "ReservationHistory", ["booking_id"]),
+    "Tickets": ("ticket_id", "TicketHistory", ["booking_id"]),
+}
+
+def archive_file_for(db_file):
+    """travel.db -> travel_archive.db, in the same directory."""
+    path = pathlib.Path(db_file)
+    return str(path.with_name(f"{path.stem}_archive{path.suffix}"))
+
+def attach_archive(conn, db_file, readonly=False):
+    """Attach the archive database as `archive` and create the connection's history views. A
+    read-only connection cannot create the file, so it only attaches one that exists."""
+    archive = pathlib.Path(archive_file_for(db_file))
+    if not readonly:
+        conn.execute("ATTACH DATABASE ? AS archive", (str(archive),))
+    elif archive.exists():
+        conn.execute("ATTACH DATABASE ? AS archive", (archive.resolve().as_uri() + "?mode=ro",))
+    if archive_attached(conn):
+        conn.execute("PRAGMA archive.synchronous = NORMAL;")
+    create_history_views(conn)
+
+def archive_attached(conn):
+    return any(r[1] == "archive" for r in conn.execute("PRAGMA database_list"))
+
+def next_free_id(conn, table, key):
+    """First id above every id `table` has used: its rows, its archived rows and its
+    AUTOINCREMENT high-water mark in sqlite_sequence."""
+    used = [f"(SELECT MAX({key}) FROM main.{table})", "(SELECT seq FROM main.sqlite_sequence WHERE name = ?)"]
+    if table in ARCHIVED_TABLES and archive_attached(conn):
+        used.append(f"(SELECT MAX({key}) FROM archive.{table})")
+    return conn.execute(f"SELECT MAX({', '.join(f'COALESCE({u}, 0)' for u in used)}) + 1", (table,)).fetchone()[0]
+
+def table_columns(conn, table, schema="main"):
+    """[(column, declared type)] of schema.table; empty when there is no such table."""
+    return [(r[1], r[2]) for r in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+
+def archive_schema_sql(conn):
+    """DDL that gives the archive a copy of every ARCHIVED_TABLES table, or adds what a later
+    migration or release added: same columns and key, no foreign keys (customers, packages,
+    rooms and seats stay hot), indexes for the history reads."""
+    ddl = []
+    for table, (key, _, indexed) in ARCHIVED_TABLES.items():
+        columns = table_columns(conn, table)
+        archived = dict(table_columns(conn, table, "archive"))
+        if not archived:
+            defs = ", ".join(f"{c} {t} PRIMARY KEY" if c == key else f"{c} {t}" for c, t in columns)
+            ddl.append(f"CREATE TABLE archive.{table} ({defs})")
+        else:
+            ddl += [f"ALTER TABLE archive.{table} ADD COLUMN {c} {t}" for c, t in columns if c not in archived]
+        indexes = {r[1] for r in conn.execute(f"PRAGMA archive.index_list({table})")}
+        ddl += [f"CREATE INDEX archive.idx_{table.lower()}_{c} ON {table} ({c})"
+                for c in indexed if f"idx_{table.lower()}_{c}" not in indexes]
+    return ddl
+
+def ensure_archive(conn):
+    """Bring the archive schema in line with the hot tables (ensure_schema runs it after the
+    migrations) and refresh this connection's history views."""
+    conn.execute("PRAGMA archive.journal_mode = WAL;")
+    if archive_schema_sql(conn):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql in archive_schema_sql(conn):   # re-check under the write lock
+                conn.execute(sql)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    create_history_views(conn)
+
+def create_history_views(conn):
+    """(Re)create the connection's TEMP history views, e.g. BookingHistory: the hot rows UNION
+    ALL the archived rows of bookings no longer hot. An archive run copies before it deletes,
+    so for a moment (or after a crash in between) a booking is in both; it counts once."""
+    attached = archive_attached(conn)
+    for table, (_, view, _) in ARCHIVED_TABLES.items():
+        columns = [c for c, _ in table_columns(conn, table)]
+        if not columns:    # new database, not migrated yet
+            continue
+        sql = f"SELECT {', '.join(columns)} FROM main.{table}"
+        archived = attached and {c for c, _ in table_columns(conn, table, "archive")}
+        if archived:
+            picked = ", ".join(c if c in archived else f"NULL AS {c}" for c in columns)
+            sql += f"""
+            UNION ALL
+            SELECT {picked} FROM archive.{table} a
+            WHERE NOT EXISTS (SELECT 1 FROM main.Bookings h WHERE h.booking_id = a.booking_id)"""
+        conn.execute(f"DROP VIEW IF EXISTS temp.{view}")
+        conn.execute(f"CREATE TEMP VIEW {view} AS {sql}")
+
+# Completed: fully paid, booked before the cutoff, and no stay ending on or after it. Flights
+# carry no date, so archiving a booking also frees its seats.
+ARCHIVE_CANDIDATES_SQL = """
+    SELECT b.booking_id FROM main.Bookings b
+    WHERE b.booking_id BETWEEN :first AND :last AND b.is_paid = 2 AND b.booking_date < :cutoff
+      AND NOT EXISTS (SELECT 1 FROM main.Reservations r
+                      WHERE r.booking_id = b.booking_id AND COALESCE(r.check_out, r.check_in) >= :cutoff)"""
+
+def archive_copy_sql(columns):
+    """Statements copying the candidate bookings and their rows into the archive, replacing any
+    copy an interrupted run left there. columns: {table: hot columns}."""
+    sql = [f"DELETE FROM archive.{table} WHERE booking_id IN ({ARCHIVE_CANDIDATES_SQL})"
+           for table in ARCHIVED_TABLES if table != "Bookings"]
+    for table, names in columns.items():
+        names = ", ".join(names)
+        sql.append(f"""INSERT OR REPLACE INTO archive.{table} ({names})
+                       SELECT {names} FROM main.{table} WHERE booking_id IN ({ARCHIVE_CANDIDATES_SQL})""")
+    return sql
+
+def archive_verified_sql(columns):
+    """The candidates whose archive copy is complete and identical, row for row and column for
+    column, so deleting them from the hot tables loses nothing."""
+    def same(table, row):
+        return " AND ".join(f"a.{c} IS {row}.{c}" for c in columns[table])
+    checks = [f"EXISTS (SELECT 1 FROM archive.Bookings a WHERE a.booking_id = b.booking_id AND {same('Bookings', 'b')})"]
+    for table, (key, _, _) in ARCHIVED_TABLES.items():
+        if table == "Bookings":
+            continue
+        checks.append(f"""(SELECT COUNT(*) FROM main.{table} WHERE booking_id = b.booking_id)
+                          = (SELECT COUNT(*) FROM archive.{table} WHERE booking_id = b.booking_id)""")
+        checks.append(f"""NOT EXISTS (SELECT 1 FROM main.{table} m WHERE m.booking_id = b.booking_id AND NOT EXISTS (
+                          SELECT 1 FROM archive.{table} a WHERE a.{key} = m.{key} AND {same(table, 'm')}))""")
+    return ARCHIVE_CANDIDATES_SQL + "\n      AND " + "\n      AND ".join(checks)
+
+def archive_range(write, params, copy_sql, verified_sql):
+    """Archive the completed bookings with ids in [params["first"], params["last"]] in two write
+    transactions: copy them to the archive, then delete from the hot tables the ones whose copy
+    is verified (cascades and triggers update the hot counters, ledger and rollups). The two
+    files commit separately, which the history views and the verification allow for: a booking
+    changed in between stays hot and is copied again next run.
+    Returns (bookings, payments, revenue, longest write in ms)."""
+    def copy(conn):
+        if not conn.execute(f"SELECT EXISTS ({ARCHIVE_CANDIDATES_SQL})", params).fetchone()[0]:
+            return False
+        for sql in copy_sql:
+            conn.execute(sql, params)
+        return True
+
+    def move(conn):
+        conn.execute("CREATE TEMP TABLE IF NOT EXISTS archive_batch (booking_id INTEGER PRIMARY KEY)")
+        conn.execute("DELETE FROM temp.archive_batch")
+        bookings = conn.execute(f"INSERT INTO temp.archive_batch {verified_sql}", params).rowcount
+        payments, revenue = conn.execute("""SELECT COUNT(*), COALESCE(SUM(amount), 0) FROM main.Payments
+                                            WHERE booking_id IN (SELECT booking_id FROM temp.archive_batch)""").fetchone()
+        conn.execute("DELETE FROM main.Bookings WHERE booking_id IN (SELECT booking_id FROM temp.archive_batch)")
+        conn.execute("""UPDATE ArchiveState SET bookings = bookings + ?, payments = payments + ?, revenue = revenue + ?,
+                        cutoff = ?, archived_at = ? WHERE id = 1""",
+                     (bookings, payments, revenue, params["cutoff"], time.time()))
+        return bookings, payments, revenue
+
+    copied, held_ms = write(copy)
+    if not copied:
+        return 0, 0, 0.0, held_ms
+    (bookings, payments, revenue), move_ms = write(move, "Bookings", "Payments", "Reservations", "Tickets", "ArchiveState")
+    return bookings, payments, revenue, max(held_ms, move_ms)
+
+def maintain_archive(write, cutoff=None):
+    """Move the completed bookings made before `cutoff` (default: ARCHIVE_AFTER_DAYS ago) to the
+    archive, over ranges of booking ids sized to the maintenance lock budget."""
+    cutoff = str(cutoff or date.today() - timedelta(days=ARCHIVE_AFTER_DAYS))
+    with get_pool().connection() as conn:
+        first, last_id = conn.execute("SELECT MIN(booking_id), MAX(booking_id) FROM Bookings").fetchone()
+        columns = {table: [c for c, _ in table_columns(conn, table)] for table in ARCHIVED_TABLES}
+    copy_sql, verified_sql = archive_copy_sql(columns), archive_verified_sql(columns)
+    totals, batch = [0, 0, 0.0], ARCHIVE_BATCH
+    while first is not None and first <= last_id:
+        last = first + batch - 1
+        *moved, held_ms = archive_range(write, {"first": first, "last": last, "cutoff": cutoff}, copy_sql, verified_sql)
+        totals = [t + m for t, m in zip(totals, moved)]
+        batch = fit_batch(batch, held_ms)
+        first = last + 1
+    return {"bookings_archived": totals[0], "payments_archived": totals[1],
+            "revenue_archived": round(totals[2], 2), "cutoff": cutoff}
+
+def archive_bookings(cutoff=None):
+    """Run maintain_archive() now, in this thread (scripts and benchmarks); the app runs it as
+    the "archive" maintenance job."""
+    return maintain_archive(write_timed, cutoff)
+
+def archive_status():
+    """ArchiveState as a dict, plus the archive file and its size in bytes."""
+    with get_pool().connection() as conn:
+        cur = conn.execute("SELECT bookings, payments, revenue, cutoff, archived_at FROM ArchiveState")
+        status = dict(zip([d[0] for d in cur.description], cur.fetchone()))
+    path = pathlib.Path(archive_file_for(DB_FILE))
+    return dict(status, file=str(path), file_bytes=path.stat().st_size if path.exists() else 0)
+
+#=============================================================================================
+
+def init_db():
+    """Bring the schema up to date (payment totals and statuses are kept current by triggers)."""
+    ensure_schema(DB_FILE)
+
+#=============================================================================================
+
+def sum_payments_for_booking(booking_id):
+    res = run_query("SELECT COALESCE(SUM(amount),0) FROM Payments WHERE booking_id=?", (booking_id,))
+    return res[0][0] if res else 0
+
+#=============================================================================================
+
+def get_package_price(pkg_id):
+    res = run_query("SELECT price FROM TravelPackages WHERE pkg_id=?", (pkg_id,))
+    return res[0][0] if res else 0
+
+#=============================================================================================
+
+# Migration 4 only; migration 10 replaced the queue with the booking ledger triggers below.
+PAYMENT_STATUS_TRIGGERS = [
+    """CREATE TRIGGER IF NOT EXISTS trg_status_payment_ins AFTER INSERT ON Payments BEGIN
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id) VALUES (NEW.booking_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_status_payment_upd AFTER UPDATE OF booking_id, amount ON Payments BEGIN
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id) VALUES (OLD.booking_id);
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id) VALUES (NEW.booking_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_status_payment_del AFTER DELETE ON Payments BEGIN
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id) VALUES (OLD.booking_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_status_booking_ins AFTER INSERT ON Bookings BEGIN
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id) VALUES (NEW.booking_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_status_booking_pkg AFTER UPDATE OF pkg_id ON Bookings BEGIN
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id) VALUES (NEW.booking_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_status_package_price AFTER UPDATE OF price ON TravelPackages BEGIN
+        INSERT OR IGNORE INTO PaymentStatusQueue (booking_id)
+            SELECT booking_id FROM Bookings WHERE pkg_id = NEW.pkg_id;
+    END""",
+]
+
+#=============================================================================================
+
+# Booking ledger: Bookings.total_paid, balance_due and is_paid (0 unpaid, 1 partial, 2 paid).
+# Payment changes refresh total_paid; a total_paid/pkg_id change (or a new booking) refreshes
+# balance_due and is_paid; a package price change refreshes every booking of that package.
+LEDGER_STATUS_SQL = """
+        UPDATE Bookings SET
+            balance_due = MAX(COALESCE((SELECT price FROM TravelPackages WHERE pkg_id = NEW.pkg_id), 0) - NEW.total_paid, 0),
+            is_paid = CASE WHEN NEW.total_paid <= 0 THEN 0
+                           WHEN NEW.total_paid < COALESCE((SELECT price FROM TravelPackages WHERE pkg_id = NEW.pkg_id), 0) THEN 1
+                           ELSE 2 END
+        WHERE booking_id = NEW.booking_id;"""
+
+LEDGER_TOTAL_SQL = """
+        UPDATE Bookings SET total_paid = (SELECT COALESCE(SUM(amount), 0) FROM Payments WHERE booking_id = {row}.booking_id)
+        WHERE booking_id = {row}.booking_id;"""
+
+LEDGER_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_payment_ins AFTER INSERT ON Payments BEGIN
+        {LEDGER_TOTAL_SQL.format(row="NEW")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_payment_upd AFTER UPDATE OF booking_id, amount ON Payments BEGIN
+        {LEDGER_TOTAL_SQL.format(row="OLD")}
+        {LEDGER_TOTAL_SQL.format(row="NEW")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_payment_del AFTER DELETE ON Payments BEGIN
+        {LEDGER_TOTAL_SQL.format(row="OLD")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_booking_ins AFTER INSERT ON Bookings BEGIN
+        {LEDGER_STATUS_SQL}
+    END""",
+    # skipped when the same statement already set the derived columns (ledger rebuilds)
+    f"""CREATE TRIGGER IF NOT EXISTS trg_ledger_booking_upd AFTER UPDATE OF total_paid, pkg_id ON Bookings
+        WHEN NEW.balance_due IS OLD.balance_due AND NEW.is_paid IS OLD.is_paid BEGIN
+        {LEDGER_STATUS_SQL}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_ledger_package_price AFTER UPDATE OF price ON TravelPackages BEGIN
+        UPDATE Bookings SET
+            balance_due = MAX(COALESCE(NEW.price, 0) - total_paid, 0),
+            is_paid = CASE WHEN total_paid <= 0 THEN 0
+                           WHEN total_paid < COALESCE(NEW.price, 0) THEN 1
+                           ELSE 2 END
+        WHERE pkg_id = NEW.pkg_id;
+    END""",
+]
+
+#=============================================================================================
+
+def reconcile_payment_statuses(conn, scope=None, params=()):
+    """Rebuild the booking ledger in one set-based UPDATE from summed payments vs package price.
+    The triggers keep it current, so this is for backfills and repair only. `scope` is an optional
+    sub-select of booking_ids to limit the work to. Only rows that actually change are written."""
+    booking_filter = f"WHERE b.booking_id IN ({scope})" if scope else ""
+    payment_filter = f"WHERE booking_id IN ({scope})" if scope else ""
+    cur = conn.execute(f"""
+        UPDATE Bookings SET total_paid = s.total, balance_due = s.balance, is_paid = s.status
+        FROM (
+            SELECT b.booking_id,
+                   COALESCE(p.total, 0) AS total,
+                   MAX(COALESCE(tp.price, 0) - COALESCE(p.total, 0), 0) AS balance,
+                   CASE WHEN COALESCE(p.total, 0) <= 0 THEN 0
+                        WHEN COALESCE(p.total, 0) < COALESCE(tp.price, 0) THEN 1
+                        ELSE 2 END AS status
+            FROM Bookings b
+            LEFT JOIN (SELECT booking_id, SUM(amount) AS total FROM Payments {payment_filter} GROUP BY booking_id) p
+                   ON p.booking_id = b.booking_id
+            LEFT JOIN TravelPackages tp ON tp.pkg_id = b.pkg_id
+            {booking_filter}
+        ) AS s
+        WHERE Bookings.booking_id = s.booking_id
+          AND (Bookings.total_paid IS NOT s.total OR Bookings.balance_due IS NOT s.balance
+               OR Bookings.is_paid IS NOT s.status)
+    """, tuple(params) * 2 if scope else ())
+    return cur.rowcount
+
+#=============================================================================================
+
+def update_booking_payment_status(booking_id):
+    """Recompute one booking's ledger columns (payments vs package price)."""
+    write_transaction(lambda conn: reconcile_payment_statuses(conn, "?", (booking_id,)), "Bookings")
+
+#=============================================================================================
+
+def update_all_booking_payment_statuses():
+    """Rebuild every booking's ledger columns; returns how many rows were out of date."""
+    return write_transaction(reconcile_payment_statuses, "Bookings")
+
+#=============================================================================================
+
+# Package pricing: a package's quote is the sum of its services' base prices, plus markup_pct,
+# minus discount_pct, rounded to cents. PackageQuotes caches one quote per package; a row is
+# deleted (invalidated) by the triggers below whenever a service price, the package contents or
+# the package's rules change, and recomputed on the next quote_package()/reprice_catalog().
+# Packages with auto_price = 1 have TravelPackages.price kept equal to their quote by the same
+# triggers, so the booking ledger always compares payments against the current price.
+PACKAGE_QUOTE_SQL = """
+    SELECT tp.pkg_id, COALESCE(SUM(s.base_price), 0) AS contents_total, COUNT(s.service_id) AS services,
+           ROUND(COALESCE(SUM(s.base_price), 0) * (1 + tp.markup_pct / 100.0) * (1 - tp.discount_pct / 100.0), 2) AS price
+    FROM TravelPackages tp
+    LEFT JOIN PackageContents pc ON pc.pkg_id = tp.pkg_id
+    LEFT JOIN Services s ON s.service_id = pc.service_id
+    {where}
+    GROUP BY tp.pkg_id
+"""
+
+def package_price_sql(pkg):
+    """Scalar subquery: the computed price of package `pkg` (an SQL expression)."""
+    return f"""(SELECT ROUND(COALESCE(SUM(s.base_price), 0) * (1 + tp.markup_pct / 100.0) * (1 - tp.discount_pct / 100.0), 2)
+               FROM TravelPackages tp
+               LEFT JOIN PackageContents pc ON pc.pkg_id = tp.pkg_id
+               LEFT JOIN Services s ON s.service_id = pc.service_id
+               WHERE tp.pkg_id = {pkg})"""
+
+def pricing_refresh_sql(packages):
+    """Invalidate the quotes of `packages` (an SQL list/sub-select) and re-price the auto-priced ones."""
+    return f"""DELETE FROM PackageQuotes WHERE pkg_id IN ({packages});
+        UPDATE TravelPackages SET price = {package_price_sql("TravelPackages.pkg_id")}
+        WHERE auto_price = 1 AND pkg_id IN ({packages})
+          AND price IS NOT {package_price_sql("TravelPackages.pkg_id")};"""
+
+PRICING_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pricing_service_price AFTER UPDATE OF base_price ON Services
+        WHEN NEW.base_price IS NOT OLD.base_price BEGIN
+        {pricing_refresh_sql("SELECT pkg_id FROM PackageContents WHERE service_id = NEW.service_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pricing_content_ins AFTER INSERT ON PackageContents BEGIN
+        {pricing_refresh_sql("NEW.pkg_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pricing_content_del AFTER DELETE ON PackageContents BEGIN
+        {pricing_refresh_sql("OLD.pkg_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pricing_content_upd AFTER UPDATE OF pkg_id, service_id ON PackageContents BEGIN
+        {pricing_refresh_sql("OLD.pkg_id, NEW.pkg_id")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_pricing_rules AFTER UPDATE OF markup_pct, discount_pct, auto_price ON TravelPackages BEGIN
+        {pricing_refresh_sql("NEW.pkg_id")}
+    END""",
+]
+
+def quote_package(pkg_id, store=True):
+    """{"pkg_id", "contents_total", "services", "price", "quoted_at", "cached"} for one package
+    (None if it doesn't exist), served from PackageQuotes when the cached quote is still valid.
+    With store=False a missing quote is computed without a write transaction and not cached
+    (quoted_at None), for pages that show a quote on every render."""
+    row = run_query("SELECT pkg_id, contents_total, services, price, quoted_at FROM PackageQuotes WHERE pkg_id=?", (pkg_id,))
+    cached = bool(row)
+    if not cached and not store:
+        row = [(*r, None) for r in run_query(PACKAGE_QUOTE_SQL.format(where="WHERE tp.pkg_id = ?"), (pkg_id,))]
+    elif not cached:
+        def work(conn):
+            conn.execute("INSERT OR REPLACE INTO PackageQuotes (pkg_id, contents_total, services, price) "
+                         "SELECT pkg_id, contents_total, services, price FROM (" + PACKAGE_QUOTE_SQL.format(where="WHERE tp.pkg_id = ?") + ")",
+                         (pkg_id,))
+            return conn.execute("SELECT pkg_id, contents_total, services, price, quoted_at FROM PackageQuotes WHERE pkg_id=?",
+                                (pkg_id,)).fetchall()
+        row = write_transaction(work, "PackageQuotes")
+    if not row:
+        return None
+    return dict(zip(("pkg_id", "contents_total", "services", "price", "quoted_at"), row[0]), cached=cached)
+
+def reprice_catalog(stale_only=False, apply_to_auto=True):
+    """Quote every package in one set-based pass (only those without a valid quote when
+    stale_only) and, with apply_to_auto, set the price of every auto-priced package whose price
+    differs from its quote -- e.g. after a bulk load that bypassed the triggers.
+    Returns {"quoted", "repriced"}."""
+    def work(conn):
+        where = "WHERE tp.pkg_id NOT IN (SELECT pkg_id FROM PackageQuotes)" if stale_only else ""
+        quoted = conn.execute("INSERT OR REPLACE INTO PackageQuotes (pkg_id, contents_total, services, price) "
+                              "SELECT pkg_id, contents_total, services, price FROM (" + PACKAGE_QUOTE_SQL.format(where=where) + ")").rowcount
+        repriced = 0
+        if apply_to_auto:
+            repriced = conn.execute("""UPDATE TravelPackages SET price = q.price FROM PackageQuotes q
+                                       WHERE q.pkg_id = TravelPackages.pkg_id AND TravelPackages.auto_price = 1
+                                         AND TravelPackages.price IS NOT q.price""").rowcount
+        return {"quoted": quoted, "repriced": repriced}
+    return write_transaction(work, "PackageQuotes", "TravelPackages")
+
+def set_package_pricing(pkg_id, auto_price=None, markup_pct=None, discount_pct=None):
+    """Change a package's pricing rules; switching auto_price on re-prices it at once (trigger)."""
+    return update_fields("TravelPackages", "pkg_id", pkg_id, markup_pct=markup_pct, discount_pct=discount_pct,
+                         auto_price=None if auto_price is None else int(auto_price))
+
+#=============================================================================================
+
+# Revenue rollups: amount and number of payments per day, month, package, destination and
+# customer, kept current by triggers, over active bookings only (archiving a booking removes
+# its payments from them). A payment counts under its own date and under the package/customer
+# of its booking as they are now; changing a booking's package or customer, or a package's
+# destination, moves its revenue along. Rows whose payment count drops to zero
+# are removed. "payment" / "booking" are the bucket of a Payments / Bookings row ({row} = NEW
+# or OLD; booking None: not tied to the booking); "rebuild" recomputes the whole table and may
+# read the rollups listed before it.
+REVENUE_ROLLUPS = [
+    {"table": "RevenueByDay", "key": "day", "type": "TEXT",
+     "payment": "COALESCE(date({row}.payment_date), '')", "booking": None,
+     "rebuild": "SELECT COALESCE(date(payment_date), ''), SUM(COALESCE(amount, 0)), COUNT(*) FROM Payments GROUP BY 1"},
+    {"table": "RevenueByMonth", "key": "month", "type": "TEXT",
+     "payment": "COALESCE(strftime('%Y-%m', {row}.payment_date), '')", "booking": None,
+     "rebuild": "SELECT substr(day, 1, 7), SUM(amount), SUM(payments) FROM RevenueByDay GROUP BY 1"},
+    {"table": "RevenueByPackage", "key": "pkg_id", "type": "INTEGER",
+     "payment": "(SELECT pkg_id FROM Bookings WHERE booking_id = {row}.booking_id)", "booking": "{row}.pkg_id",
+     "rebuild": """SELECT b.pkg_id, SUM(COALESCE(p.amount, 0)), COUNT(*) FROM Payments p
+                   JOIN Bookings b ON b.booking_id = p.booking_id WHERE b.pkg_id IS NOT NULL GROUP BY b.pkg_id"""},
+    {"table": "RevenueByDestination", "key": "dest_id", "type": "INTEGER",
+     "payment": """(SELECT tp.dest_id FROM Bookings b JOIN TravelPackages tp ON tp.pkg_id = b.pkg_id
+                    WHERE b.booking_id = {row}.booking_id)""",
+     "booking": "(SELECT dest_id FROM TravelPackages WHERE pkg_id = {row}.pkg_id)",
+     "rebuild": """SELECT tp.dest_id, SUM(r.amount), SUM(r.payments) FROM RevenueByPackage r
+                   JOIN TravelPackages tp ON tp.pkg_id = r.pkg_id WHERE tp.dest_id IS NOT NULL GROUP BY tp.dest_id"""},
+    {"table": "RevenueByCustomer", "key": "cust_id", "type": "INTEGER",
+     "payment": "(SELECT cust_id FROM Bookings WHERE booking_id = {row}.booking_id)", "booking": "{row}.cust_id",
+     "rebuild": """SELECT b.cust_id, SUM(COALESCE(p.amount, 0)), COUNT(*) FROM Payments p
+                   JOIN Bookings b ON b.booking_id = p.booking_id WHERE b.cust_id IS NOT NULL GROUP BY b.cust_id"""},
+]
+
+def rollup_add_sql(rollup, bucket, amount, payments):
+    return f"""
+        INSERT INTO {rollup["table"]} ({rollup["key"]}, amount, payments)
+            SELECT bucket, {amount}, {payments} FROM (SELECT {bucket} AS bucket) WHERE bucket IS NOT NULL
+            ON CONFLICT ({rollup["key"]}) DO UPDATE SET amount = amount + excluded.amount,
+                                                     payments = payments + excluded.payments;"""
+
+def rollup_subtract_sql(rollup, bucket, amount, payments):
+    # plain UPDATE: the bucket's entity may be going away in the same statement (cascades)
+    return f"""
+        UPDATE {rollup["table"]} SET amount = amount - {amount}, payments = payments - {payments}
+            WHERE {rollup["key"]} = {bucket};
+        DELETE FROM {rollup["table"]} WHERE {rollup["key"]} = {bucket} AND payments <= 0;"""
+
+def revenue_rollup_triggers():
+    payment = {row: "".join(sql(r, r["payment"].format(row=row), f"COALESCE({row}.amount, 0)", 1)
+                            for r in REVENUE_ROLLUPS)
+               for row, sql in (("NEW", rollup_add_sql), ("OLD", rollup_subtract_sql))}
+    booking_total = "(SELECT COALESCE(SUM(amount), 0) FROM Payments WHERE booking_id = {row}.booking_id)"
+    booking_count = "(SELECT COUNT(*) FROM Payments WHERE booking_id = {row}.booking_id)"
+    booking = {row: "".join(sql(r, r["booking"].format(row=row), booking_total.format(row=row), booking_count.format(row=row))
+                            for r in REVENUE_ROLLUPS if r["booking"])
+               for row, sql in (("NEW", rollup_add_sql), ("OLD", rollup_subtract_sql))}
+    destination = next(r for r in REVENUE_ROLLUPS if r["table"] == "RevenueByDestination")
+    package_total = "(SELECT {col} FROM RevenueByPackage WHERE pkg_id = NEW.pkg_id)"
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS trg_revenue_payment_ins AFTER INSERT ON Payments BEGIN{payment["NEW"]}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_revenue_payment_upd AFTER UPDATE OF amount, booking_id, payment_date ON Payments
+            BEGIN{payment["OLD"]}{payment["NEW"]}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_revenue_payment_del AFTER DELETE ON Payments BEGIN{payment["OLD"]}
+        END""",
+        # a deleted booking's payments are deleted by the cascade afterwards, when the booking
+        # can no longer be looked up, so the booking-level buckets are settled before
+        f"""CREATE TRIGGER IF NOT EXISTS trg_revenue_booking_del BEFORE DELETE ON Bookings
+            WHEN EXISTS (SELECT 1 FROM Payments WHERE booking_id = OLD.booking_id) BEGIN{booking["OLD"]}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_revenue_booking_upd AFTER UPDATE OF pkg_id, cust_id ON Bookings
+            WHEN (NEW.pkg_id IS NOT OLD.pkg_id OR NEW.cust_id IS NOT OLD.cust_id)
+             AND EXISTS (SELECT 1 FROM Payments WHERE booking_id = NEW.booking_id) BEGIN{booking["OLD"]}{booking["NEW"]}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_revenue_package_dest AFTER UPDATE OF dest_id ON TravelPackages
+            WHEN NEW.dest_id IS NOT OLD.dest_id AND EXISTS (SELECT 1 FROM RevenueByPackage WHERE pkg_id = NEW.pkg_id) BEGIN
+            {rollup_subtract_sql(destination, "OLD.dest_id", package_total.format(col="amount"), package_total.format(col="payments"))}
+            {rollup_add_sql(destination, "NEW.dest_id", package_total.format(col="amount"), package_total.format(col="payments"))}
+        END""",
+    ]
+
+def rebuild_revenue_rollups(conn):
+    """Recompute every rollup table (and the running revenue total) from Payments in set-based
+    passes, for backfills and repair; returns the rows written."""
+    written = 0
+    for rollup in REVENUE_ROLLUPS:
+        conn.execute(f"DELETE FROM {rollup['table']}")
+        written += conn.execute(f"INSERT INTO {rollup['table']} ({rollup['key']}, amount, payments) {rollup['rebuild']}").rowcount
+    conn.execute("UPDATE RunningTotals SET value = (SELECT COALESCE(SUM(amount), 0) FROM Payments) WHERE name = 'revenue'")
+    return written
+
+def refresh_revenue_rollups():
+    """rebuild_revenue_rollups() in one write transaction; returns the rows written."""
+    return write_transaction(rebuild_revenue_rollups, *(r["table"] for r in REVENUE_ROLLUPS), "RunningTotals")
+
+REVENUE_SERIES_SQL = {
+    "month": "SELECT month AS period, amount, payments FROM RevenueByMonth WHERE month >= ? ORDER BY month",
+    "day": "SELECT day AS period, amount, payments FROM RevenueByDay WHERE day >= ? ORDER BY day",
+}
+
+def revenue_series(grain="month", since=""):
+    """DataFrame of period/amount/payments per month or day from `since` (a 'YYYY-MM' or
+    'YYYY-MM-DD' prefix), read from the rollups only; undated payments and archived bookings'
+    payments are left out."""
+    return get_dataframe(REVENUE_SERIES_SQL[grain], (max(since, "0"),))   # '' (undated) < '0'
+
+#=============================================================================================
+
+# Background maintenance: a daemon thread per process runs each job of MAINTENANCE_JOBS once its
+# interval has passed. MaintenanceRuns records every job's last start in the database, so all
+# processes (app servers, maintenance.py) share one schedule: a process claims a due job in a
+# one-row write transaction before running it. Jobs split their writes into transactions that
+# hold the write lock for about MAINTENANCE_LOCK_BUDGET_MS at most, and pause between them so
+# interactive bookings waiting for the lock get it in between.
+MAINTENANCE_TICK_SECONDS = 1.0
+MAINTENANCE_LOCK_BUDGET_MS = 50
+MAINTENANCE_PAUSE_MS = 20
+MAINTENANCE_LEDGER_BATCH = 10000     # booking ids in the first ledger batch; adapted to the budget
+MAINTENANCE_ROLLUP_BATCH = 5000      # drifted rollup rows corrected per transaction
+MAINTENANCE_ANALYSIS_LIMIT = 1000    # rows ANALYZE samples per index
+MAINTENANCE_STATS_DRIFT = 0.25       # re-analyze a table once its row count moved this much
+MAINTENANCE_VACUUM_PAGES = 200       # free pages released per transaction
+
+maintenance_logger = logging.getLogger("travel_core.maintenance")
+
+def fit_batch(batch, held_ms, smallest=100):
+    """Next batch size: halved after overrunning the lock budget, doubled while well under it."""
+    if held_ms > MAINTENANCE_LOCK_BUDGET_MS:
+        return max(batch // 2, smallest)
+    if held_ms < MAINTENANCE_LOCK_BUDGET_MS / 4:
+        return batch * 2
+    return batch
+
+def write_timed(work, *tables):
+    """write_transaction() returning (result, ms the work held the write lock): the `write` a
+    maintenance job is given, for running one outside the scheduler."""
+    def timed(conn):
+        start = time.perf_counter()
+        return work(conn), (time.perf_counter() - start) * 1000
+    return write_transaction(timed, *tables)
+
+def maintain_ledger(write):
+    """Booking ledger repair (the triggers keep it current): reconcile_payment_statuses() over
+    ranges of booking ids."""
+    with get_pool().connection() as conn:
+        first, last_id = conn.execute("SELECT MIN(booking_id), MAX(booking_id) FROM Bookings").fetchone()
+    fixed, batch = 0, MAINTENANCE_LEDGER_BATCH
+    while first is not None and first <= last_id:
+        last = first + batch - 1
+        changed, held_ms = write(lambda conn: reconcile_payment_statuses(
+            conn, "SELECT booking_id FROM Bookings WHERE booking_id BETWEEN ? AND ?", (first, last)))
+        fixed += changed
+        batch = fit_batch(batch, held_ms)
+        first = last + 1
+    if fixed:
+        note_write("Bookings")
+    return {"bookings_fixed": fixed}
+
+def revenue_rollup_drift(conn):
+    """{rollup table: [(amount delta, payments delta, key)]} that would make each rollup equal to
+    a recomputation from Payments, plus "revenue": the running total's delta. Read in one
+    snapshot without the write lock: the recomputed rollups go to TEMP tables, which shadow the
+    real ones for the rebuild queries that read an earlier rollup."""
+    drift = {}
+    conn.execute("BEGIN")
+    try:
+        for rollup in REVENUE_ROLLUPS:
+            table, key = rollup["table"], rollup["key"]
+            conn.execute(f"CREATE TEMP TABLE {table} ({key} {rollup['type']} PRIMARY KEY, amount REAL, payments INTEGER)")
+            conn.execute(f"INSERT INTO temp.{table} ({key}, amount, payments) {rollup['rebuild']}")
+            drift[table] = conn.execute(f"""
+                SELECT SUM(amount), SUM(payments), bucket FROM (
+                    SELECT {key} AS bucket, amount, payments FROM temp.{table}
+                    UNION ALL
+                    SELECT {key}, -amount, -payments FROM main.{table})
+                GROUP BY bucket HAVING ABS(SUM(amount)) > 0.005 OR SUM(payments) <> 0""").fetchall()
+        drift["revenue"] = conn.execute("""SELECT (SELECT COALESCE(SUM(amount), 0) FROM Payments) - value
+                                           FROM RunningTotals WHERE name = 'revenue'""").fetchone()[0]
+    finally:
+        for rollup in REVENUE_ROLLUPS:
+            conn.execute(f"DROP TABLE IF EXISTS temp.{rollup['table']}")
+        conn.commit()
+    return drift
+
+def maintain_rollups(write):
+    """Revenue rollup repair: compare with a recomputation outside the write lock, then add the
+    differences. Trigger updates made meanwhile change rollup and recomputation alike, so the
+    differences stay right however long the comparison took."""
+    with get_pool().connection() as conn:
+        drift = revenue_rollup_drift(conn)
+    fixed = 0
+    for rollup in REVENUE_ROLLUPS:
+        rows = drift[rollup["table"]]
+        upsert = rollup_add_sql(rollup, "?", "?", "?")
+        for i in range(0, len(rows), MAINTENANCE_ROLLUP_BATCH):
+            chunk = rows[i:i + MAINTENANCE_ROLLUP_BATCH]
+            def work(conn):
+                conn.executemany(upsert, chunk)
+                conn.executemany(f"DELETE FROM {rollup['table']} WHERE {rollup['key']} = ? AND payments <= 0",
+                                 [(r[2],) for r in chunk])
+            write(work, rollup["table"])
+            fixed += len(chunk)
+    if abs(drift["revenue"] or 0) > 0.005:
+        write(lambda conn: conn.execute("UPDATE RunningTotals SET value = value + ? WHERE name = 'revenue'",
+                                        (drift["revenue"],)), "RunningTotals")
+        fixed += 1
+    return {"rows_fixed": fixed}
+
+def maintain_statistics(write):
+    """Sampled ANALYZE (MAINTENANCE_ANALYSIS_LIMIT) of every counted table whose row count moved
+    by MAINTENANCE_STATS_DRIFT since its statistics were gathered, one table per transaction."""
+    with get_pool().connection() as conn:
+        counts = dict(conn.execute("SELECT table_name, n FROM RowCounts"))
+        analyzed = {}
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'").fetchone():
+            analyzed = dict(conn.execute("SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 GROUP BY tbl"))
+    stale = [t for t in COUNTED_TABLES
+             if abs(counts.get(t, 0) - analyzed.get(t, 0)) > MAINTENANCE_STATS_DRIFT * analyzed.get(t, 0)]
+    for table in stale:
+        def work(conn):
+            conn.execute(f"PRAGMA analysis_limit = {MAINTENANCE_ANALYSIS_LIMIT}")
+            try:
+                conn.execute(f"ANALYZE {table}")
+            finally:
+                conn.execute("PRAGMA analysis_limit = 0")
+        write(work)
+    return {"analyzed": ", ".join(stale) or "-"}
+
+def maintain_checkpoint(write):
+    """PASSIVE WAL checkpoint: copies what it can into the database file without waiting for
+    (or blocking) readers and writers, so the WAL stops growing between automatic checkpoints."""
+    with get_pool().connection() as conn:
+        _, wal_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+    return {"wal_frames": wal_frames, "checkpointed": checkpointed}
+
+def maintain_vacuum(write):
+    """Hand free pages back to the file system, MAINTENANCE_VACUUM_PAGES per transaction. Needs
+    auto_vacuum = INCREMENTAL, which new databases get; an older file is converted once by
+    convert_to_incremental_vacuum()."""
+    with get_pool().connection() as conn:
+        mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    if mode != 2:
+        return {"skipped": "auto_vacuum is not INCREMENTAL (run: maintenance.py --once convert-vacuum)",
+                "free_pages": free}
+    released = 0
+    def work(conn):
+        for _ in range(MAINTENANCE_VACUUM_PAGES):
+            conn.execute("PRAGMA incremental_vacuum(1)")   # sqlite3 steps a PRAGMA once: one page per call
+        return conn.execute("PRAGMA freelist_count").fetchone()[0]
+    while free > 0:
+        left, _ = write(work)
+        if left >= free:
+            break
+        released, free = released + free - left, left
+    return {"pages_released": released}
+
+def convert_to_incremental_vacuum():
+    """Switch a database created before auto_vacuum = INCREMENTAL over to it, so the vacuum job
+    can work. Needs a full VACUUM, which rewrites the file and holds the write lock until done:
+    run it once, off-hours (`python maintenance.py --once convert-vacuum`), never per request.
+    Returns {"converted", "bytes_before", "bytes_after"}."""
+    path = pathlib.Path(DB_FILE)
+    conn = db_connect(DB_FILE)
+    try:
+        conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE)")   # so the sizes compare whole files
+        before = path.stat().st_size
+        if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == 2:
+            return {"converted": False, "bytes_before": before, "bytes_after": before}
+        conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM main")
+        conn.execute("PRAGMA main.wal_checkpoint(TRUNCATE)")
+    finally:
+        conn.close()
+    return {"converted": True, "bytes_before": before, "bytes_after": path.stat().st_size}
+
+def maintain_analytics(write):
+    """Refresh the Parquet snapshot of the analytics tables: claim the dirty parts, rewrite them
+    (and any part without a file) from one read snapshot, then drop the claims no write renewed
+    meanwhile. The export reads outside the write lock."""
+    if not parquet_available():
+        return {"skipped": "pyarrow is not installed"}
+    write(lambda conn: conn.execute("UPDATE AnalyticsDirty SET claimed = 1"), "AnalyticsDirty")
+    written = export_analytics_parts()
+    write(lambda conn: conn.execute("DELETE FROM AnalyticsDirty WHERE claimed = 1"), "AnalyticsDirty")
+    return written
+
+MAINTENANCE_JOBS = {
+    # name: (job, default interval in seconds)
+    "checkpoint": (maintain_checkpoint, 60),
+    "statistics": (maintain_statistics, 3600),
+    "vacuum": (maintain_vacuum, 3600),
+    "reconcile": (maintain_ledger, 6 * 3600),
+    "rollups": (maintain_rollups, 6 * 3600),
+    "archive": (maintain_archive, 0),     # off unless given an interval (see ARCHIVE_AFTER_DAYS)
+    "analytics": (maintain_analytics, 0), # off unless given an interval (needs pyarrow)
+}
+
+class MaintenanceStats:
+    """Per job in this process: runs, failures, run time, and the longest time one of its
+    transactions held the write lock."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def _job(self, job):
+        return self._stats.setdefault(job, {"runs": 0, "failures": 0, "last_ms": 0.0, "max_ms": 0.0,
+                                            "writes": 0, "max_lock_ms": 0.0, "last_result": None})
+
+    def record_write(self, job, held_ms):
+        with self._lock:
+            entry = self._job(job)
+            entry["writes"] += 1
+            entry["max_lock_ms"] = max(entry["max_lock_ms"], held_ms)
+
+    def record_run(self, job, elapsed_ms, result):
+        with self._lock:
+            entry = self._job(job)
+            entry["runs"] += 1
+            entry["failures"] += result.startswith("failed")
+            entry["last_ms"] = elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+            entry["last_result"] = result
+
+    def stats(self):
+        with self._lock:
+            return {job: dict(entry) for job, entry in self._stats.items()}
+
+class MaintenanceScheduler:
+    """Runs MAINTENANCE_JOBS on a daemon thread, each when due. `intervals` overrides a job's
+    interval in seconds; 0 or None switches the job off."""
+
+    def __init__(self, intervals=None):
+        self.intervals = {name: interval for name, (_, interval) in MAINTENANCE_JOBS.items()}
+        self.intervals.update(intervals or {})
+        self._stats = MaintenanceStats()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if not self.running():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name="travel-maintenance", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stats(self):
+        return self._stats.stats()
+
+    def due_jobs(self):
+        last = dict(run_query("SELECT job, started_at FROM MaintenanceRuns"))
+        now = time.time()
+        return [name for name, interval in self.intervals.items()
+                if interval and now - (last.get(name) or 0) >= interval]
+
+    def claim(self, name, interval):
+        """Record the job as started unless it started less than `interval` seconds ago (here
+        or in another process); True when this process may run it."""
+        now = time.time()
+        def work(conn):
+            return conn.execute("""INSERT INTO MaintenanceRuns (job, started_at) VALUES (?, ?)
+                                   ON CONFLICT (job) DO UPDATE SET started_at = excluded.started_at
+                                   WHERE started_at IS NULL OR started_at <= ?""",
+                                (name, now, now - interval)).rowcount
+        return write_transaction(work, "MaintenanceRuns") == 1
+
+    def _writer(self, job):
+        def write(work, *tables):
+            result, held_ms = write_timed(work, *tables)
+            self._stats.record_write(job, held_ms)
+            time.sleep(MAINTENANCE_PAUSE_MS / 1000)     # let waiting writers in
+            return result, held_ms
+        return write
+
+    def run_job(self, name, force=False):
+        """Run one job now; returns its result text, or None when it is not due (another process
+        ran it within its interval) and not forced."""
+        if not self.claim(name, 0 if force else self.intervals.get(name) or 0):
+            return None
+        start = time.perf_counter()
+        try:
+            outcome = MAINTENANCE_JOBS[name][0](self._writer(name))
+            result = ", ".join(f"{k}: {v}" for k, v in outcome.items())
+        except Exception as e:     # a failing job must not take the scheduler down
+            maintenance_logger.exception("maintenance job %s failed", name)
+            result = f"failed: {type(e).__name__}: {e}"
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self._stats.record_run(name, elapsed_ms, result)
+        write_transaction(lambda conn: conn.execute(
+            """UPDATE MaintenanceRuns SET finished_at = ?, last_ms = ?, runs = runs + 1, last_result = ?
+               WHERE job = ?""", (time.time(), elapsed_ms, result, name)), "MaintenanceRuns")
+        return result
+
+    def _loop(self):
+        while not self._stop.wait(MAINTENANCE_TICK_SECONDS):
+            try:
+                for name in self.due_jobs():
+                    if self._stop.is_set():
+                        break
+                    self.run_job(name)
+            except Exception:
+                maintenance_logger.exception("maintenance tick failed")
+
+@process_resource
+def maintenance_scheduler_for(db_file):
+    return MaintenanceScheduler()
+
+def get_maintenance_scheduler():
+    return maintenance_scheduler_for(DB_FILE)
+
+def start_maintenance(intervals=None):
+    """Start (once per process) the background maintenance thread for DB_FILE."""
+    scheduler = get_maintenance_scheduler()
+    scheduler.intervals.update(intervals or {})
+    return scheduler.start()
+
+#=============================================================================================
+
+# Room availability interval index: one R*Tree box per room reservation, hotel_id x stay days.
+# Stays are half-open day ranges [check_in, check_out); a missing or non-positive stay counts
+# as one night. Days are julian day numbers of the date part, so times of day are ignored.
+RESERVATION_SPAN_COLUMNS = "res_id, hotel_lo, hotel_hi, day_lo, day_hi, +room_id"
+SPAN_DAY = "CAST(julianday(date({})) AS INTEGER)"
+
+def span_start_sql(row):
+    return SPAN_DAY.format(f"{row}.check_in")
+
+def span_end_sql(row):
+    return f"MAX(COALESCE({SPAN_DAY.format(f'{row}.check_out')}, 0), {span_start_sql(row)} + 1)"
+
+def reservation_overlap_sql(room, stay_start, stay_end):
+    """Condition on Reservations `res`: a dated reservation of `room` overlapping [stay_start, stay_end)."""
+    return f"""res.room_id = {room} AND julianday(date(res.check_in)) IS NOT NULL
+            AND {span_start_sql("res")} < {stay_end} AND {span_end_sql("res")} > {stay_start}"""
+
+RESERVATION_SPAN_INSERT_SQL = f"""
+        INSERT INTO ReservationSpans (res_id, hotel_lo, hotel_hi, day_lo, day_hi, room_id)
+        SELECT {{row}}.res_id, rm.hotel_id, rm.hotel_id, {span_start_sql("{row}")}, {span_end_sql("{row}")},
+               {{row}}.room_id
+        FROM {{source}}
+        WHERE rm.room_id = {{row}}.room_id AND rm.hotel_id IS NOT NULL
+          AND julianday(date({{row}}.check_in)) IS NOT NULL;"""
+
+RESERVATION_SPAN_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_spans_reservation_ins AFTER INSERT ON Reservations
+        WHEN NEW.room_id IS NOT NULL BEGIN
+        {RESERVATION_SPAN_INSERT_SQL.format(row="NEW", source="Rooms rm")}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_spans_reservation_upd AFTER UPDATE OF room_id, check_in, check_out ON Reservations BEGIN
+        DELETE FROM ReservationSpans WHERE res_id = OLD.res_id;
+        {RESERVATION_SPAN_INSERT_SQL.format(row="NEW", source="Rooms rm")}
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_spans_reservation_del AFTER DELETE ON Reservations BEGIN
+        DELETE FROM ReservationSpans WHERE res_id = OLD.res_id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS trg_spans_room_hotel AFTER UPDATE OF hotel_id ON Rooms BEGIN
+        UPDATE ReservationSpans SET hotel_lo = NEW.hotel_id, hotel_hi = NEW.hotel_id
+        WHERE res_id IN (SELECT res_id FROM Reservations WHERE room_id = NEW.room_id);
+    END""",
+]
+
+# The requested stay as day numbers, by the same one-night rule as a stored one; its
+# parameters are check_out, check_in, check_in (stay_params).
+STAY_START_SQL = SPAN_DAY.format("?")
+STAY_END_SQL = f"MAX(COALESCE({SPAN_DAY.format('?')}, 0), {SPAN_DAY.format('?')} + 1)"
+
+def stay_params(check_in, check_out):
+    return (None if check_out is None else str(check_out), str(check_in), str(check_in))
+
+# A stored span overlaps the requested stay.
+SPAN_OVERLAP_SQL = f"""
+        s.day_lo < {STAY_END_SQL} AND s.day_hi > {STAY_START_SQL}"""
+
+# Rooms of one hotel with no reservation overlapping the stay. The hotel_id goes in three times:
+# Rooms filter, then both sides of the R*Tree hotel box.
+FREE_ROOMS_SQL = f"""
+    SELECT r.room_id, r.room_no FROM Rooms r
+    WHERE r.hotel_id = ?
+      AND r.room_id NOT IN (
+          SELECT s.room_id FROM ReservationSpans s
+          WHERE s.hotel_lo <= ? AND s.hotel_hi >= ? AND {SPAN_OVERLAP_SQL})
+    ORDER BY r.room_no
+"""
+
+# Fallback for SQLite builds without R*Tree: the same question asked of Reservations directly.
+FREE_ROOMS_NO_INDEX_SQL = f"""
+    SELECT r.room_id, r.room_no FROM Rooms r
+    WHERE r.hotel_id = ?
+      AND NOT EXISTS (
+          SELECT 1 FROM Reservations res INDEXED BY idx_reservations_room
+          WHERE {reservation_overlap_sql("r.room_id", STAY_START_SQL, STAY_END_SQL)})
+    ORDER BY r.room_no
+"""
+
+# Batch form: every hotel sold in a package to the destination, one R*Tree probe per hotel
+# (CROSS JOIN keeps the hotel list as the outer loop).
+DESTINATION_HOTELS_SQL = """
+        SELECT DISTINCT pc.service_id AS hotel_id
+        FROM TravelPackages tp
+        JOIN PackageContents pc ON pc.pkg_id = tp.pkg_id
+        JOIN Hotels h ON h.hotel_id = pc.service_id
+        WHERE tp.dest_id = ?"""
+
+FREE_ROOMS_FOR_DESTINATION_SQL = f"""
+    WITH dest_hotels AS ({DESTINATION_HOTELS_SQL}),
+    busy AS (
+        SELECT s.room_id FROM dest_hotels dh CROSS JOIN ReservationSpans s
+        WHERE s.hotel_lo <= dh.hotel_id AND s.hotel_hi >= dh.hotel_id AND {SPAN_OVERLAP_SQL})
+    SELECT r.hotel_id, sv.service_name AS hotel, r.room_id, r.room_no
+    FROM dest_hotels dh
+    JOIN Rooms r ON r.hotel_id = dh.hotel_id
+    JOIN Services sv ON sv.service_id = r.hotel_id
+    WHERE r.room_id NOT IN (SELECT room_id FROM busy)
+    ORDER BY sv.service_name, r.room_no
+"""
+
+FREE_ROOMS_FOR_DESTINATION_NO_INDEX_SQL = f"""
+    WITH dest_hotels AS ({DESTINATION_HOTELS_SQL})
+    SELECT r.hotel_id, sv.service_name AS hotel, r.room_id, r.room_no
+    FROM dest_hotels dh
+    JOIN Rooms r ON r.hotel_id = dh.hotel_id
+    JOIN Services sv ON sv.service_id = r.hotel_id
+    WHERE NOT EXISTS (
+          SELECT 1 FROM Reservations res INDEXED BY idx_reservations_room
+          WHERE {reservation_overlap_sql("r.room_id", STAY_START_SQL, STAY_END_SQL)})
+    ORDER BY sv.service_name, r.room_no
+"""
+
+# Tickets carry no travel date, so a ticketed seat is taken for the life of the flight.
+FREE_SEATS_SQL = """
+    SELECT st.seat_id, st.seat_no FROM Seats st
+    WHERE st.flight_id = ?
+      AND NOT EXISTS (SELECT 1 FROM Tickets t WHERE t.seat_id = st.seat_id)
+    ORDER BY st.seat_no
+"""
+
+INTERVAL_INDEX_SQL = "SELECT 1 FROM sqlite_master WHERE type='table' AND name='ReservationSpans'"
+
+def interval_index_available(conn=None):
+    """Whether ReservationSpans exists. Writers pass their `conn`: a second pooled checkout
+    inside a write transaction can wait for ever on a pool with nothing left to give."""
+    if conn is not None:
+        return conn.execute(INTERVAL_INDEX_SQL).fetchone() is not None
+    return bool(run_query(INTERVAL_INDEX_SQL))
+
+def free_rooms_query(hotel_id, check_in, check_out, conn=None):
+    """(sql, params) for the free-rooms question, with or without the interval index. Writers
+    pass their `conn` (see interval_index_available)."""
+    if interval_index_available(conn):
+        return FREE_ROOMS_SQL, (hotel_id, hotel_id, hotel_id, *stay_params(check_in, check_out))
+    return FREE_ROOMS_NO_INDEX_SQL, (hotel_id, *stay_params(check_in, check_out))
+
+def free_rooms(hotel_id, check_in, check_out):
+    """[(room_id, room_no)] of the hotel's rooms free for the whole stay [check_in, check_out)."""
+    return run_query(*free_rooms_query(hotel_id, check_in, check_out))
+
+def room_is_free(room_id, check_in, check_out):
+    hotel = run_query("SELECT hotel_id FROM Rooms WHERE room_id=?", (room_id,))
+    return bool(hotel) and any(r[0] == room_id for r in free_rooms(hotel[0][0], check_in, check_out))
+
+def free_rooms_for_destination(dest_id, check_in, check_out):
+    """Free rooms of every hotel in the destination's packages, as one DataFrame."""
+    if interval_index_available():
+        return get_dataframe(FREE_ROOMS_FOR_DESTINATION_SQL, (dest_id, *stay_params(check_in, check_out)))
+    return get_dataframe(FREE_ROOMS_FOR_DESTINATION_NO_INDEX_SQL, (dest_id, *stay_params(check_in, check_out)))
+
+def free_seats(flight_id):
+    """[(seat_id, seat_no)] of the flight's seats without a ticket."""
+    return run_query(FREE_SEATS_SQL, (flight_id,))
+
+#=============================================================================================
+
+# Allocation guards: the database itself refuses a second ticket for a seat and a room
+# reservation overlapping another one of the same room, whoever does the write.
+ROOM_TAKEN_SQL = f"""EXISTS (SELECT 1 FROM Reservations res INDEXED BY idx_reservations_room
+            WHERE {reservation_overlap_sql("NEW.room_id", span_start_sql("NEW"), span_end_sql("NEW"))}
+              AND res.res_id IS NOT NEW.res_id)"""
+
+SEAT_TAKEN_SQL = """EXISTS (SELECT 1 FROM Tickets t INDEXED BY idx_tickets_seat
+            WHERE t.seat_id = NEW.seat_id AND t.ticket_id IS NOT NEW.ticket_id)"""
+
+ALLOCATION_TRIGGERS = [
+    f"""CREATE TRIGGER IF NOT EXISTS trg_alloc_room_ins BEFORE INSERT ON Reservations
+        WHEN NEW.room_id IS NOT NULL AND {ROOM_TAKEN_SQL} BEGIN
+        SELECT RAISE(ABORT, 'room already reserved for these dates');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_alloc_room_upd BEFORE UPDATE OF room_id, check_in, check_out ON Reservations
+        WHEN NEW.room_id IS NOT NULL AND {ROOM_TAKEN_SQL} BEGIN
+        SELECT RAISE(ABORT, 'room already reserved for these dates');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_alloc_seat_ins BEFORE INSERT ON Tickets
+        WHEN NEW.seat_id IS NOT NULL AND {SEAT_TAKEN_SQL} BEGIN
+        SELECT RAISE(ABORT, 'seat already ticketed');
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS trg_alloc_seat_upd BEFORE UPDATE OF seat_id ON Tickets
+        WHEN NEW.seat_id IS NOT NULL AND {SEAT_TAKEN_SQL} BEGIN
+        SELECT RAISE(ABORT, 'seat already ticketed');
+    END""",
+]
+
+class AllocationError(Exception):
+    """No seat/room left, or the one asked for is already taken."""
+
+def reserve_room(conn, booking_id, hotel_id, check_in, check_out, room_id=None):
+    """Reserve `room_id`, or the first free room of the hotel, inside the caller's write
+    transaction. Returns (res_id, room_id)."""
+    if room_id is None:
+        row = conn.execute(*free_rooms_query(hotel_id, check_in, check_out, conn)).fetchone()
+        if row is None:
+            raise AllocationError(f"No free room in hotel {hotel_id} for {check_in} - {check_out}.")
+        room_id = row[0]
+    elif conn.execute("SELECT 1 FROM Rooms WHERE room_id=? AND hotel_id=?", (room_id, hotel_id)).fetchone() is None:
+        raise AllocationError(f"Room {room_id} does not belong to hotel {hotel_id}.")
+    try:
+        cur = conn.execute("INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (?, ?, ?, ?, ?)",
+                           (booking_id, hotel_id, room_id, str(check_in), None if check_out is None else str(check_out)))
+    except sqlite3.IntegrityError as e:
+        raise AllocationError(f"Room {room_id} is already reserved for {check_in} - {check_out}.") from e
+    return cur.lastrowid, room_id
+
+def reserve_seat(conn, booking_id, flight_id, seat_id=None, issue_date=None):
+    """Ticket `seat_id`, or the first free seat of the flight, inside the caller's write
+    transaction. Returns (ticket_id, seat_id)."""
+    if seat_id is None:
+        row = conn.execute(FREE_SEATS_SQL, (flight_id,)).fetchone()
+        if row is None:
+            raise AllocationError(f"No free seat on flight {flight_id}.")
+        seat_id = row[0]
+    elif conn.execute("SELECT 1 FROM Seats WHERE seat_id=? AND flight_id=?", (seat_id, flight_id)).fetchone() is None:
+        raise AllocationError(f"Seat {seat_id} is not on flight {flight_id}.")
+    try:
+        cur = conn.execute("INSERT INTO Tickets (booking_id, seat_id, issue_date) VALUES (?, ?, COALESCE(?, CURRENT_DATE))",
+                           (booking_id, seat_id, None if issue_date is None else str(issue_date)))
+    except sqlite3.IntegrityError as e:
+        raise AllocationError(f"Seat {seat_id} is already ticketed.") from e
+    return cur.lastrowid, seat_id
+
+def allocate_room(booking_id, hotel_id, check_in, check_out, room_id=None):
+    """Atomically reserve a room for a booking; raises AllocationError when none is free."""
+    return write_transaction(lambda conn: reserve_room(conn, booking_id, hotel_id, check_in, check_out, room_id),
+                             "Reservations")
+
+def allocate_seat(booking_id, flight_id, seat_id=None, issue_date=None):
+    """Atomically ticket a seat for a booking; raises AllocationError when none is free."""
+    return write_transaction(lambda conn: reserve_seat(conn, booking_id, flight_id, seat_id, issue_date),
+                             "Tickets")
+
+PACKAGE_SERVICES_SQL = """
+    SELECT pc.service_id, h.hotel_id IS NOT NULL, f.flight_id IS NOT NULL
+    FROM PackageContents pc
+    LEFT JOIN Hotels h ON h.hotel_id = pc.service_id
+    LEFT JOIN Flights f ON f.flight_id = pc.service_id
+    WHERE pc.pkg_id = ?
+    ORDER BY pc.id
+"""
+
+def create_booking(cust_id, pkg_id, booking_date, check_in=None, check_out=None):
+    """Insert a booking and, given travel dates, a room in every hotel and a seat on every flight
+    of the package -- all or nothing. Returns {"booking_id", "rooms", "seats"}."""
+    def work(conn):
+        booking_id = conn.execute("INSERT INTO Bookings (cust_id, pkg_id, booking_date) VALUES (?, ?, ?)",
+                                  (cust_id, pkg_id, str(booking_date))).lastrowid
+        rooms, seats = [], []
+        if check_in is not None:
+            for service_id, is_hotel, is_flight in conn.execute(PACKAGE_SERVICES_SQL, (pkg_id,)).fetchall():
+                if is_hotel:
+                    rooms.append(reserve_room(conn, booking_id, service_id, check_in, check_out)[1])
+                elif is_flight:
+                    seats.append(reserve_seat(conn, booking_id, service_id, issue_date=booking_date)[1])
+        return {"booking_id": booking_id, "rooms": rooms, "seats": seats}
+    return write_transaction(work, "Bookings", "Reservations", "Tickets")
+
+# every room of a hotel / seat of a flight, in the order the free-room/seat queries list them
+GROUP_UNITS_SQL = {
+    "hotel": "SELECT room_id FROM Rooms WHERE hotel_id = ? ORDER BY room_no",
+    "flight": "SELECT seat_id FROM Seats WHERE flight_id = ? ORDER BY seat_no",
+}
+
+def pick_block(units, free, n):
+    """n ids out of `free`: the first run of n neighbours in `units` order (a group seated
+    together), else the first n free ones; None when fewer than n are free."""
+    free = set(free)
+    if len(free) < n:
+        return None
+    start = 0
+    for i, unit in enumerate(units):
+        if unit not in free:
+            start = i + 1
+        elif i - start + 1 == n:
+            return units[start:i + 1]
+    return [unit for unit in units if unit in free][:n]
+
+def create_group_booking(cust_ids, pkg_id, booking_date, check_in=None, check_out=None, deposit=0):
+    """Book a package for a group in one write transaction, all or nothing: one booking per
+    traveller (cust_ids may repeat the lead customer), and given travel dates one room per
+    traveller in every hotel of the package and one seat each on every flight, as a block of
+    neighbouring rooms/seats where there is one. Every table is filled with one executemany; a
+    deposit > 0 is paid on every booking and the ledger follows by trigger.
+    Returns {"booking_ids", "rooms": {hotel_id: [room_id]}, "seats": {flight_id: [seat_id]}}."""
+    cust_ids = list(cust_ids)
+    if not cust_ids:
+        raise ValueError("A group booking needs at least one traveller.")
+
+    def allocate(conn, kind, service_id, free, booking_ids):
+        units = [r[0] for r in conn.execute(GROUP_UNITS_SQL[kind], (service_id,))]
+        block = pick_block(units, free, len(booking_ids))
+        if block is None:
+            raise AllocationError(f"Only {len(free)} free {'room' if kind == 'hotel' else 'seat'}(s) in "
+                                  f"{kind} {service_id}; the group needs {len(booking_ids)}.")
+        return block
+
+    def work(conn):
+        last = conn.execute("SELECT COALESCE(MAX(booking_id), 0) FROM Bookings").fetchone()[0]
+        conn.executemany("INSERT INTO Bookings (cust_id, pkg_id, booking_date) VALUES (?, ?, ?)",
+                         [(cust_id, pkg_id, str(booking_date)) for cust_id in cust_ids])
+        # new rowids follow the largest one, and BEGIN IMMEDIATE keeps every other writer out
+        booking_ids = [r[0] for r in conn.execute("SELECT booking_id FROM Bookings WHERE booking_id > ? ORDER BY booking_id",
+                                                  (last,))]
+        rooms, seats = {}, {}
+        if check_in is not None:
+            stay = (str(check_in), None if check_out is None else str(check_out))   # no check-out: one night
+            for service_id, is_hotel, is_flight in conn.execute(PACKAGE_SERVICES_SQL, (pkg_id,)).fetchall():
+                try:
+                    if is_hotel:
+                        free = [r[0] for r in conn.execute(*free_rooms_query(service_id, check_in, check_out, conn))]
+                        rooms[service_id] = allocate(conn, "hotel", service_id, free, booking_ids)
+                        conn.executemany("INSERT INTO Reservations (booking_id, service_id, room_id, check_in, check_out) VALUES (?, ?, ?, ?, ?)",
+                                         [(b, service_id, r, *stay) for b, r in zip(booking_ids, rooms[service_id])])
+                    elif is_flight:
+                        free = [r[0] for r in conn.execute(FREE_SEATS_SQL, (service_id,))]
+                        seats[service_id] = allocate(conn, "flight", service_id, free, booking_ids)
+                        conn.executemany("INSERT INTO Tickets (booking_id, seat_id, issue_date) VALUES (?, ?, ?)",
+                                         [(b, s, str(booking_date)) for b, s in zip(booking_ids, seats[service_id])])
+                except sqlite3.IntegrityError as e:
+                    raise AllocationError(f"Service {service_id}: {e}") from e
+        if deposit:
+            conn.executemany("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", [(b, deposit) for b in booking_ids])
+        return {"booking_ids": booking_ids, "rooms": rooms, "seats": seats}
+    return write_transaction(work, "Bookings", "Reservations", "Tickets", "Payments")
+
+# ===========================
+# DOMAIN API
+# ===========================
+
+# Plain functions for every write the pages make, usable from scripts and batch jobs. Each one
+# is a single write transaction (BEGIN IMMEDIATE, busy retries) and invalidates the cache.
+
+DEFAULT_SEAT_NOS = ["1A", "1B", "2A", "2B"]
+DEFAULT_ROOM_NOS = ["101", "102", "201", "202"]
+
+def execute_write(sql, params=()):
+    """One INSERT/UPDATE/DELETE in its own write transaction. Returns (lastrowid, rowcount)."""
+    def work(conn):
+        cur = conn.execute(sql, params)
+        return cur.lastrowid, cur.rowcount
+    return write_transaction(work, WRITE_TARGET_RE.match(sql.lstrip()).group(1))
+
+def update_fields(table, key, key_value, **fields):
+    """UPDATE only the fields given as non-None; returns the number of rows changed."""
+    fields = {col: value for col, value in fields.items() if value is not None}
+    if not fields:
+        return 0
+    sets = ", ".join(f"{col}=?" for col in fields)
+    return execute_write(f"UPDATE {table} SET {sets} WHERE {key}=?", (*fields.values(), key_value))[1]
+
+#=============================================================================================
+
+def add_customer(name, email):
+    """Returns the new cust_id; sqlite3.IntegrityError if the email is taken."""
+    return execute_write("INSERT INTO Customers (name, email) VALUES (?, ?)", (name, email))[0]
+
+def update_customer(cust_id, name=None, email=None):
+    return update_fields("Customers", "cust_id", cust_id, name=name, email=email)
+
+def delete_customer(cust_id):
+    """Deletes the customer with their bookings, payments, reservations and tickets."""
+    return execute_write("DELETE FROM Customers WHERE cust_id=?", (cust_id,))[1]
+
+def add_destination(city, country):
+    return execute_write("INSERT INTO Destinations (city, country) VALUES (?, ?)", (city, country))[0]
+
+def update_destination(dest_id, city=None, country=None):
+    return update_fields("Destinations", "dest_id", dest_id, city=city, country=country)
+
+def delete_destination(dest_id):
+    return execute_write("DELETE FROM Destinations WHERE dest_id=?", (dest_id,))[1]
+
+#=============================================================================================
+
+def add_service(kind, name, price, extra, units=None):
+    """Create a Flight (extra = airline, units = seat numbers) or a Hotel (extra = stars,
+    units = room numbers) with its inventory, all in one transaction. Returns the service_id."""
+    def work(conn):
+        service_id = conn.execute("INSERT INTO Services (service_name, base_price) VALUES (?, ?)", (name, price)).lastrowid
+        if kind == "Flight":
+            conn.execute("INSERT INTO Flights (flight_id, airline) VALUES (?, ?)", (service_id, extra))
+            conn.executemany("INSERT INTO Seats (flight_id, seat_no) VALUES (?, ?)",
+                             [(service_id, seat_no) for seat_no in units or DEFAULT_SEAT_NOS])
+        elif kind == "Hotel":
+            conn.execute("INSERT INTO Hotels (hotel_id, stars) VALUES (?, ?)", (service_id, extra))
+            conn.executemany("INSERT INTO Rooms (hotel_id, room_no) VALUES (?, ?)",
+                             [(service_id, room_no) for room_no in units or DEFAULT_ROOM_NOS])
+        else:
+            raise ValueError(f"Unknown service kind {kind!r}; expected 'Flight' or 'Hotel'.")
+        return service_id
+    return write_transaction(work, "Services", "Flights", "Seats", "Hotels", "Rooms")
+
+def update_service(service_id, name=None, base_price=None):
+    """A price change re-quotes every package containing the service (trigger)."""
+    return update_fields("Services", "service_id", service_id, service_name=name, base_price=base_price)
+
+def delete_service(service_id):
+    return execute_write("DELETE FROM Services WHERE service_id=?", (service_id,))[1]
+
+#=============================================================================================
+
+def add_package(dest_id, name, price=None, markup_pct=0.0, discount_pct=0.0):
+    """Without a price the package is auto-priced from its contents (see PACKAGE PRICING)."""
+    return execute_write("INSERT INTO TravelPackages (dest_id, pkg_name, price, markup_pct, discount_pct, auto_price) "
+                         "VALUES (?, ?, COALESCE(?, 0), ?, ?, ?)",
+                         (dest_id, name, price, markup_pct, discount_pct, int(price is None)))[0]
+
+def update_package(pkg_id, name=None, price=None):
+    """A price change re-prices the ledger of every booking of the package (trigger)."""
+    return update_fields("TravelPackages", "pkg_id", pkg_id, pkg_name=name, price=price)
+
+def delete_package(pkg_id):
+    return execute_write("DELETE FROM TravelPackages WHERE pkg_id=?", (pkg_id,))[1]
+
+def add_package_service(pkg_id, service_id):
+    return execute_write("INSERT INTO PackageContents (pkg_id, service_id) VALUES (?, ?)", (pkg_id, service_id))[0]
+
+def remove_package_content(content_id):
+    return execute_write("DELETE FROM PackageContents WHERE id=?", (content_id,))[1]
+
+#=============================================================================================
+
+def update_booking(booking_id, pkg_id=None, booking_date=None):
+    return update_fields("Bookings", "booking_id", booking_id, pkg_id=pkg_id,
+                         booking_date=None if booking_date is None else str(booking_date))
+
+def delete_booking(booking_id):
+    """Deletes the booking with its payments, reservations and tickets."""
+    return execute_write("DELETE FROM Bookings WHERE booking_id=?", (booking_id,))[1]
+
+def add_payment(booking_id, amount):
+    """Returns the payment_id; the booking's ledger columns follow by trigger."""
+    return execute_write("INSERT INTO Payments (booking_id, amount) VALUES (?, ?)", (booking_id, amount))[0]
+
+# ===========================
+# PAGE & REPORT QUERIES
+# ===========================
+
+# Every multi-table query the pages run is registered here so the plan auditor can check it.
+REPORT_QUERIES = {}
+
+def register_report_query(name, sql, params=(), allow_scan=()):
+    """Register a page query for audit_query_plans() and return the SQL unchanged.
+    allow_scan lists tables the query is meant to read in full (e.g. a report of every booking)."""
+    REPORT_QUERIES[name] = {"sql": sql, "params": tuple(params), "allow_scan": set(allow_scan)}
+    return sql
+
+#=============================================================================================
+
+RECENT_BOOKINGS_SQL = register_report_query("Dashboard: recent bookings", """
+    SELECT b.booking_id, b.booking_date, c.name as customer, tp.pkg_name as package,
+           b.is_paid
+    FROM Bookings b
+    JOIN Customers c ON b.cust_id = c.cust_id
+    JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
+    ORDER BY b.booking_date DESC
+    LIMIT 10
+""")
+
+#=============================================================================================
+
+# Dashboard KPIs: maintained counters only, so producing them costs the same at any data size.
+# Bookings and revenue cover active (hot) bookings, like the revenue chart and the rollup
+# reports; the archived totals come separately.
+DASHBOARD_TOTALS_SQL = """
+    SELECT (SELECT n FROM RowCounts WHERE table_name = 'Customers'),
+           (SELECT n FROM RowCounts WHERE table_name = 'Bookings'),
+           (SELECT n FROM RowCounts WHERE table_name = 'TravelPackages'),
+           (SELECT value FROM RunningTotals WHERE name = 'revenue'),
+           (SELECT bookings FROM ArchiveState),
+           (SELECT revenue FROM ArchiveState)
+"""
+DASHBOARD_TTL_SECONDS = 5.0     # reuse a snapshot this long (0 = always re-read)
+DASHBOARD_TARGET_MS = 50        # latency budget shown on the dashboard
+DASHBOARD_SAMPLES = 200         # recent latencies kept for the percentile
+DASHBOARD_CACHE_KEY = ("dashboard", DASHBOARD_TOTALS_SQL, RECENT_BOOKINGS_SQL)
+
+class DashboardStats:
+    """Latency of producing the dashboard (KPIs + recent bookings), cache hits included."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {"snapshots": 0, "cached": 0, "last_ms": 0.0, "max_ms": 0.0}
+        self._recent = []
+
+    def record(self, elapsed_ms, cached):
+        with self._lock:
+            self._stats["cached" if cached else "snapshots"] += 1
+            self._stats["last_ms"] = elapsed_ms
+            self._stats["max_ms"] = max(self._stats["max_ms"], elapsed_ms)
+            self._recent.append(elapsed_ms)
+            if len(self._recent) > DASHBOARD_SAMPLES:
+                del self._recent[0]
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self._stats)
+            recent = sorted(self._recent)
+        snapshot["avg_ms"] = sum(recent) / len(recent) if recent else 0.0
+        snapshot["p95_ms"] = recent[int(len(recent) * 0.95)] if recent else 0.0
+        return snapshot
+
+@process_resource
+def dashboard_stats_for(db_file):
+    return DashboardStats()
+
+def get_dashboard_stats():
+    return dashboard_stats_for(DB_FILE)
+
+def dashboard_metrics(ttl=DASHBOARD_TTL_SECONDS):
+    """All dashboard figures read in one transaction, so the counts, revenue and recent bookings
+    describe the same moment. Returns {"customers", "bookings", "packages", "revenue",
+    "archived_bookings", "archived_revenue", "recent_columns", "recent_rows", "as_of", "cached",
+    "elapsed_ms"}; bookings and revenue are the active bookings' only.
+
+    The snapshot sits in the query cache, which drops it on any write to the tables it read
+    (here or, via data_version, in another process); ttl bounds its age on top of that."""
+    start = time.perf_counter()
+    cache = get_query_cache()
+    found, snapshot = cache.get(DASHBOARD_CACHE_KEY) if ttl else (False, None)
+    cached = found and time.time() - snapshot["as_of"] < ttl
+    if not cached:
+        with snapshot_read() as conn:
+            conn.execute("BEGIN")    # one read transaction: every SELECT sees the same snapshot
+            try:
+                customers, bookings, packages, revenue, archived_bookings, archived_revenue = \
+                    conn.execute(DASHBOARD_TOTALS_SQL).fetchone()
+                cur = conn.execute(RECENT_BOOKINGS_SQL)
+                recent_rows = cur.fetchall()
+            finally:
+                conn.commit()
+        snapshot = {"customers": customers or 0, "bookings": bookings or 0, "packages": packages or 0,
+                    "revenue": revenue or 0.0, "archived_bookings": archived_bookings or 0,
+                    "archived_revenue": archived_revenue or 0.0, "recent_columns": [d[0] for d in cur.description],
+                    "recent_rows": recent_rows, "as_of": time.time()}
+        if ttl:
+            cache.put(DASHBOARD_CACHE_KEY, snapshot,
+                      cache.read_tables(DASHBOARD_TOTALS_SQL) | cache.read_tables(RECENT_BOOKINGS_SQL))
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    get_dashboard_stats().record(elapsed_ms, cached)
+    return dict(snapshot, cached=cached, elapsed_ms=elapsed_ms)
+
+# Paginated grids: base SELECT (no WHERE/ORDER), the table whose RowCounts entry is the total,
+# the unique key used as tie-breaker, the indexed columns the user may sort by, and which of
+# those may hold NULL.
+GRIDS = {
+    "customers": {
+        "select": "SELECT c.cust_id, c.name, c.email FROM Customers c",
+        "count_table": "Customers", "key": "c.cust_id",
+        "sorts": {"ID": "c.cust_id", "Name": "c.name", "Email": "c.email"},
+    },
+    "destinations": {
+        "select": "SELECT d.dest_id, d.city, d.country FROM Destinations d",
+        "count_table": "Destinations", "key": "d.dest_id",
+        "sorts": {"ID": "d.dest_id", "City": "d.city"},
+    },
+    "services": {
+        "select": """SELECT s.service_id, s.service_name, s.base_price,
+                            f.airline AS 'Airline (If Flight)',
+                            h.stars AS 'Stars (If Hotel)'
+                     FROM Services s
+                     LEFT JOIN Flights f ON s.service_id = f.flight_id
+                     LEFT JOIN Hotels h ON s.service_id = h.hotel_id""",
+        "count_table": "Services", "key": "s.service_id",
+        "sorts": {"ID": "s.service_id", "Name": "s.service_name"},
+    },
+    "packages": {
+        "select": """SELECT tp.pkg_id, tp.pkg_name, tp.price,
+                            d.city || ', ' || d.country AS destination
+                     FROM TravelPackages tp
+                     JOIN Destinations d ON tp.dest_id = d.dest_id""",
+        "count_table": "TravelPackages", "key": "tp.pkg_id",
+        "sorts": {"ID": "tp.pkg_id", "Name": "tp.pkg_name"}, "nullable": ["tp.pkg_name"],
+    },
+    "package_contents": {
+        "select": """SELECT pc.id, tp.pkg_name, s.service_name
+                     FROM PackageContents pc
+                     JOIN TravelPackages tp ON pc.pkg_id = tp.pkg_id
+                     JOIN Services s ON pc.service_id = s.service_id""",
+        "count_table": "PackageContents", "key": "pc.id",
+        "sorts": {"Newest": "pc.id"}, "descending": True,
+    },
+    "bookings": {
+        "select": """SELECT b.booking_id, b.booking_date, c.name, tp.pkg_name, b.is_paid,
+                            b.total_paid, b.balance_due
+                     FROM Bookings b
+                     JOIN Customers c ON b.cust_id = c.cust_id
+                     JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id""",
+        "count_table": "Bookings", "key": "b.booking_id",
+        "sorts": {"Date": "b.booking_date", "ID": "b.booking_id"}, "nullable": ["b.booking_date"],
+        "descending": True,
+    },
+}
+
+DEFAULT_PAGE_SIZE = 50
+
+def keyset_columns(grid, sort):
+    """Sort column plus the unique key as tie-breaker (just the key when sorting by it)."""
+    spec = GRIDS[grid]
+    sort_col, key = spec["sorts"][sort], spec["key"]
+    return [sort_col] if sort_col == key else [sort_col, key]
+
+def grid_segments(grid, sort, descending):
+    """The parts a sort is paged through in order. A row-value comparison with NULL matches
+    nothing, so a nullable sort column is walked as its NULL rows ("null", first ascending,
+    as SQLite sorts them) and the rest ("value"), each with its own keyset condition."""
+    if GRIDS[grid]["sorts"][sort] not in GRIDS[grid].get("nullable", ()):
+        return [None]
+    return ["value", "null"] if descending else ["null", "value"]
+
+def grid_page_sql(grid, sort, descending, anchored, segment=None):
+    """Keyset page query: rows strictly after the anchor (sort value, key) in the chosen order,
+    within one segment of grid_segments(); in the "null" segment the anchor is the key alone.
+    Reads page_size + 1 rows so the caller knows whether a next page exists."""
+    spec = GRIDS[grid]
+    cols = keyset_columns(grid, sort)
+    direction = "DESC" if descending else "ASC"
+    op = "<" if descending else ">"
+    conditions = []
+    if segment == "null":
+        conditions.append(f"{cols[0]} IS NULL")
+        if anchored:
+            conditions.append(f"{cols[-1]} {op} ?")
+    elif anchored:
+        conditions.append(f"({', '.join(cols)}) {op} ({', '.join('?' for _ in cols)})")
+    elif segment == "value":
+        conditions.append(f"{cols[0]} IS NOT NULL")
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = ", ".join(f"{c} {direction}" for c in cols)
+    return f"{spec['select']} {where} ORDER BY {order} LIMIT ?"
+
+def fetch_grid_page(grid, sort, descending, anchor=None, page_size=DEFAULT_PAGE_SIZE):
+    """One page of a grid as (DataFrame, has_next, next_anchor). A page that reaches the end of
+    a segment is topped up from the start of the next one."""
+    import pandas as pd
+    segments = grid_segments(grid, sort, descending)
+    if anchor is None:
+        steps = [(segments[0], False, [])]
+    elif segments == [None]:
+        steps = [(None, True, list(anchor))]
+    elif anchor[0] is None:
+        steps = [("null", True, [anchor[-1]])]
+    else:
+        steps = [("value", True, list(anchor))]
+    current = segments.index(steps[0][0])
+    steps += [(segment, False, []) for segment in segments[current + 1:]]
+    frames, wanted = [], page_size + 1
+    for segment, anchored, params in steps:
+        frames.append(get_dataframe(grid_page_sql(grid, sort, descending, anchored, segment), params + [wanted]))
+        wanted -= len(frames[-1])
+        if wanted == 0:
+            break
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    has_next = len(df) > page_size
+    df = df.iloc[:page_size]
+    next_anchor = None
+    if has_next:
+        # anchor values come back by result column name: "c.name" -> "name"
+        last = df.iloc[-1]
+        names = [col.split(".")[-1] for col in keyset_columns(grid, sort)]
+        values = [last[n].item() if hasattr(last[n], "item") else last[n] for n in names]
+        next_anchor = tuple(None if pd.isna(v) else v for v in values)
+    return df, has_next, next_anchor
+
+for _grid, _spec in GRIDS.items():
+    for _sort in _spec["sorts"]:
+        _descending = _spec.get("descending", False)
+        for _segment in grid_segments(_grid, _sort, _descending):
+            _name = f"Grid {_grid}: %s page by {_sort}" + (f" ({_segment} rows)" if _segment else "")
+            _anchor = (0,) if _segment == "null" else (0,) * len(keyset_columns(_grid, _sort))
+            # the first page walks the sort index from one end and stops at LIMIT
+            register_report_query(_name % "first", grid_page_sql(_grid, _sort, _descending, False, _segment),
+                                  (DEFAULT_PAGE_SIZE + 1,), allow_scan=[_spec["count_table"]])
+            register_report_query(_name % "next", grid_page_sql(_grid, _sort, _descending, True, _segment),
+                                  _anchor + (DEFAULT_PAGE_SIZE + 1,))
+
+#=============================================================================================
+
+# Full-text search: one external-content FTS5 table per searchable table (the text lives only in
+# the base table; the FTS table holds the token index) with prefix indexes for 1-3 characters.
+# Insert/update/delete triggers on the base table keep it in step.
+SEARCH_INDEXES = {
+    "CustomerSearch": {"table": "Customers", "key": "cust_id", "columns": ["name", "email"]},
+    "DestinationSearch": {"table": "Destinations", "key": "dest_id", "columns": ["city", "country"]},
+    "PackageSearch": {"table": "TravelPackages", "key": "pkg_id", "columns": ["pkg_name"]},
+    "ServiceSearch": {"table": "Services", "key": "service_id", "columns": ["service_name"]},
+}
+
+def search_index_triggers(fts, spec):
+    table, key, cols = spec["table"], spec["key"], spec["columns"]
+    names = ", ".join(cols)
+    new_values = ", ".join(f"NEW.{c}" for c in cols)
+    old_values = ", ".join(f"OLD.{c}" for c in cols)
+    delete_old = f"INSERT INTO {fts} ({fts}, rowid, {names}) VALUES ('delete', OLD.{key}, {old_values});"
+    insert_new = f"INSERT INTO {fts} (rowid, {names}) VALUES (NEW.{key}, {new_values});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_search_{table}_ins AFTER INSERT ON {table} BEGIN {insert_new} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_search_{table}_del AFTER DELETE ON {table} BEGIN {delete_old} END",
+        f"""CREATE TRIGGER IF NOT EXISTS trg_search_{table}_upd AFTER UPDATE OF {key}, {names} ON {table} BEGIN
+            {delete_old} {insert_new} END""",
+    ]
+
+def search_index_available():
+    return bool(run_query("SELECT 1 FROM sqlite_master WHERE type='table' AND name='CustomerSearch'"))
+
+# Ranking every match of a short prefix ("a*") costs a bm25 score per matching row, so the
+# typeahead ranks only the first SEARCH_CANDIDATES matches (rowid order) -- exact for rare
+# words, bounded for common ones. The sub-select also makes the FTS table the outer loop.
+SEARCH_CANDIDATES = 1000
+
+def search_candidates_sql(fts):
+    return f"(SELECT rowid, rank FROM {fts} WHERE {fts} MATCH ? LIMIT {SEARCH_CANDIDATES}) m"
+
+def fts_prefix_query(text):
+    """FTS5 MATCH expression: every typed word must occur, the last one as a prefix
+    ('ali yil' -> '"ali" "yil"*'). None when the text has no word characters."""
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    return " ".join(f'"{w}"' for w in words[:-1]) + (" " if len(words) > 1 else "") + f'"{words[-1]}"*'
+
+#=============================================================================================
+
+# Typeahead selectors: the query returns (id, ...) rows whose searched column starts with the
+# typed text (case-insensitive, served by the NOCASE indexes) and `label` formats one row.
+# `fts_sql`, used when the search index exists, matches typed words as token prefixes in any
+# indexed column instead (e.g. a customer by surname or email domain) and returns the same columns.
+TYPEAHEAD_SOURCES = {
+    "customers": {
+        "sql": """SELECT cust_id, name, email FROM Customers
+                  WHERE name LIKE ? ESCAPE '\\' ORDER BY name COLLATE NOCASE LIMIT ?""",
+        "fts_sql": f"""SELECT c.cust_id, c.name, c.email FROM {search_candidates_sql("CustomerSearch")}
+                       JOIN Customers c ON c.cust_id = m.rowid ORDER BY m.rank LIMIT ?""",
+        "label": lambda r: f"{r[1]} <{r[2]}>",
+    },
+    "destinations": {
+        "sql": """SELECT dest_id, city, country FROM Destinations
+                  WHERE city LIKE ? ESCAPE '\\' ORDER BY city COLLATE NOCASE LIMIT ?""",
+        "fts_sql": f"""SELECT d.dest_id, d.city, d.country FROM {search_candidates_sql("DestinationSearch")}
+                       JOIN Destinations d ON d.dest_id = m.rowid ORDER BY m.rank LIMIT ?""",
+        "label": lambda r: f"{r[1]}, {r[2]}",
+    },
+    "packages": {
+        "sql": """SELECT pkg_id, pkg_name, price FROM TravelPackages
+                  WHERE pkg_name LIKE ? ESCAPE '\\' ORDER BY pkg_name COLLATE NOCASE LIMIT ?""",
+        "fts_sql": f"""SELECT tp.pkg_id, tp.pkg_name, tp.price FROM {search_candidates_sql("PackageSearch")}
+                       JOIN TravelPackages tp ON tp.pkg_id = m.rowid ORDER BY m.rank LIMIT ?""",
+        "label": lambda r: f"{r[1]} (${r[2]})",
+    },
+    "services": {
+        "sql": """SELECT service_id, service_name, base_price FROM Services
+                  WHERE service_name LIKE ? ESCAPE '\\' ORDER BY service_name COLLATE NOCASE LIMIT ?""",
+        "fts_sql": f"""SELECT s.service_id, s.service_name, s.base_price FROM {search_candidates_sql("ServiceSearch")}
+                       JOIN Services s ON s.service_id = m.rowid ORDER BY m.rank LIMIT ?""",
+        "label": lambda r: f"{r[1]} (${r[2]})",
+    },
+    "bookings": {
+        "sql": """SELECT b.booking_id, c.name, tp.pkg_name FROM Customers c
+                  JOIN Bookings b ON b.cust_id = c.cust_id
+                  JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
+                  WHERE c.name LIKE ? ESCAPE '\\' ORDER BY c.name COLLATE NOCASE, b.booking_id LIMIT ?""",
+        "fts_sql": f"""SELECT b.booking_id, c.name, tp.pkg_name FROM {search_candidates_sql("CustomerSearch")}
+                       JOIN Customers c ON c.cust_id = m.rowid
+                       JOIN Bookings b ON b.cust_id = c.cust_id
+                       JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
+                       ORDER BY m.rank, b.booking_id LIMIT ?""",
+        "label": lambda r: f"ID {r[0]}: {r[1]} - {r[2]}",
+    },
+}
+
+for _name, _source in TYPEAHEAD_SOURCES.items():
+    register_report_query(f"Typeahead {_name}", _source["sql"], ("a%", 20))
+    register_report_query(f"Search {_name}", _source["fts_sql"], ('"a"*', 20))
+
+def search_options(source, text, limit=20):
+    """{id: label} for the first `limit` rows matching `text`: best full-text matches of the typed
+    words when the search index exists, else rows whose name starts with `text`."""
+    spec = TYPEAHEAD_SOURCES[source]
+    match = fts_prefix_query(text)
+    if match is not None and search_index_available():
+        return {r[0]: spec["label"](r) for r in run_query(spec["fts_sql"], (match, limit))}
+    prefix = text.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return {r[0]: spec["label"](r) for r in run_query(spec["sql"], (prefix + "%", limit))}
+
+def option_labels(df, key_col, fmt):
+    """Dictionary index {key: label} over a result set, built once and shared by every selectbox
+    that lists it -- format_func then is a dict lookup instead of a DataFrame mask per option."""
+    return dict(zip(df[key_col], (fmt.format(**row) for row in df.to_dict("records"))))
+
+# Catalog: destinations, packages and services held column-wise (numbers in typed arrays, text in
+# lists) with __slots__ records made on lookup, one copy per process. It sits in the query cache,
+# so it is reloaded only after a write to one of its tables (or data_version moving). Pages call
+# get_catalog() once per render; lookups after that never touch SQLite.
+class Destination:
+    __slots__ = ("dest_id", "city", "country")
+    TYPES = ("q", None, None)          # array typecode per field; None keeps text in a list
+
+    def __init__(self, dest_id, city, country):
+        self.dest_id, self.city, self.country = dest_id, city, country
+
+    @property
+    def label(self):
+        return f"{self.city}, {self.country}"
+
+class Package:
+    __slots__ = ("pkg_id", "dest_id", "pkg_name", "price", "markup_pct", "discount_pct", "auto_price")
+    TYPES = ("q", "q", None, "d", "d", "d", "b")
+
+    def __init__(self, pkg_id, dest_id, pkg_name, price, markup_pct, discount_pct, auto_price):
+        self.pkg_id, self.dest_id, self.pkg_name, self.price = pkg_id, dest_id, pkg_name, price
+        self.markup_pct, self.discount_pct, self.auto_price = markup_pct, discount_pct, auto_price
+
+    @property
+    def label(self):
+        return f"{self.pkg_name} (${self.price})"
+
+class Service:
+    __slots__ = ("service_id", "service_name", "base_price", "kind")
+    TYPES = ("q", None, "d", None)
+
+    def __init__(self, service_id, service_name, base_price, kind):
+        self.service_id, self.service_name, self.base_price, self.kind = service_id, service_name, base_price, kind
+
+    @property
+    def label(self):
+        return self.service_name
+
+class TextColumn:
+    """A text column as one string plus an array of end offsets, instead of a str object per row."""
+    __slots__ = ("_text", "_ends")
+
+    def __init__(self, values):
+        self._text = "".join(values)
+        self._ends = array("l", itertools.accumulate(map(len, values)))
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, i):
+        return self._text[self._ends[i - 1] if i else 0:self._ends[i]]
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self._ends)))
+
+class CatalogTable:
+    """Rows of one catalog table in display order, stored per column. Lookup by id bisects a
+    sorted copy of the ids instead of keeping a dict entry per row."""
+    __slots__ = ("record", "columns", "_sorted_ids", "_positions")
+
+    def __init__(self, record, rows):
+        self.record = record
+        self.columns = []
+        for values, code in zip(zip(*rows) if rows else [()] * len(record.TYPES), record.TYPES):
+            try:
+                self.columns.append(TextColumn(values) if code is None else array(code, values))
+            except TypeError:          # NULLs in a nullable column
+                self.columns.append(list(values))
+        order = sorted(range(len(rows)), key=self.columns[0].__getitem__)
+        self._sorted_ids = array("q", (self.columns[0][i] for i in order))
+        self._positions = array("l", order)
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def __iter__(self):
+        return iter(self.columns[0])
+
+    def _position(self, key):
+        i = bisect.bisect_left(self._sorted_ids, key)
+        if i == len(self._sorted_ids) or self._sorted_ids[i] != key:
+            return None
+        return self._positions[i]
+
+    def __contains__(self, key):
+        return self._position(key) is not None
+
+    def __getitem__(self, key):
+        i = self._position(key)
+        if i is None:
+            raise KeyError(key)
+        return self.record(*(column[i] for column in self.columns))
+
+    def get(self, key, default=None):
+        return default if key not in self else self[key]
+
+    def values(self):
+        return (self.record(*row) for row in zip(*self.columns))
+
+    def size_bytes(self):
+        total = sys.getsizeof(self._sorted_ids) + sys.getsizeof(self._positions)
+        for column in self.columns:
+            if isinstance(column, TextColumn):
+                total += sys.getsizeof(column._text) + sys.getsizeof(column._ends)
+            else:
+                total += sys.getsizeof(column) + (sum(map(sys.getsizeof, column)) if isinstance(column, list) else 0)
+        return total
+
+CATALOG_SQL = {
+    "destinations": (Destination, "SELECT dest_id, city, country FROM Destinations ORDER BY city COLLATE NOCASE, country"),
+    "packages": (Package, """SELECT pkg_id, dest_id, pkg_name, price, markup_pct, discount_pct, auto_price
+                             FROM TravelPackages ORDER BY pkg_name COLLATE NOCASE"""),
+    "services": (Service, register_report_query("Catalog: services", """
+        SELECT s.service_id, s.service_name, s.base_price,
+               CASE WHEN h.hotel_id IS NOT NULL THEN 'Hotel' WHEN f.flight_id IS NOT NULL THEN 'Flight' END
+        FROM Services s
+        LEFT JOIN Hotels h ON h.hotel_id = s.service_id
+        LEFT JOIN Flights f ON f.flight_id = s.service_id
+        ORDER BY s.service_name COLLATE NOCASE
+    """, allow_scan=("Services",))),
+}
+CATALOG_CACHE_KEY = ("catalog",)
+
+class Catalog:
+    """A CatalogTable per table: destinations, packages, services."""
+
+    def __init__(self, destinations, packages, services):
+        self.destinations = destinations
+        self.packages = packages
+        self.services = services
+
+    def labels(self, table, where=None):
+        """{id: label} for a selectbox; `where` keeps only the records it returns true for."""
+        records = getattr(self, table)
+        return {key: record.label for key, record in zip(records, records.values()) if where is None or where(record)}
+
+    def size_bytes(self):
+        return sum(table.size_bytes() for table in (self.destinations, self.packages, self.services))
+
+def get_catalog():
+    """The process-wide Catalog, read from one snapshot when the cached one was invalidated."""
+    cache = get_query_cache()
+    found, catalog = cache.get(CATALOG_CACHE_KEY)
+    if found:
+        return catalog
+    tables = {}
+    with snapshot_read() as conn:
+        conn.execute("BEGIN")    # one read transaction: packages never point at a missing destination
+        try:
+            for table, (record, sql) in CATALOG_SQL.items():
+                tables[table] = CatalogTable(record, conn.execute(sql).fetchall())
+        finally:
+            conn.commit()
+    catalog = Catalog(**tables)
+    cache.put(CATALOG_CACHE_KEY, catalog, frozenset().union(*(cache.read_tables(sql) for _, sql in CATALOG_SQL.values())))
+    return catalog
+
+BOOKING_REPORT_SQL = register_report_query("Reports: comprehensive booking report", """
+    SELECT
+        b.booking_id AS ID,
+        b.booking_date AS Date,
+        c.name AS Customer,
+        c.email AS Contact,
+        tp.pkg_name AS Package,
+        tp.price AS Package_Price,
+        d.city || ', ' || d.country AS Destination,
+        b.total_paid AS Total_Paid,
+        b.balance_due AS Balance_Due,
+        CASE b.is_paid WHEN 0 THEN 'Unpaid' WHEN 1 THEN 'Partial' WHEN 2 THEN 'Paid' ELSE 'Unknown' END AS Payment_Status
+    FROM Bookings b
+    JOIN Customers c ON b.cust_id = c.cust_id
+    JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
+    JOIN Destinations d ON tp.dest_id = d.dest_id
+    ORDER BY b.booking_date DESC
+""", allow_scan=["Bookings"])
+
+#=============================================================================================
+
+# Streaming export of the booking report: the same columns, filters pushed into the WHERE
+# clause, rows read newest first straight off idx_bookings_date (no sort step holding the whole
+# result), fetchmany() chunks written out one at a time.
+BOOKING_EXPORT_SELECT = BOOKING_REPORT_SQL.split("FROM Bookings b", 1)[0].rstrip() + "\n"
+BOOKING_EXPORT_FROM = """    FROM Bookings b INDEXED BY idx_bookings_date
+    JOIN Customers c ON b.cust_id = c.cust_id
+    JOIN TravelPackages tp ON b.pkg_id = tp.pkg_id
+    JOIN Destinations d ON tp.dest_id = d.dest_id
+"""
+# the same over hot + archived bookings. A view takes no INDEXED BY; CROSS JOIN keeps the
+# bookings outermost instead, so each half of the view walks its booking_date index, the two
+# are merged in order and customers are looked up by key (not scanned and sorted).
+BOOKING_HISTORY_FROM = (BOOKING_EXPORT_FROM.replace("Bookings b INDEXED BY idx_bookings_date", "BookingHistory b")
+                        .replace("JOIN Customers c", "CROSS JOIN Customers c"))
+EXPORT_CHUNK_ROWS = 10000
+EXPORT_PREVIEW_ROWS = 1000
+# Parquet column types of the report (CSV needs none)
+BOOKING_EXPORT_TYPES = {"ID": "int64", "Date": "string", "Customer": "string", "Contact": "string",
+                        "Package": "string", "Package_Price": "float64", "Destination": "string",
+                        "Total_Paid": "float64", "Balance_Due": "float64", "Payment_Status": "string"}
+
+def booking_report_query(date_from=None, date_to=None, dest_id=None, limit=None, history=False):
+    """(sql, params) for the booking report restricted to booking dates in [date_from, date_to]
+    and one destination; any filter left as None is not applied. history includes archived
+    bookings."""
+    where, params = [], []
+    if date_from is not None:
+        where.append("b.booking_date >= ?")
+        params.append(str(date_from))
+    if date_to is not None:
+        where.append("b.booking_date <= ?")
+        params.append(str(date_to))
+    if dest_id is not None:
+        where.append("tp.dest_id = ?")
+        params.append(dest_id)
+    sql = BOOKING_EXPORT_SELECT + (BOOKING_HISTORY_FROM if history else BOOKING_EXPORT_FROM)
+    if where:
+        sql += "    WHERE " + " AND ".join(where) + "\n"
+    sql += "    ORDER BY b.booking_date DESC, b.booking_id DESC"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return sql, tuple(params)
+
+def iter_booking_report(chunk_rows=EXPORT_CHUNK_ROWS, **filters):
+    """Yield (columns, rows) chunks of the filtered report from one read transaction, so the
+    chunks form a consistent snapshot and only one chunk is held at a time."""
+    sql, params = booking_report_query(**filters)
+    with snapshot_read() as conn:
+        conn.execute("BEGIN")
+        try:
+            cur = conn.execute(sql, params)
+            columns = [d[0] for d in cur.description]
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                yield columns, rows
+        finally:
+            conn.commit()
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+def export_booking_report(path, fmt="csv", chunk_rows=EXPORT_CHUNK_ROWS, **filters):
+    """Write the filtered booking report to `path` as CSV or Parquet, chunk by chunk (one
+    Parquet row group per chunk). Returns the number of rows written."""
+    written = 0
+    chunks = iter_booking_report(chunk_rows, **filters)
+    if fmt == "csv":
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(BOOKING_EXPORT_TYPES)
+            for _, rows in chunks:
+                writer.writerows(rows)
+                written += len(rows)
+    elif fmt == "parquet":
+        if not parquet_available():
+            raise ImportError("Parquet export needs pyarrow (pip install pyarrow).")
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        schema = pa.schema([(name, pa.type_for_alias(t)) for name, t in BOOKING_EXPORT_TYPES.items()])
+        with pq.ParquetWriter(path, schema) as writer:
+            for columns, rows in chunks:
+                data = {name: [r[i] for r in rows] for i, name in enumerate(columns)}
+                writer.write_table(pa.Table.from_pydict(data, schema=schema))
+                written += len(rows)
+    else:
+        raise ValueError(f"Unknown export format {fmt!r}; expected 'csv' or 'parquet'.")
+    return written
+
+HOTEL_INVENTORY_SQL = register_report_query("Reports: hotel rooms", """
+    SELECT h.hotel_id, s.service_name, COUNT(r.room_id) as Total_Rooms
+    FROM Hotels h
+    JOIN Services s ON h.hotel_id = s.service_id
+    LEFT JOIN Rooms r ON h.hotel_id = r.hotel_id
+    GROUP BY h.hotel_id
+""", allow_scan=["Hotels"])
+
+FLIGHT_INVENTORY_SQL = register_report_query("Reports: flight seats", """
+    SELECT f.flight_id, s.service_name, f.airline, COUNT(st.seat_id) as Total_Seats
+    FROM Flights f
+    JOIN Services s ON f.flight_id = s.service_id
+    LEFT JOIN Seats st ON f.flight_id = st.flight_id
+    GROUP BY f.flight_id
+""", allow_scan=["Flights"])
+
+HOTEL_STAYS_SQL = register_report_query("Reports: hotel stays", """
+    SELECT s.service_id AS hotel_id, s.service_name, COUNT(*) AS stays,
+           SUM(julianday(r.check_out) - julianday(r.check_in)) AS nights
+    FROM Reservations r
+    JOIN Services s ON s.service_id = r.service_id
+    GROUP BY s.service_id
+    ORDER BY nights DESC
+""", allow_scan=["Reservations"])
+
+CUSTOMER_SPENDING_SQL = register_report_query("Reports: customer spending", """
+    SELECT c.cust_id, c.name, c.email, COALESCE(r.amount, 0) AS total_paid
+    FROM Customers c
+    LEFT JOIN RevenueByCustomer r ON r.cust_id = c.cust_id
+    ORDER BY total_paid DESC
+""", allow_scan=["Customers"])
+
+# the hot rollup plus each customer's archived payments (joining the history views instead
+# would materialize both of them)
+CUSTOMER_SPENDING_HISTORY_SQL = register_report_query("Reports: customer spending with archive", """
+    SELECT c.cust_id, c.name, c.email,
+           COALESCE(r.amount, 0) + COALESCE((
+               SELECT SUM(p.amount) FROM archive.Bookings b JOIN archive.Payments p ON p.booking_id = b.booking_id
+               WHERE b.cust_id = c.cust_id
+                 AND NOT EXISTS (SELECT 1 FROM main.Bookings h WHERE h.booking_id = b.booking_id)), 0) AS total_paid
+    FROM Customers c
+    LEFT JOIN RevenueByCustomer r ON r.cust_id = c.cust_id
+    ORDER BY total_paid DESC
+""", allow_scan=["Customers"])
+
+REVENUE_BY_DESTINATION_SQL = register_report_query("Reports: revenue by destination", """
+    SELECT d.dest_id, d.city, d.country, r.amount AS revenue, r.payments
+    FROM RevenueByDestination r
+    JOIN Destinations d ON d.dest_id = r.dest_id
+    ORDER BY r.amount DESC
+""", allow_scan=["RevenueByDestination", "Destinations"])
+
+REVENUE_BY_PACKAGE_SQL = register_report_query("Reports: revenue by package", """
+    SELECT tp.pkg_id, tp.pkg_name, r.amount AS revenue, r.payments
+    FROM RevenueByPackage r
+    JOIN TravelPackages tp ON tp.pkg_id = r.pkg_id
+    ORDER BY r.amount DESC
+""", allow_scan=["RevenueByPackage", "TravelPackages"])
+
+register_report_query("Reports: booking report export", *booking_report_query("2025-01-01", "2025-12-31", 1),
+                      allow_scan=["Bookings"])
+register_report_query("Reports: booking report with archive", *booking_report_query(limit=EXPORT_PREVIEW_ROWS, history=True),
+                      allow_scan=["Bookings"])
+register_report_query("Dashboard: revenue per month", REVENUE_SERIES_SQL["month"], ("0",), allow_scan=["RevenueByMonth"])
+register_report_query("Dashboard: revenue per day", REVENUE_SERIES_SQL["day"], ("2025-01-01",),
+                      allow_scan=["RevenueByDay"])   # once analyzed, a small rollup may be read whole
+register_report_query("Availability: free rooms in a hotel", FREE_ROOMS_SQL, (1, 1, 1, *stay_params("2025-01-10", "2025-01-15")))
+register_report_query("Availability: free rooms for a destination", FREE_ROOMS_FOR_DESTINATION_SQL, (1, *stay_params("2025-01-10", "2025-01-15")))
+register_report_query("Availability: free seats on a flight", FREE_SEATS_SQL, (1,))
+register_report_query("Allocation: services of a package", PACKAGE_SERVICES_SQL, (1,))
+
+#=============================================================================================
+
+# Columnar analytics: Parquet snapshots of the fact tables (and the customers they are
+# reported by), read into pandas and aggregated with hash joins and groupby over whole columns
+# instead of SQLite's row-at-a-time joins. Each table is split into parts of
+# 2**ANALYTICS_PART_BITS consecutive ids, one Parquet file per part, in a directory next to the
+# database (analytics_dir_for). Triggers mark a part dirty in AnalyticsDirty whenever one of
+# its rows is written, so a refresh (the "analytics" maintenance job) only rewrites those:
+# with ever-growing ids, usually just the newest part of each table. The snapshot covers the
+# hot tables, like the SQL reports, and lags the database by the time since its last refresh.
+ANALYTICS_PART_BITS = 16
+
+# table: (key, {column: Parquet type})
+ANALYTICS_TABLES = {
+    "Bookings": ("booking_id", {"booking_id": "int64", "cust_id": "int64", "pkg_id": "int64", "booking_date": "string",
+                                "is_paid": "int64", "total_paid": "float64", "balance_due": "float64"}),
+    "Payments": ("payment_id", {"payment_id": "int64", "booking_id": "int64", "amount": "float64", "payment_date": "string"}),
+    "Reservations": ("res_id", {"res_id": "int64", "booking_id": "int64", "service_id": "int64", "room_id": "int64",
+                                "check_in": "string", "check_out": "string"}),
+    "Customers": ("cust_id", {"cust_id": "int64", "name": "string", "email": "string"}),
+}
+ANALYTICS_SQL_TYPES = {"int64": "INTEGER", "float64": "REAL", "string": "TEXT"}
+
+def analytics_dirty_triggers():
+    """Mark the part of every inserted, updated or deleted row dirty. claimed = 0 also on a
+    part a refresh is exporting right now, so that refresh leaves it dirty for the next one."""
+    mark = """
+            INSERT INTO AnalyticsDirty (tbl, part, claimed) VALUES ('{table}', {row}.{key} >> {bits}, 0)
+                ON CONFLICT (tbl, part) DO UPDATE SET claimed = 0;"""
+    triggers = []
+    for table, (key, _) in ANALYTICS_TABLES.items():
+        for event, rows in (("INSERT", ["NEW"]), ("UPDATE", ["OLD", "NEW"]), ("DELETE", ["OLD"])):
+            body = "".join(mark.format(table=table, row=row, key=key, bits=ANALYTICS_PART_BITS) for row in rows)
+            triggers.append(f"""CREATE TRIGGER IF NOT EXISTS trg_analytics_{table.lower()}_{event[:3].lower()}
+            AFTER {event} ON {table} BEGIN{body}
+        END""")
+    return triggers
+
+def analytics_dir_for(db_file):
+    """travel.db -> travel_analytics/, in the same directory."""
+    path = pathlib.Path(db_file)
+    return path.with_name(f"{path.stem}_analytics")
+
+def write_analytics_part(conn, table, part, folder):
+    """Write the rows of one part (possibly none) to folder/part-NNNNNN.parquet, replacing the
+    file in one rename so readers never see half of it. Returns the rows written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    key, columns = ANALYTICS_TABLES[table]
+    select = ", ".join(f"CAST({c} AS {ANALYTICS_SQL_TYPES[t]})" for c, t in columns.items())
+    first = part << ANALYTICS_PART_BITS
+    rows = conn.execute(f"SELECT {select} FROM main.{table} WHERE {key} BETWEEN ? AND ? ORDER BY {key}",
+                        (first, first + (1 << ANALYTICS_PART_BITS) - 1)).fetchall()
+    schema = pa.schema([(c, pa.type_for_alias(t)) for c, t in columns.items()])
+    data = dict(zip(columns, zip(*rows))) if rows else {c: [] for c in columns}
+    path = folder / f"part-{part:06d}.parquet"
+    temp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")   # refreshes may overlap
+    pq.write_table(pa.Table.from_pydict(data, schema=schema), temp)
+    temp.replace(path)
+    return len(rows)
+
+def export_analytics_parts():
+    """Write every claimed dirty part, and every part in each table's id range that has no file
+    yet, from one read snapshot. Returns {"parts_written", "rows_written"}."""
+    directory = analytics_dir_for(DB_FILE)
+    parts_written = rows_written = 0
+    with snapshot_read() as conn:
+        conn.execute("BEGIN")    # one read transaction: payments never point at a booking the snapshot lacks
+        try:
+            for table, (key, _) in ANALYTICS_TABLES.items():
+                folder = directory / table
+                folder.mkdir(parents=True, exist_ok=True)
+                parts = {r[0] for r in conn.execute("SELECT part FROM AnalyticsDirty WHERE tbl = ? AND claimed = 1", (table,))}
+                first, last = conn.execute(f"SELECT MIN({key}), MAX({key}) FROM main.{table}").fetchone()
+                if first is not None:
+                    exported = {int(p.stem.split("-")[1]) for p in folder.glob("part-*.parquet")}
+                    parts |= set(range(first >> ANALYTICS_PART_BITS, (last >> ANALYTICS_PART_BITS) + 1)) - exported
+                for part in sorted(parts):
+                    rows_written += write_analytics_part(conn, table, part, folder)
+                    parts_written += 1
+        finally:
+            conn.commit()
+    return {"parts_written": parts_written, "rows_written": rows_written}
+
+def refresh_analytics():
+    """Run maintain_analytics() now, in this thread (the Reports page, scripts)."""
+    return maintain_analytics(write_timed)
+
+class AnalyticsSnapshot:
+    """The Parquet parts in memory, one DataFrame per table in id order. table() re-reads only
+    the part files that changed on disk since the previous call."""
+
+    def __init__(self, directory):
+        self.directory = pathlib.Path(directory)
+        self._lock = threading.Lock()
+        self._parts = {}       # table -> {path: (mtime_ns, DataFrame)}
+        self._frames = {}      # table -> the parts concatenated
+
+    def table(self, name):
+        import pandas as pd
+        import pyarrow.parquet as pq
+        with self._lock:
+            loaded = self._parts.setdefault(name, {})
+            files = {p: p.stat().st_mtime_ns for p in (self.directory / name).glob("part-*.parquet")}
+            changed = [p for p, mtime in files.items() if p not in loaded or loaded[p][0] != mtime]
+            gone = loaded.keys() - files.keys()
+            if changed or gone or name not in self._frames:
+                for p in gone:
+                    del loaded[p]
+                for p in changed:
+                    loaded[p] = (files[p], pq.read_table(p).to_pandas())
+                frames = [loaded[p][1] for p in sorted(loaded) if len(loaded[p][1])]
+                self._frames[name] = (pd.concat(frames, ignore_index=True) if frames else
+                                      pd.DataFrame({c: pd.Series(dtype=t) for c, t in ANALYTICS_TABLES[name][1].items()}))
+            return self._frames[name]
+
+    def status(self):
+        """Per table: part files, rows and bytes on disk, and when a part was last written."""
+        import pyarrow.parquet as pq
+        status = {}
+        for table in ANALYTICS_TABLES:
+            files = list((self.directory / table).glob("part-*.parquet"))
+            status[table] = {"parts": len(files), "rows": sum(pq.read_metadata(p).num_rows for p in files),
+                             "bytes": sum(p.stat().st_size for p in files),
+                             "written_at": max((p.stat().st_mtime for p in files), default=None)}
+        return status
+
+@process_resource
+def analytics_snapshot_for(db_file):
+    return AnalyticsSnapshot(analytics_dir_for(db_file))
+
+def get_analytics_snapshot():
+    return analytics_snapshot_for(DB_FILE)
+
+def analytics_status():
+    """The snapshot on disk per table, its directory, and the parts written since its last
+    refresh (waiting for the next one)."""
+    with snapshot_read() as conn:    # not cached: the triggers' writes invalidate nothing
+        pending = conn.execute("SELECT COUNT(*) FROM AnalyticsDirty WHERE claimed = 0").fetchone()[0]
+    return {"tables": get_analytics_snapshot().status(), "dir": str(analytics_dir_for(DB_FILE)), "pending_parts": pending}
+
+def catalog_frame(records):
+    """A CatalogTable as a DataFrame; its typed array columns are wrapped, not copied."""
+    import numpy as np
+    import pandas as pd
+    return pd.DataFrame({name: np.frombuffer(column, dtype=column.typecode) if isinstance(column, array) else list(column)
+                         for name, column in zip(records.record.__slots__, records.columns)})
+
+def index_of(keys, probes):
+    """Position of each probe in `keys` (unique), -1 where it is missing: a vectorized join."""
+    import pandas as pd
+    return pd.Index(keys).get_indexer(probes)
+
+def paid_by_booking(snapshot, *columns):
+    """Payments with the given columns of their booking added (payments of no booking dropped)."""
+    import pandas as pd
+    bookings, payments = snapshot.table("Bookings"), snapshot.table("Payments")
+    at = index_of(bookings["booking_id"], payments["booking_id"])
+    found = at >= 0
+    frame = pd.DataFrame({c: bookings[c].to_numpy()[at[found]] for c in columns})
+    frame["amount"] = payments["amount"].to_numpy()[found]
+    return frame
+
+def columnar_booking_report(snapshot, date_from=None, date_to=None, dest_id=None, limit=None, **_):
+    """booking_report_query() on the snapshot: the same columns, filters and order (booking date,
+    then id, newest first)."""
+    import numpy as np
+    import pandas as pd
+    catalog = get_catalog()
+    bookings, customers = snapshot.table("Bookings"), snapshot.table("Customers")
+    packages, destinations = catalog_frame(catalog.packages), catalog_frame(catalog.destinations)
+    cust_at = index_of(customers["cust_id"], bookings["cust_id"])
+    pkg_at = index_of(packages["pkg_id"], bookings["pkg_id"])
+    dest_at = np.where(pkg_at >= 0, index_of(destinations["dest_id"], packages["dest_id"].to_numpy()[pkg_at]), -1)
+    keep = (cust_at >= 0) & (pkg_at >= 0) & (dest_at >= 0)      # the report's inner joins
+    dates = bookings["booking_date"]
+    if date_from is not None:
+        keep &= (dates >= str(date_from)).fillna(False).to_numpy(bool)
+    if date_to is not None:
+        keep &= (dates <= str(date_to)).fillna(False).to_numpy(bool)
+    if dest_id is not None:
+        keep &= destinations["dest_id"].to_numpy()[dest_at] == dest_id
+    rows = bookings[keep].assign(cust_at=cust_at[keep], pkg_at=pkg_at[keep], dest_at=dest_at[keep])
+    rows = rows.sort_values(["booking_date", "booking_id"], ascending=False, na_position="last")
+    if limit is not None:
+        rows = rows.head(limit)
+    cust, pkg, dest = customers.iloc[rows["cust_at"]], packages.iloc[rows["pkg_at"]], destinations.iloc[rows["dest_at"]]
+    return pd.DataFrame({
+        "ID": rows["booking_id"].to_numpy(), "Date": rows["booking_date"].to_numpy(),
+        "Customer": cust["name"].to_numpy(), "Contact": cust["email"].to_numpy(),
+        "Package": pkg["pkg_name"].to_numpy(), "Package_Price": pkg["price"].to_numpy(),
+        "Destination": (dest["city"] + ", " + dest["country"]).to_numpy(),
+        "Total_Paid": rows["total_paid"].to_numpy(), "Balance_Due": rows["balance_due"].to_numpy(),
+        "Payment_Status": rows["is_paid"].map({0: "Unpaid", 1: "Partial", 2: "Paid"}).fillna("Unknown").to_numpy(),
+    })
+
+def columnar_customer_spending(snapshot, **_):
+    """CUSTOMER_SPENDING_SQL on the snapshot: payments summed per customer of their booking."""
+    totals = paid_by_booking(snapshot, "cust_id").groupby("cust_id")["amount"].sum()
+    report = snapshot.table("Customers")[["cust_id", "name", "email"]].copy()
+    report["total_paid"] = report["cust_id"].map(totals).fillna(0.0)
+    return report.sort_values("total_paid", ascending=False, kind="stable", ignore_index=True)
+
+def columnar_revenue_by_package(snapshot, **_):
+    """REVENUE_BY_PACKAGE_SQL on the snapshot."""
+    revenue = paid_by_booking(snapshot, "pkg_id").groupby("pkg_id")["amount"].agg(revenue="sum", payments="size")
+    packages = catalog_frame(get_catalog().packages)[["pkg_id", "pkg_name"]]
+    report = packages.join(revenue, on="pkg_id", how="inner")
+    return report.sort_values("revenue", ascending=False, kind="stable", ignore_index=True)
+
+def columnar_revenue_by_destination(snapshot, **_):
+    """REVENUE_BY_DESTINATION_SQL on the snapshot: package revenue summed per destination."""
+    catalog = get_catalog()
+    by_package = columnar_revenue_by_package(snapshot).merge(catalog_frame(catalog.packages)[["pkg_id", "dest_id"]], on="pkg_id")
+    revenue = by_package.groupby("dest_id")[["revenue", "payments"]].sum()
+    report = catalog_frame(catalog.destinations).join(revenue, on="dest_id", how="inner")
+    return report.sort_values("revenue", ascending=False, kind="stable", ignore_index=True)
+
+def columnar_hotel_stays(snapshot, **_):
+    """HOTEL_STAYS_SQL on the snapshot."""
+    import pandas as pd
+    reservations = snapshot.table("Reservations")
+    nights = (pd.to_datetime(reservations["check_out"], format="ISO8601", errors="coerce")
+              - pd.to_datetime(reservations["check_in"], format="ISO8601", errors="coerce")) / pd.Timedelta(days=1)
+    stays = (pd.DataFrame({"hotel_id": reservations["service_id"], "nights": nights})
+             .groupby("hotel_id")["nights"].agg(stays="size", nights=lambda n: n.sum(min_count=1)))
+    services = catalog_frame(get_catalog().services)[["service_id", "service_name"]].rename(columns={"service_id": "hotel_id"})
+    report = services.join(stays, on="hotel_id", how="inner")
+    return report.sort_values("nights", ascending=False, kind="stable", ignore_index=True)
+
+# report: (SQL (sql, params) for the page filters, columnar function, key the comparison sorts by)
+ANALYTICS_REPORTS = {
+    "booking report": (lambda history=False, **filters: booking_report_query(**filters, history=history),
+                       columnar_booking_report, "ID"),
+    "customer spending": (lambda history=False, **_: (CUSTOMER_SPENDING_HISTORY_SQL if history else CUSTOMER_SPENDING_SQL, ()),
+                          columnar_customer_spending, "cust_id"),
+    "revenue by destination": (lambda **_: (REVENUE_BY_DESTINATION_SQL, ()), columnar_revenue_by_destination, "dest_id"),
+    "revenue by package": (lambda **_: (REVENUE_BY_PACKAGE_SQL, ()), columnar_revenue_by_package, "pkg_id"),
+    "hotel stays": (lambda **_: (HOTEL_STAYS_SQL, ()), columnar_hotel_stays, "hotel_id"),
+}
+
+def report_frame(report, engine="sql", **filters):
+    """DataFrame of an ANALYTICS_REPORTS report from SQLite ("sql") or the Parquet snapshot
+    ("columnar"). The snapshot holds no archived bookings, so history=True always uses SQL."""
+    sql_query, columnar, _ = ANALYTICS_REPORTS[report]
+    if engine == "columnar" and not filters.get("history"):
+        return columnar(get_analytics_snapshot(), **filters)
+    return get_dataframe(*sql_query(**filters))
+
+def same_report(expected, actual, key):
+    """(True, "") when both frames hold the same rows, compared by `key` (row order among equal
+    sort values is arbitrary) with money to the cent; else (False, the first difference)."""
+    import numpy as np
+    if list(expected.columns) != list(actual.columns):
+        return False, f"columns {list(expected.columns)} vs {list(actual.columns)}"
+    if len(expected) != len(actual):
+        return False, f"{len(expected):,} vs {len(actual):,} rows"
+    expected = expected.sort_values(key, ignore_index=True)
+    actual = actual.sort_values(key, ignore_index=True)
+    for column in expected.columns:
+        a, b = expected[column], actual[column]
+        if a.dtype.kind in "if" and b.dtype.kind in "if":
+            equal = np.isclose(a.to_numpy(float), b.to_numpy(float), atol=0.005, equal_nan=True)
+        else:
+            equal = (a.isna().to_numpy() & b.isna().to_numpy()) | (a.astype(str) == b.astype(str)).to_numpy()
+        if not equal.all():
+            row = int(np.argmin(equal))
+            return False, f"{column} of {key} {expected[key].iloc[row]}: {a.iloc[row]!r} vs {b.iloc[row]!r}"
+    return True, ""
+
+def compare_report_engines(**filters):
+    """Refresh the snapshot, then run every ANALYTICS_REPORTS report on both engines (no result
+    cache, snapshot already in memory). Returns [{"report", "sql_ms", "columnar_ms", "rows",
+    "match", "difference"}]. Writes committed after the refresh can make a report differ."""
+    filters["history"] = False
+    refresh_analytics()
+    snapshot = get_analytics_snapshot()
+    for table in ANALYTICS_TABLES:
+        snapshot.table(table)
+    results = []
+    for report, (sql_query, columnar, key) in ANALYTICS_REPORTS.items():
+        start = time.perf_counter()
+        expected = get_dataframe(*sql_query(**filters), cached=False)
+        sql_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        actual = columnar(snapshot, **filters)
+        columnar_ms = (time.perf_counter() - start) * 1000
+        match, difference = same_report(expected, actual, key)
+        results.append({"report": report, "sql_ms": sql_ms, "columnar_ms": columnar_ms, "rows": len(expected),
+                        "match": match, "difference": difference})
+    return results
+
+AUDIT_LARGE_TABLE_ROWS = 1000
+NOT_AN_ALIAS = {"ON", "WHERE", "LEFT", "RIGHT", "INNER", "OUTER", "CROSS", "JOIN", "GROUP", "ORDER", "LIMIT", "USING", "NATURAL"}
+
+def audit_query_plans(large_table_rows=AUDIT_LARGE_TABLE_ROWS):
+    """Run EXPLAIN QUERY PLAN on every registered query. A step is flagged when it fully scans a
+    table with at least `large_table_rows` rows that the query did not declare in allow_scan,
+    or when SQLite had to build an automatic (missing) index."""
+    findings = []
+    with snapshot_read() as conn:
+        tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        row_counts = {}
+        for name, query in REPORT_QUERIES.items():
+            aliases = {}
+            for table, alias in TABLE_REF_RE.findall(query["sql"]):
+                aliases[table] = table
+                if alias and alias.upper() not in NOT_AN_ALIAS:
+                    aliases[alias] = table
+
+            try:
+                plan = conn.execute("EXPLAIN QUERY PLAN " + query["sql"], query["params"]).fetchall()
+            except sqlite3.OperationalError as e:
+                # e.g. the R*Tree queries on a SQLite build without the module
+                findings.append({"query": name, "plan": f"not plannable: {e}", "table": None, "approx_rows": None, "flagged": False})
+                continue
+            for _, _, _, detail in plan:
+                table, rows, flagged = None, None, "AUTOMATIC" in detail
+                m = re.match(r"(SCAN|SEARCH) (\w+)", detail)
+                if m and aliases.get(m.group(2), m.group(2)) in tables:
+                    table = aliases.get(m.group(2), m.group(2))
+                    if table not in row_counts:
+                        # MAX(rowid) is a single index probe, unlike COUNT(*)
+                        row_counts[table] = conn.execute(f"SELECT COALESCE(MAX(rowid), 0) FROM {table}").fetchone()[0]
+                    rows = row_counts[table]
+                    full_scan = m.group(1) == "SCAN" and "USING" not in detail
+                    vtab = re.search(r"VIRTUAL TABLE INDEX (\d+):(\S*)", detail)
+                    if vtab:
+                        # R*Tree: idxNum 1 is a rowid lookup, otherwise constraints follow the colon
+                        full_scan = vtab.group(1) != "1" and not vtab.group(2)
+                    if full_scan and rows >= large_table_rows and table not in query["allow_scan"]:
+                        flagged = True
+                findings.append({"query": name, "plan": detail, "table": table, "approx_rows": rows, "flagged": flagged})
+    return findings